@@ -0,0 +1,49 @@
+# =====================================================================================================================
+#   Benchmark of OperaESDLParser.parse on MACRO 13.esdl, scaled up by copying its assets
+#   usage: python benchmark_parser.py [scale ...]
+# =====================================================================================================================
+import contextlib
+import io
+import os
+import sys
+import time
+
+import esdl
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_parser import OperaESDLParser
+
+TEST_ESDL = os.path.join(os.path.dirname(__file__), 'MACRO 13.esdl')
+
+
+def scaled_esdl(scale: int) -> str:
+    """Returns MACRO 13 with all assets of the main area copied scale times"""
+    esh = EnergySystemHandler()
+    es = esh.load_file(TEST_ESDL)
+    area: esdl.Area = es.instance[0].area
+    originals = list(area.asset)
+    for i in range(1, scale):
+        for asset in originals:
+            copy = asset.deepcopy(target_es=es)  # carriers and units resolve to the ones in es
+            copy.id = f"{asset.id}_{i}"
+            copy.name = f"{asset.name}_{i}"
+            for port in copy.port:
+                port.id = f"{port.id}_{i}"
+                port.connectedTo.clear()
+            area.asset.append(copy)
+    return esh.to_string()
+
+
+def benchmark(scales):
+    print(f"{'assets':>8} {'parse (s)':>10} {'ms/asset':>9}")
+    for scale in scales:
+        esdl_string = scaled_esdl(scale)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            assets, carriers = OperaESDLParser().parse(esdl_string=esdl_string)
+            duration = time.perf_counter() - start
+        print(f"{len(assets):>8} {duration:>10.3f} {1000 * duration / len(assets):>9.3f}")
+
+
+if __name__ == '__main__':
+    benchmark([int(s) for s in sys.argv[1:]] or [1, 10, 50, 100, 200])
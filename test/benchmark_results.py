@@ -0,0 +1,54 @@
+# =====================================================================================================================
+#   Benchmark of OperaResultsProcessor.update_production_capacities with synthetic Opera outputs
+#   usage: python benchmark_results.py [number of options ...]
+# =====================================================================================================================
+import os
+import sys
+import tempfile
+import time
+
+import esdl
+import pandas as pd
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.opera_accessdb.results_processor import OperaResultsProcessor
+
+
+def synthetic_run(options: int, output_path: str):
+    """
+    Creates an energy system with a wind turbine for half of the options and the Capacity.csv and UoCapacity.csv
+    Opera outputs with a capacity for every option
+    :return: the EnergySystemHandler and input dataframe of the energy system
+    """
+    esh = EnergySystemHandler()
+    es = esh.create_empty_energy_system("benchmark", "", "", "")
+    es.version = "1"
+    area: esdl.Area = es.instance[0].area
+    rows = []
+    for i in range(0, options, 2):
+        asset = esdl.WindTurbine(id=f"wind_{i}", name=f"Wind {i}", power=1e9)
+        area.asset.append(asset)
+        esh.add_object(asset)
+        rows.append({'id': asset.id, 'name': asset.name, 'power_min': 0.5, 'power_max': 2.0})
+    option_names = [f"{i + 1} Wind {i}" for i in range(options)]
+    pd.DataFrame({'Regions': 'NL', 'Option': option_names, 'Variant': 1, 'Construction year': 2030,
+                  'View year': 2030, 'Capacity': 1.5}).to_csv(os.path.join(output_path, "Capacity.csv"), index=False)
+    pd.DataFrame({'Option': option_names, 'UoCapacity': 'GW'}).to_csv(os.path.join(output_path, "UoCapacity.csv"),
+                                                                       index=False)
+    return esh, pd.DataFrame(rows)
+
+
+def benchmark(sizes):
+    print(f"{'options':>8} {'assets':>8} {'update (s)':>11}")
+    for options in sizes:
+        with tempfile.TemporaryDirectory() as output_path:
+            esh, df = synthetic_run(options, output_path)
+            orp = OperaResultsProcessor(output_path=output_path, esh=esh, input_df=df)
+            start = time.perf_counter()
+            orp.update_production_capacities()
+            duration = time.perf_counter() - start
+        print(f"{options:>8} {len(df):>8} {duration:>11.3f}")
+
+
+if __name__ == '__main__':
+    benchmark([int(s) for s in sys.argv[1:]] or [1000, 10000, 20000])
@@ -0,0 +1,63 @@
+# =====================================================================================================================
+#   Benchmark of loading tables with the UniversalLink into MySQL / MariaDB
+#   Start a local stand-in with: docker-compose -f docker-compose-infra.yml up -d mariadb
+#   and set DATABASE_HOST, DATABASE_USER and DATABASE_PASSWORD (e.g. root / root for the stand-in)
+#   usage: python benchmark_universal_link.py [number of rows ...]
+# =====================================================================================================================
+import sys
+import time
+
+from tno.aimms_adapter.settings import EnvSettings
+from tno.aimms_adapter.universal_link.universal_link import UniversalLink
+
+COLUMNS = 20
+TABLES = 10
+
+
+def synthetic_tables(rows: int):
+    """Tables of the size of the Assets table, with a primary key and varchar columns"""
+    tables = [f"Table{t}" for t in range(TABLES)]
+    attributes = [('id varchar(100) Primary Key',) + tuple(f"c{c} varchar(100)" for c in range(1, COLUMNS))
+                  for _ in tables]
+    values = [[(f"id{r}",) + tuple(f"value {r}.{c}" if c % 3 else r * 0.5 for c in range(1, COLUMNS))
+               for r in range(rows)] for _ in tables]
+    return tables, attributes, values
+
+
+def load_per_table(ul: UniversalLink, tables, attributes, values):
+    """The previous way of loading: count the columns of each table in INFORMATION_SCHEMA and executemany its rows"""
+    ul.create_AIMMS_sql(tables, attributes)
+    for table, rows in zip(tables, values):
+        columns = ul.get_sql("SELECT COUNT(*) as NumberofCol from INFORMATION_SCHEMA.COLUMNS where table_schema = '"
+                             + ul.database_name + "' and table_name = '" + table + "';")['NumberofCol'][0]
+        ul.cursor.executemany(f"INSERT INTO {ul.database_name}.{table} VALUES (" + ','.join(['%s'] * columns) + ');',
+                              rows)
+    ul.conn.commit()
+
+
+def load_bulk(ul: UniversalLink, tables, attributes, values):
+    ul.create_AIMMS_sql(tables, attributes)
+    ul.bulk_load(tables, values)
+
+
+def benchmark(sizes):
+    connection = dict(host=EnvSettings.db_host(), database=EnvSettings.db_name(), user=EnvSettings.db_user(),
+                      password=EnvSettings.db_password())
+    links = {
+        'per table': (UniversalLink(**connection, load_method='insert'), load_per_table),
+        'insert': (UniversalLink(**connection, load_method='insert'), load_bulk),
+        'infile': (UniversalLink(**connection, load_method='infile'), load_bulk),
+    }
+    print(f"{'rows':>8} " + ' '.join(f"{name + ' (s)':>14}" for name in links))
+    for rows in sizes:
+        tables, attributes, values = synthetic_tables(rows)
+        durations = []
+        for ul, load in links.values():
+            start = time.perf_counter()
+            load(ul, tables, attributes, values)
+            durations.append(time.perf_counter() - start)
+        print(f"{rows:>8} " + ' '.join(f"{duration:>14.3f}" for duration in durations))
+
+
+if __name__ == '__main__':
+    benchmark([int(s) for s in sys.argv[1:]] or [1000, 10000, 50000])
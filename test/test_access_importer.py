@@ -0,0 +1,139 @@
+import os
+import unittest
+
+import pandas.io.sql as psql
+import sqlalchemy as sa
+
+from tno.aimms_adapter.model.opera_accessdb.opera_access_importer import OperaAccessImporter
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_parser import OperaESDLParser
+
+TEST_ESDL = os.path.join(os.path.dirname(__file__), 'MACRO 13.esdl')
+
+# Minimal Opera schema in SQLite, which (like Access) supports [bracketed] identifiers and ? parameters
+OPERA_SCHEMA = [
+    "CREATE TABLE [Energiedragers] ([Energiedrager] TEXT, [Eenheid] TEXT, [VraagIsAanbod] BOOLEAN, [Generiek] BOOLEAN, "
+    "[Basisenergiedrager] BOOLEAN, [Elektriciteit] BOOLEAN, [Warmte] BOOLEAN)",
+    "CREATE TABLE [EconomieNationaal(Energiedrager,Jaar,Scenario)] ([Energiedrager] TEXT, [Jaar] INTEGER, "
+    "[Scenario] TEXT, [Nationale prijs] REAL)",
+    "CREATE TABLE [Activiteiten] ([Activiteit] TEXT, [Eenheid] TEXT)",
+    "CREATE TABLE [ActiviteitBaseline(activiteit,scenario,jaar)] ([Activiteit] TEXT, [Scenario] TEXT, [Jaar] INTEGER, "
+    "[Waarde] REAL)",
+    "CREATE TABLE [Opties] ([Nr] INTEGER PRIMARY KEY AUTOINCREMENT, [Naam optie] TEXT, [Sector] TEXT, "
+    "[Unit of Capacity] TEXT, [Eenheid activiteit] TEXT, [Cap2Act] REAL, [Optie onbeperkt] BOOLEAN, "
+    "[Capaciteit onbeperkt] BOOLEAN, [Doelstof] TEXT, [Levensduur] INTEGER)",
+    "CREATE TABLE [Beschikbare varianten] ([Nr] INTEGER, [Variant] INTEGER, [Beschikbaar] INTEGER)",
+    "CREATE TABLE [Kosten(Optie,Variant,Jaar)] ([Nr] INTEGER, [Variant] INTEGER, [Jaar] INTEGER, "
+    "[Investeringskosten] REAL, [Overig operationeel kosten/baten] REAL, [Variabele kosten] REAL)",
+    "CREATE TABLE [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] ([Nr] INTEGER, [Energiedrager] TEXT, "
+    "[Variant] INTEGER, [Jaar] INTEGER, [Effect] TEXT)",
+    "CREATE TABLE [CatJaarScen(categorie,jaar,scenario)] ([Categorie] TEXT, [Jaar] TEXT, [Scenario] TEXT, "
+    "[Max aantal] REAL, [Max kosten] REAL, [Min aantal] REAL, [Min kosten] REAL, [Max totale capaciteit] REAL, "
+    "[Min totale capaciteit] REAL, [Min Activiteit Jaar] REAL, [Max Activiteit Jaar] REAL, "
+    "[ActiviteitMinimaalGelijkBaseline] BOOLEAN)",
+    "CREATE TABLE [OptieActiviteit(Optie,Activiteit)] ([Optie] INTEGER, [Activiteit] TEXT, [Match] BOOLEAN)",
+    # reference option for the wind turbine
+    "INSERT INTO [Opties] ([Nr], [Naam optie], [Sector], [Doelstof], [Levensduur]) "
+    "VALUES (1, 'Wind op Zee band 1', 'Elektriciteit', 'CO2', 25)",
+    "INSERT INTO [Beschikbare varianten] VALUES (1, 1, 1), (1, 2, 0)",
+    "INSERT INTO [Kosten(Optie,Variant,Jaar)] VALUES (1, 1, 2030, 1.0, 2.0, 3.0)",
+    "INSERT INTO [CatJaarScen(categorie,jaar,scenario)] VALUES ('1', '2030', 'MMvIB', 5, 5, 0, 0, 10, 0, 0, 0, 1)",
+]
+
+
+class SQLiteOperaAccessImporter(OperaAccessImporter):
+    def __init__(self, engine):
+        self.sqlite_engine = engine
+
+    def connect_to_access(self, access_file: str):
+        self.engine = self.sqlite_engine
+        self.conn = self.engine.raw_connection()
+        self.cursor = self.conn.cursor()
+
+
+class TestOperaAccessImporter(unittest.TestCase):
+    def setUp(self):
+        self.engine = sa.create_engine("sqlite://", poolclass=sa.pool.StaticPool)
+        with self.engine.begin() as conn:
+            for statement in OPERA_SCHEMA:
+                conn.exec_driver_sql(statement)
+        with open(TEST_ESDL, 'r') as f:
+            self.assets, self.carriers = OperaESDLParser().parse(esdl_string=f.read())
+        # storage options require @@Identity, which is only available in Access
+        self.assets = self.assets[self.assets['category'] != 'Storage'].reset_index(drop=True)
+
+    def read(self, table):
+        return psql.read_sql(f"SELECT * FROM [{table}]", self.engine)
+
+    def test_bulk_import(self):
+        importer = SQLiteOperaAccessImporter(self.engine)
+        importer.start_import(self.assets, self.carriers, access_database='', bulk=True)
+        self.assertEqual(list(importer.timings), ['energy carriers', 'reference tables', 'activities', 'options',
+                                                  'option related tables', 'commit'])
+
+        opties = self.read('Opties')
+        self.assertEqual(len(opties), 1 + len(self.assets))
+        wind = opties[opties['Naam optie'] == 'WindTurbine_6411'].iloc[0]
+        self.assertEqual(wind['Levensduur'], 25)  # copied from the reference option
+        self.assertEqual(wind['Sector'], 'Energie')
+        self.assertEqual(len(self.read('Beschikbare varianten').query(f"Nr == {wind['Nr']}")), 2)
+
+        kosten = self.read('Kosten(Optie,Variant,Jaar)')
+        self.assertEqual(kosten.query(f"Nr == {wind['Nr']}")['Investeringskosten'].item(), 1103.0)
+        catjaarscen = self.read('CatJaarScen(categorie,jaar,scenario)')
+        self.assertEqual(catjaarscen[catjaarscen['Categorie'] == str(wind['Nr'])]['Max totale capaciteit'].item(), 60.0)
+        # the reference copies and the defaults are written with a text Categorie, like the row-by-row import
+        categories = importer.tables['CatJaarScen(categorie,jaar,scenario)']['Categorie']
+        self.assertTrue(all(isinstance(c, str) for c in categories))
+
+        consumers = self.assets[self.assets['category'] == 'Consumer']
+        self.assertEqual(len(self.read('Activiteiten')), len(consumers))
+        self.assertEqual(len(self.read('OptieActiviteit(Optie,Activiteit)')), len(consumers))
+        baseline = self.read('ActiviteitBaseline(activiteit,scenario,jaar)').set_index('Activiteit')['Waarde']
+        self.assertAlmostEqual(baseline['Activity_MobilityDemand_eCar_e584'], 64.67)
+
+        energiegebruik = self.read('Energiegebruik(Optie,Energiedrager,Variant,Jaar)')
+        electrolyzer = opties[opties['Naam optie'] == 'Electrolyzer_b243']['Nr'].item()
+        effects = energiegebruik[energiegebruik['Nr'] == electrolyzer].set_index('Energiedrager')['Effect']
+        self.assertEqual(effects['MMvIB_Electricity'], '1')
+        self.assertEqual(float(effects['MMvIB_Hydrogen']), -0.67)
+
+    def test_bulk_import_is_idempotent(self):
+        SQLiteOperaAccessImporter(self.engine).start_import(self.assets.copy(), self.carriers, access_database='')
+        counts = {t: len(self.read(t)) for t in ['Opties', 'Kosten(Optie,Variant,Jaar)',
+                                                 'Energiegebruik(Optie,Energiedrager,Variant,Jaar)',
+                                                 'CatJaarScen(categorie,jaar,scenario)']}
+        SQLiteOperaAccessImporter(self.engine).start_import(self.assets.copy(), self.carriers, access_database='')
+        self.assertEqual(counts, {t: len(self.read(t)) for t in counts})
+
+    def test_row_import_with_quoted_names(self):
+        self.assets['name'] = self.assets['name'].str.replace('_', "'s ")
+        SQLiteOperaAccessImporter(self.engine).start_import(self.assets, self.carriers, access_database='', bulk=False)
+
+        opties = self.read('Opties')
+        self.assertEqual(len(opties), 1 + len(self.assets))
+        wind = opties[opties['Naam optie'] == "WindTurbine's 6411"].iloc[0]
+        self.assertEqual(wind['Levensduur'], 25)
+        kosten = self.read('Kosten(Optie,Variant,Jaar)')
+        self.assertEqual(kosten.query(f"Nr == {wind['Nr']}")['Investeringskosten'].item(), 1103.0)
+        baseline = self.read('ActiviteitBaseline(activiteit,scenario,jaar)').set_index('Activiteit')['Waarde']
+        self.assertAlmostEqual(baseline["Activity_MobilityDemand's eCar's e584"], 64.67)
+
+    def test_failed_import_is_rolled_back(self):
+        class FailingImporter(SQLiteOperaAccessImporter):
+            def _bulk_add_options(self):
+                raise ValueError("Import failed")
+
+        for commit_batch_size in [0, 5]:
+            importer = FailingImporter(self.engine)
+            importer.commit_batch_size = commit_batch_size
+            with self.assertRaises(ValueError):
+                importer.start_import(self.assets.copy(), self.carriers, access_database='')
+            if commit_batch_size == 0:
+                self.assertEqual(len(self.read('Energiedragers')), 0)
+                self.assertEqual(len(self.read('Activiteiten')), 0)
+            else:  # committed batches stay in the database
+                self.assertEqual(len(self.read('Energiedragers')), len(self.carriers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+import unittest
+
+from tno.aimms_adapter.model.aimms_output import AimmsOutputReader, AimmsProgress
+
+CPLEX_OUTPUT = """Starting procedure MainExecution
+Presolve time = 0.02 sec. (12.45 ticks)
+Iteration: 1   Dual objective = 1200.000000
+Iteration: 250   Dual objective = 8754.125000
+Barrier time = 1.25 sec.
+Objective value: 1.5e6
+Writing results to Opera output folder
+"""
+
+
+class TestAimmsOutputReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp.name, 'aimms.log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_progress(self):
+        reader = AimmsOutputReader(io.StringIO(CPLEX_OUTPUT), self.log_file).start()
+        reader.join(timeout=5)
+        progress = reader.progress()
+        self.assertEqual(progress.lines, 7)
+        self.assertEqual(progress.phase, 'writing results')
+        self.assertEqual(progress.iteration, 250)
+        self.assertEqual(progress.objective, 1.5e6)
+        self.assertNotIn('last_output_time', progress.to_dict())
+        with open(self.log_file) as f:
+            self.assertEqual(f.read(), CPLEX_OUTPUT)
+
+    def test_tail_is_bounded(self):
+        output = ''.join(f"line {i}\n" for i in range(1000))
+        reader = AimmsOutputReader(io.StringIO(output), self.log_file, buffer_size=10).start()
+        reader.join(timeout=5)
+        self.assertEqual(reader.tail(), [f"line {i}" for i in range(990, 1000)])
+        self.assertEqual(reader.progress().lines, 1000)
+
+    def test_update(self):
+        progress = AimmsProgress()
+        progress.update("Dual simplex - Optimal:  Objective = 3.2500000000e+02")
+        self.assertEqual(progress.phase, 'dual simplex')
+        self.assertEqual(progress.objective, 325.0)
+        self.assertIsNone(progress.iteration)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.aimms_process import AimmsProcess
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.model.scheduler import RunScheduler, WorkerSlot
+from tno.aimms_adapter.types import ModelState, OperaAdapterConfig
+
+# prints a line every 0.1s for 30s, or stays silent after the first line
+CHATTY = [sys.executable, '-u', '-c', "import time\nfor i in range(300):\n    print(i)\n    time.sleep(0.1)"]
+SILENT = [sys.executable, '-u', '-c', "import time\nprint('started')\ntime.sleep(30)"]
+# starts a child process that would outlive its parent if only the parent was killed
+TREE = [sys.executable, '-u', '-c', "import subprocess, sys, time\n"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\nprint('started')\ntime.sleep(30)"]
+
+
+class TestAimmsProcess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp.name, 'aimms.log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_finishes(self):
+        aimms = AimmsProcess([sys.executable, '-c', "print('done')"], self.log_file, 10, timeout=10)
+        self.assertEqual(aimms.wait(poll_interval=0.1), 0)
+        self.assertIsNone(aimms.stop_reason)
+        self.assertEqual(aimms.reader.tail(), ['done'])
+
+    def test_run_timeout(self):
+        aimms = AimmsProcess(CHATTY, self.log_file, 10, timeout=1, idle_timeout=5)
+        start = time.monotonic()
+        self.assertNotEqual(aimms.wait(poll_interval=0.1), 0)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIn("run timeout", aimms.stop_reason)
+
+    def test_idle_timeout(self):
+        aimms = AimmsProcess(SILENT, self.log_file, 10, timeout=20, idle_timeout=1)
+        aimms.wait(poll_interval=0.1)
+        self.assertIn("no output", aimms.stop_reason)
+        self.assertEqual(aimms.reader.progress().lines, 1)
+
+    def test_stop_kills_process_tree(self):
+        aimms = AimmsProcess(TREE, self.log_file, 10)
+        stopper = threading.Timer(1, aimms.stop, args=("Run was cancelled",))
+        stopper.start()
+        start = time.monotonic()
+        aimms.wait(poll_interval=0.1)
+        # the output pipe only closes when the child has been killed as well
+        self.assertFalse(aimms.reader._thread.is_alive())
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(aimms.stop_reason, "Run was cancelled")
+
+
+class TestCancel(unittest.TestCase):
+    def test_cancel_promotes_next_run(self):
+        opera = Opera()
+        opera.scheduler = RunScheduler(slots=1, max_pending=10)
+        first = opera.request().model_run_id
+        second = opera.request().model_run_id
+        self.assertEqual(opera.model_run_dict[second].state, ModelState.PENDING)
+        self.assertEqual(opera.cancel(first).state, ModelState.ERROR)
+        self.assertEqual(opera.model_run_dict[second].state, ModelState.ACCEPTED)
+        self.assertEqual(opera.scheduler.slot_of(second).index, 0)
+        self.assertEqual(opera.cancel('unknown').state, ModelState.ERROR)
+
+    def test_cancel_finished_run(self):
+        opera = Opera()
+        model_run_id = opera.request().model_run_id
+        model_run = opera.model_run_dict[model_run_id]
+        model_run.state = ModelState.SUCCEEDED
+        model_run.finished_at = time.time()
+        opera.model_run_dict[model_run_id] = model_run
+
+        info = opera.cancel(model_run_id)
+        self.assertEqual(info.state, ModelState.SUCCEEDED)
+        self.assertIn("already finished", info.reason)
+        self.assertEqual(opera.model_run_dict[model_run_id].state, ModelState.SUCCEEDED)
+        self.assertNotEqual(opera.model_run_dict[model_run_id].reason, "Run was cancelled")
+
+
+
+class TestAimmsResults(unittest.TestCase):
+    def test_run_without_capacity_output_fails(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {
+                # stands in for AIMMS: python -R -c "print('done')"
+                "AIMMS_EXE_PATH": sys.executable, "AIMMS_PROCEDURE": "-c", "AIMMS_MODEL_PATH": "print('done')",
+                "WORKSPACE_ROOT": tmp, "OPERA_OUTPUT_FOLDER": os.path.join(tmp, "output"),
+                "ACCESS_DATABASE": os.path.join(tmp, "opera.mdb"), "AIMMS_RUN_FILE": "False"}):
+            esh = EnergySystemHandler()
+            esh.load_from_string('<?xml version="1.0" encoding="UTF-8"?><esdl:EnergySystem '
+                                 'xmlns:esdl="http://www.tno.nl/esdl" name="es" description="" version="1"/>')
+            parser = mock.Mock(get_energy_system_Hander=mock.Mock(return_value=esh))
+            opera = Opera()
+            with mock.patch.object(opera, 'parse_input', return_value=(pd.DataFrame(), pd.DataFrame(), parser)), \
+                    mock.patch.object(opera, 'import_into_access_database'):
+                info = opera.start_aimms_model(OperaAdapterConfig(input_esdl_file_path='file://in.esdl'), 'run-1',
+                                               WorkerSlot(0))
+        self.assertEqual(info.state, ModelState.ERROR)
+        self.assertIn("Capacity.csv", info.reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
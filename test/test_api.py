@@ -1,5 +1,3 @@
-from time import sleep
-
 import requests
 
 api_endpoint = "http://localhost:9300"
@@ -48,7 +46,8 @@ else:
 
 succeeded = False
 while not succeeded:
-    res = requests.get(api_endpoint + '/model/status/' + model_run_id)
+    # long-poll, returns as soon as the state of the run changes
+    res = requests.get(api_endpoint + '/model/status/' + model_run_id, params={'wait': 30})
     if res.ok:
         print("Endpoint /model/status ok!")
         result = res.json()
@@ -58,8 +57,6 @@ while not succeeded:
         elif result['state'] == 'ERROR':
             print(result['reason'])
             break
-        else:
-            sleep(2)
     else:
         print("Endpoint /model/status not ok!")
         exit(1)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from tno.aimms_adapter.model.opera_accessdb.database_cache import AccessDatabaseCache, esdl_fingerprint, \
+    changed_rows, VALUE_COLUMNS
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_parser import OperaESDLParser
+
+TEST_ESDL = os.path.join(os.path.dirname(__file__), 'MACRO 13.esdl')
+
+
+def parse_test_esdl():
+    with open(TEST_ESDL, 'r') as f:
+        return OperaESDLParser().parse(esdl_string=f.read())
+
+
+class TestAccessDatabaseCache(unittest.TestCase):
+    def test_fingerprint(self):
+        assets, carriers = parse_test_esdl()
+        structure_key, content_key = esdl_fingerprint(assets, carriers)
+        self.assertEqual((structure_key, content_key), esdl_fingerprint(*parse_test_esdl()))
+
+        changed = assets.copy()
+        changed.loc[changed['category'] != 'Storage', 'efficiency'] = 0.5
+        changed_structure_key, changed_content_key = esdl_fingerprint(changed, carriers)
+        self.assertEqual(structure_key, changed_structure_key)
+        self.assertNotEqual(content_key, changed_content_key)
+        self.assertEqual(len(changed_rows(changed, assets, 'name', VALUE_COLUMNS)),
+                         (assets['category'] != 'Storage').sum())
+
+        renamed = assets.copy()
+        renamed.loc[0, 'name'] = 'Renamed'
+        self.assertNotEqual(structure_key, esdl_fingerprint(renamed, carriers)[0])
+
+    def test_store_lookup_and_evict(self):
+        assets, carriers = parse_test_esdl()
+        with tempfile.TemporaryDirectory() as tmp:
+            clean_db = os.path.join(tmp, 'clean.mdb')
+            imported_db = os.path.join(tmp, 'imported.mdb')
+            for path in (clean_db, imported_db):
+                with open(path, 'wb') as f:
+                    f.write(b'0' * 1000)
+            cache = AccessDatabaseCache(os.path.join(tmp, 'cache'), max_size_bytes=1500, clean_database=clean_db)
+            structure_key, content_key = cache.keys(assets, carriers)
+            self.assertIsNone(cache.lookup(structure_key, content_key))
+
+            cache.store(structure_key, content_key, assets, carriers, imported_db)
+            cached = cache.lookup(structure_key, content_key)
+            self.assertEqual(cached.content_key, content_key)
+
+            changed = assets.copy()
+            changed.loc[changed['category'] != 'Storage', 'efficiency'] = 0.5
+            changed_keys = cache.keys(changed, carriers)
+            near = cache.lookup(*changed_keys)
+            self.assertEqual(near.content_key, content_key)  # same structure, different values
+
+            cache.store(*changed_keys, changed, carriers, imported_db)
+            self.assertEqual(cache.lookup(*changed_keys).content_key, changed_keys[1])
+            self.assertNotEqual(cache.lookup(structure_key, content_key).content_key, content_key)  # evicted
+
+
+if __name__ == '__main__':
+    unittest.main()
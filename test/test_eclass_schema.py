@@ -0,0 +1,73 @@
+import os
+import unittest
+from unittest import mock
+
+from esdl import esdl
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.universal_link.eclass_schema import EClassSchema, common_eclass, eclass_schema, \
+    feature_column
+from tno.aimms_adapter.universal_link.universal_link import UniversalLink
+
+
+class TestEClassSchema(unittest.TestCase):
+    def test_columns_are_attributes_and_single_references(self):
+        schema = EClassSchema(esdl.GasCommodity.eClass)
+        self.assertEqual(list(schema.columns), sorted(schema.columns))
+        self.assertIn('id', schema.columns)
+        self.assertIn('cost', schema.columns)  # single reference
+        definitions = schema.column_definitions()
+        self.assertIn('id varchar(100) Primary Key', definitions)
+        self.assertIn('renewableFactor DOUBLE', definitions)
+        self.assertIn('INDEX (emissionUnit)', definitions)
+        self.assertIn('cost DOUBLE', definitions)  # the value of a SingleValue
+        self.assertNotIn('INDEX (cost)', definitions)
+        costs = EClassSchema(esdl.CostInformation.eClass).column_definitions(False)
+        self.assertIn('investmentCosts DOUBLE', costs)
+        self.assertIn('marginalCosts DOUBLE', costs)
+        self.assertIn('id varchar(100)', EClassSchema(esdl.QuantityAndUnitType.eClass).column_definitions(False))
+
+    def test_feature_columns_are_typed(self):
+        self.assertEqual(feature_column(esdl.EnergyAsset, 'aggregated'), 'aggregated BOOLEAN')
+        self.assertEqual(feature_column(esdl.EnergyAsset, 'aggregationCount'), 'aggregationCount BIGINT')
+        self.assertEqual(feature_column(esdl.EnergyAsset, 'commissioningDate'), 'commissioningDate DATETIME')
+        self.assertEqual(feature_column(esdl.Range, 'minValue', 'min'), 'min DOUBLE')
+        self.assertEqual(feature_column(esdl.EnergyAsset, 'state'), "state ENUM('ENABLED','DISABLED','OPTIONAL')")
+        self.assertEqual(feature_column(esdl.EnergyAsset, 'owner'), 'owner varchar(100)')
+        with self.assertRaises(ValueError):
+            feature_column(esdl.EnergyAsset, 'unknown')
+
+    def test_references_are_written_as_value_or_id(self):
+        schema = eclass_schema(esdl.GasCommodity.eClass)
+        unit = esdl.QuantityAndUnitType(id='unit')
+        commodity = esdl.GasCommodity(id='gas', name='Gas', cost=esdl.SingleValue(value=0.3), emissionUnit=unit)
+        row = dict(zip(schema.columns, schema.row(commodity)))
+        self.assertEqual(row['id'], 'gas')
+        self.assertEqual(row['cost'], 0.3)
+        self.assertEqual(row['emissionUnit'], 'unit')
+        # a profile without a single value does not fit in the DOUBLE column of the cost
+        commodity.cost = esdl.InfluxDBProfile(id='prices')
+        self.assertIsNone(dict(zip(schema.columns, schema.row(commodity)))['cost'])
+
+    def test_schema_is_built_once(self):
+        self.assertIs(eclass_schema(esdl.CostInformation.eClass), eclass_schema(esdl.CostInformation.eClass))
+
+    def test_common_eclass(self):
+        self.assertIs(common_eclass([esdl.GasCommodity(), esdl.GasCommodity()]), esdl.GasCommodity.eClass)
+        self.assertIs(common_eclass([esdl.GasCommodity(), esdl.ElectricityCommodity()]), esdl.Commodity.eClass)
+
+    @mock.patch('tno.aimms_adapter.universal_link.universal_link.create_engine')
+    def test_parse_esdl(self, create_engine):
+        esh = EnergySystemHandler()
+        esh.load_file(os.path.join(os.path.dirname(__file__), 'Hybrid HeatPump.esdl'))
+        ul = UniversalLink(host='localhost', database='test', user='test', password='test')
+        tables, attributes, values = ul.parse_esdl(esh)
+        self.assertEqual(len(tables), len(attributes))
+        for table, definitions, rows in zip(tables, attributes, values):
+            columns = [d for d in definitions if not d.upper().startswith(('INDEX', 'PRIMARY KEY'))]
+            for row in rows:
+                self.assertEqual(len(row), len(columns), table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_cache import ParsedESDLCache, frame_size
+
+TEST_ESDL = os.path.join(os.path.dirname(__file__), 'MACRO 13.esdl')
+
+
+class TestParsedESDLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        frame = pd.DataFrame({'name': ['a', 'b'], 'power': [1.0, 2.0]})
+        carriers = pd.DataFrame({'name': ['c']})
+        size = frame_size(frame) + frame_size(carriers)
+        cache = ParsedESDLCache(max_size_bytes=2 * size)
+        cache.put('first', frame, carriers)
+        cache.put('second', frame, carriers)
+        self.assertIsNotNone(cache.get('first'))  # first is now the most recently used
+        cache.put('third', frame, carriers)
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('first'))
+        self.assertLessEqual(cache.size, cache.max_size_bytes)
+
+    def test_get_returns_copy(self):
+        cache = ParsedESDLCache(max_size_bytes=1024 * 1024)
+        cache.put('key', pd.DataFrame({'power': [1.0]}), pd.DataFrame({'name': ['c']}))
+        assets, _ = cache.get('key')
+        assets.loc[0, 'power'] = 2.0
+        self.assertEqual(cache.get('key')[0].loc[0, 'power'], 1.0)
+
+
+class TestParseInput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.esdl = os.path.join(self.tmp.name, 'input.esdl')
+        shutil.copyfile(TEST_ESDL, self.esdl)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_input_is_not_parsed_again(self):
+        with mock.patch.dict(os.environ, {"ESDL_CACHE_SIZE_MB": "16"}):
+            opera = Opera()
+            assets, carriers, parser = opera.parse_input('file://' + self.esdl)
+            self.assertIsNotNone(parser)
+            cached_assets, cached_carriers, parser = opera.parse_input('file://' + self.esdl)
+            self.assertIsNone(parser)
+            pd.testing.assert_frame_equal(cached_assets, assets)
+            pd.testing.assert_frame_equal(cached_carriers, carriers)
+
+            # a changed file is parsed again
+            with open(self.esdl, 'a') as f:
+                f.write('\n')
+            _, _, parser = opera.parse_input('file://' + self.esdl)
+            self.assertIsNotNone(parser)
+
+
+if __name__ == '__main__':
+    unittest.main()
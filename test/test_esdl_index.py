@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from esdl import esdl
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_index import esdl_index
+
+ESDL_FILE = os.path.join(os.path.dirname(__file__), 'Hybrid HeatPump.esdl')
+
+
+class TestESDLIndex(unittest.TestCase):
+    def setUp(self):
+        self.esh = EnergySystemHandler()
+        self.esh.load_file(ESDL_FILE)
+
+    def test_instances_of_type_match_handler(self):
+        index = esdl_index(self.esh)
+        for esdl_type in (esdl.EnergyAsset, esdl.Producer, esdl.Consumer, esdl.Carrier, esdl.Commodity,
+                          esdl.OutPort, esdl.SingleValue, esdl.QuantityAndUnitType, esdl.Building):
+            self.assertEqual(index.of_type(esdl_type), self.esh.get_all_instances_of_type(esdl_type),
+                             esdl_type.__name__)
+
+    def test_get_and_children(self):
+        index = esdl_index(self.esh)
+        asset = index.of_type(esdl.EnergyAsset)[0]
+        self.assertIs(index.get(asset.id), asset)
+        self.assertIsNone(index.get('unknown'))
+        self.assertEqual(index.children(asset.eContainer()), list(asset.eContainer().eContents))
+        self.assertEqual(index.children(self.esh.get_energy_system()),
+                         list(self.esh.get_energy_system().eContents))
+
+    def test_index_is_shared_until_reload(self):
+        index = esdl_index(self.esh)
+        self.assertIs(esdl_index(self.esh), index)
+        self.esh.load_file(ESDL_FILE)
+        self.assertIsNot(esdl_index(self.esh), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
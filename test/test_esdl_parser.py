@@ -0,0 +1,50 @@
+import os
+import unittest
+
+import pandas as pd
+
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_parser import OperaESDLParser, ASSET_COLUMNS, CARRIER_COLUMNS
+
+TEST_ESDL = os.path.join(os.path.dirname(__file__), 'MACRO 13.esdl')
+
+
+class TestOperaESDLParser(unittest.TestCase):
+    def test_parse(self):
+        with open(TEST_ESDL, 'r') as f:
+            assets, carriers = OperaESDLParser().parse(esdl_string=f.read())
+
+        self.assertEqual(list(assets.columns), list(ASSET_COLUMNS))
+        self.assertEqual(list(carriers.columns), list(CARRIER_COLUMNS))
+        self.assertEqual(len(assets), 12)
+        for column, dtype in ASSET_COLUMNS.items():
+            if dtype == 'float':
+                self.assertEqual(assets[column].dtype, 'float64', column)
+
+        wind = assets.set_index('name').loc['WindTurbine_6411']
+        self.assertEqual(wind['category'], 'Producer')
+        self.assertEqual(wind['opera_equivalent'], 'Wind op Zee band 1')
+        self.assertEqual(wind['investment_cost'], 1103.0)
+        self.assertEqual(wind['power_max'], 60.0)
+
+    def test_parse_stream(self):
+        with open(TEST_ESDL, 'r') as f:
+            expected_assets, expected_carriers = OperaESDLParser().parse(esdl_string=f.read())
+        parser = OperaESDLParser()
+        with open(TEST_ESDL, 'rb') as f:
+            assets, carriers = parser.parse(esdl_stream=f)
+        pd.testing.assert_frame_equal(assets, expected_assets)
+        pd.testing.assert_frame_equal(carriers, expected_carriers)
+        # the energy system can still be updated and serialized for the results
+        self.assertIn('WindTurbine_6411', parser.get_energy_system_Hander().to_string())
+
+    def test_parse_empty_energy_system(self):
+        parser = OperaESDLParser()
+        parser.get_energy_system_Hander().create_empty_energy_system("empty", "", "", "")
+        assets, carriers = parser.parse(esdl_string=parser.get_energy_system_Hander().to_string())
+        self.assertTrue(assets.empty)
+        self.assertEqual(list(assets.columns), list(ASSET_COLUMNS))
+        self.assertTrue(carriers.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
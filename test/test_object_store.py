@@ -0,0 +1,37 @@
+import os
+import unittest
+from unittest import mock
+
+from tno.aimms_adapter.model.object_store import ObjectStore
+
+UNREACHABLE_MINIO = {"MINIO_ENDPOINT": "127.0.0.1:1", "MINIO_RETRIES": "0", "MINIO_TIMEOUT": "1",
+                     "MAX_WORKERS": "3", "AIMMS_RUN_FILE": "True"}
+
+
+class TestObjectStore(unittest.TestCase):
+    def test_not_configured(self):
+        with mock.patch.dict(os.environ, {"MINIO_ENDPOINT": ""}):
+            store = ObjectStore()
+            self.assertIsNone(store.client)
+            self.assertFalse(store.health()["configured"])
+
+    def test_client_is_created_once_with_pool_per_worker(self):
+        with mock.patch.dict(os.environ, UNREACHABLE_MINIO):
+            store = ObjectStore()
+            self.assertIsNone(store._client)  # nothing is connected before first use
+            client = store.client
+            self.assertIs(store.client, client)
+            self.assertEqual(client._http.connection_pool_kw["maxsize"], 12)
+
+    def test_unreachable_minio_is_unhealthy(self):
+        with mock.patch.dict(os.environ, UNREACHABLE_MINIO):
+            store = ObjectStore()
+            health = store.health()
+            self.assertTrue(health["configured"])
+            self.assertFalse(health["healthy"])
+            self.assertIsNotNone(health["error"])
+            self.assertIsNotNone(health["last_check"])
+
+
+if __name__ == '__main__':
+    unittest.main()
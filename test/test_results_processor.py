@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import esdl
+import pandas as pd
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.model.opera_accessdb.result_mappers import ResultMapper, ResultFile, RESULT_MAPPERS
+from tno.aimms_adapter.model.opera_accessdb.results_processor import OperaResultsProcessor, OperaResultsException
+
+
+class ValueMapper(ResultMapper):
+    """An optional mapper that keeps the values per asset of one Opera output file, summed over the regions"""
+
+    def __init__(self, name: str, file: str, column: str):
+        self.name = name
+        self.file = file
+        self.column = column
+        self.files = [ResultFile(file, {'Option': 'str', column: 'float'})]
+        self.values = None
+
+    def apply(self, tables, index):
+        values = tables[self.file].groupby('Name', sort=False)[self.column].sum().reset_index()
+        self.values = {row.id: getattr(row, self.column) for row in index.match(values).itertuples(index=False)}
+
+
+class TestOperaResultsProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.esh = EnergySystemHandler()
+        es = self.esh.create_empty_energy_system("test", "", "", "")
+        es.version = "1"
+        rows = []
+        for name in ['Wind', 'Solar', 'Heat', 'Double', 'No result']:
+            asset = esdl.WindTurbine(id=name.lower(), name=name, power=1e9)
+            es.instance[0].area.asset.append(asset)
+            self.esh.add_object(asset)
+            rows.append({'id': asset.id, 'name': name, 'category': 'Producer', 'esdlType': 'WindTurbine',
+                         'opera_equivalent': 'Wind op Zee band 1', 'power_min': 0.5, 'power_max': 5.0})
+        rows[1]['power_min'] = None
+        self.df = pd.DataFrame(rows)
+
+        options = ['1 Wind', '2 Solar', '3 Heat', '4 Double', '4 Double', '5 Not in ESDL']
+        pd.DataFrame({'Regions': 'NL', 'Option': options, 'Variant': 1, 'Construction year': 2030,
+                      'View year': 2030, 'Capacity': [2.0, 3.0, 4.0, 1.0, 1.0, 6.0]}) \
+            .to_csv(os.path.join(self.tmp.name, "Capacity.csv"), index=False)
+        pd.DataFrame({'Option': options, 'UoCapacity': ['GW', 'GW', 'PJ', 'GW', 'GW', 'GW']}) \
+            .to_csv(os.path.join(self.tmp.name, "UoCapacity.csv"), index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_update_production_capacities(self):
+        wind = self.esh.get_by_id('wind')
+        wind.constraint.append(esdl.RangedConstraint(id='range', name='power range'))
+        orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+        orp.update_production_capacities()
+        self.assertEqual(wind.power, 2e9)
+        self.assertEqual(len(wind.constraint), 0)  # solved constraints are cleared
+        self.assertEqual(self.esh.get_by_id('solar').power, 3e9)
+        self.assertEqual(self.esh.get_by_id('heat').power, 1e9)  # unit is not GW
+        self.assertEqual(self.esh.get_by_id('double').power, 1e9)  # ambiguous result
+        self.assertEqual(self.esh.get_by_id('no result').power, 1e9)
+
+    def test_assets_with_the_same_name(self):
+        es = self.esh.get_energy_system()
+        other = esdl.WindTurbine(id='wind2', name='Wind', power=1e9)
+        es.instance[0].area.asset.append(other)
+        self.esh.add_object(other)
+        df = pd.concat([self.df, self.df[self.df['id'] == 'wind'].assign(id='wind2')], ignore_index=True)
+        OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=df).update_production_capacities()
+        self.assertEqual(self.esh.get_by_id('wind').power, 2e9)
+        self.assertEqual(other.power, 2e9)
+
+    def test_process_all_results(self):
+        pd.DataFrame({'Regions': ['NL', 'BE', 'NL', 'NL'], 'Option': ['1 Wind', '1 Wind', '2 Solar', '5 Not in ESDL'],
+                      'Activity': [10.0, 5.0, 7.0, 1.0]}).to_csv(os.path.join(self.tmp.name, "Activity.csv"), index=False)
+        activity, emissions = ValueMapper('activity', "Activity.csv", 'Activity'), \
+            ValueMapper('emissions', "Emissions.csv", 'Emissions')
+        with mock.patch.dict(RESULT_MAPPERS, {'activity': activity, 'emissions': emissions}):
+            orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+            orp.process()  # without Emissions.csv
+
+        self.assertEqual(self.esh.get_by_id('wind').power, 2e9)
+        self.assertEqual(activity.values, {'wind': 15.0, 'solar': 7.0})
+        self.assertIsNone(emissions.values)
+
+    def test_invalid_optional_results_are_skipped(self):
+        # Costs.csv without the Costs column, Activity.csv with text in a value column
+        pd.DataFrame({'Option': ['1 Wind'], 'Cost': [100.0]}).to_csv(os.path.join(self.tmp.name, "Costs.csv"),
+                                                                     index=False)
+        pd.DataFrame({'Option': ['1 Wind', '2 Solar'], 'Activity': [10.0, 'lots']}) \
+            .to_csv(os.path.join(self.tmp.name, "Activity.csv"), index=False)
+        pd.DataFrame({'Option': ['1 Wind', '2 Solar'], 'Emissions': [1.0, 2.0]}) \
+            .to_csv(os.path.join(self.tmp.name, "Emissions.csv"), index=False)
+        mappers = {name: ValueMapper(name, f"{column}.csv", column)
+                   for name, column in [('costs', 'Costs'), ('activity', 'Activity'), ('emissions', 'Emissions')]}
+        with mock.patch.dict(RESULT_MAPPERS, mappers):
+            orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+            orp.process(['costs', 'activity', 'emissions'])
+
+        self.assertEqual(self.esh.get_by_id('wind').power, 2e9)  # the capacities are always processed
+        self.assertIsNone(mappers['costs'].values)
+        self.assertIsNone(mappers['activity'].values)
+        self.assertEqual(mappers['emissions'].values, {'wind': 1.0, 'solar': 2.0})
+
+    def test_required_results(self):
+        orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+        pd.DataFrame({'Option': ['1 Wind'], 'Capacity': ['many']}) \
+            .to_csv(os.path.join(self.tmp.name, "Capacity.csv"), index=False)
+        with self.assertRaisesRegex(OperaResultsException, "Capacity.csv has values of the wrong type"):
+            orp.process([])
+
+        pd.DataFrame({'Option': ['1 Wind'], 'Cap': [1.0]}).to_csv(os.path.join(self.tmp.name, "Capacity.csv"),
+                                                                  index=False)
+        with self.assertRaisesRegex(OperaResultsException, "Capacity.csv has no column Capacity"):
+            orp.process([])
+
+        os.remove(os.path.join(self.tmp.name, "Capacity.csv"))
+        with self.assertRaisesRegex(OperaResultsException, "Capacity.csv not found"):
+            orp.process(['costs'])
+        self.assertEqual(self.esh.get_by_id('wind').power, 1e9)
+
+    def test_asset_capacities(self):
+        orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+        orp.update_production_capacities()
+        capacities = orp.asset_capacities().set_index('name')
+        self.assertEqual(capacities.loc['Wind', 'power'], 2.0)
+        self.assertEqual(capacities.loc['Heat', 'power'], 1.0)
+
+    def test_export_parquet(self):
+        orp = OperaResultsProcessor(output_path=self.tmp.name, esh=self.esh, input_df=self.df)
+        files = orp.export_parquet(os.path.join(self.tmp.name, 'parquet'))
+        if importlib.util.find_spec('pyarrow') is None:
+            self.assertEqual(files, {})
+            return
+        self.assertEqual(set(files), {'capacities', 'Capacity', 'UoCapacity'})
+        capacity = pd.read_parquet(files['Capacity'])
+        self.assertEqual(list(capacity['Capacity']), [2.0, 3.0, 4.0, 1.0, 1.0, 6.0])
+
+        with mock.patch.dict(os.environ, {"MINIO_ENDPOINT": ""}):
+            stored = Opera().store_files('file://' + os.path.join(self.tmp.name, 'out', 'result.esdl'), files)
+        self.assertEqual(stored['capacities'],
+                         'file://' + os.path.join(self.tmp.name, 'out', 'result_results', 'capacities.parquet'))
+        self.assertTrue(os.path.exists(stored['capacities'][7:]))
+
+    def test_store_files_locally_with_minio(self):
+        path = os.path.join(self.tmp.name, 'capacities.parquet')
+        with open(path, 'wb') as file:
+            file.write(b'PAR1')
+        minio_client = mock.Mock()
+        with mock.patch.dict(os.environ, {"MINIO_ENDPOINT": ""}), \
+                mock.patch.object(Opera, 'minio_client', new_callable=mock.PropertyMock, return_value=minio_client):
+            stored = Opera().store_files('file://' + os.path.join(self.tmp.name, 'out', 'result.esdl'),
+                                         {'capacities': path})
+        # a file:// result is stored next to the result ESDL, also when Minio is configured
+        self.assertTrue(os.path.exists(stored['capacities'][7:]))
+        minio_client.fput_object.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from marshmallow import ValidationError
+
+from tno.aimms_adapter.model.aimms_output import AimmsProgress
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.model.run_events import RunEvents, WebhookNotifier
+from tno.aimms_adapter.types import ModelRunInfo, ModelState, OperaAdapterConfig
+
+ESDL = '<?xml version="1.0" encoding="UTF-8"?><esdl:EnergySystem xmlns:esdl="http://www.tno.nl/esdl" name="result"/>'
+
+
+class TestRunEvents(unittest.TestCase):
+    def test_wait_returns_on_publish(self):
+        events = RunEvents()
+        version = events.version('a')
+        threading.Timer(0.05, events.publish, args=('a',)).start()
+        started = time.monotonic()
+        self.assertEqual(events.wait('a', version, timeout=5), version + 1)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_wait_times_out(self):
+        events = RunEvents()
+        events.publish('b')  # other runs do not wake up the waiter
+        self.assertEqual(events.wait('a', 0, timeout=0.05), 0)
+
+
+class TestWebhookNotifier(unittest.TestCase):
+    def test_state_changes_are_reported_once(self):
+        notifier = WebhookNotifier()
+        with mock.patch.object(notifier, '_send') as send:
+            notifier.state_changed('http://cb', ModelRunInfo(model_run_id='a', state=ModelState.READY))
+            notifier.state_changed('http://cb', ModelRunInfo(model_run_id='a', state=ModelState.READY))
+            notifier.state_changed('http://cb', ModelRunInfo(model_run_id='a', state=ModelState.SUCCEEDED))
+        self.assertEqual([c.args[1] for c in send.call_args_list], ['status', 'status'])
+        self.assertEqual(send.call_args_list[1].args[2].state, ModelState.SUCCEEDED)
+
+    @mock.patch.dict(os.environ, {"WEBHOOK_PROGRESS_INTERVAL": "60"})
+    def test_progress_is_throttled(self):
+        notifier = WebhookNotifier()
+        with mock.patch.object(notifier, '_send') as send:
+            for _ in range(3):
+                notifier.progress('http://cb', ModelRunInfo(model_run_id='a', state=ModelState.RUNNING))
+        self.assertEqual(send.call_count, 1)
+
+    @mock.patch.dict(os.environ, {"WEBHOOK_RETRIES": "1"})
+    @mock.patch('tno.aimms_adapter.model.run_events.time.sleep')
+    @mock.patch('tno.aimms_adapter.model.run_events.requests.post')
+    def test_post_retries(self, post, sleep):
+        import requests
+        post.side_effect = [requests.ConnectionError("down"), mock.Mock()]
+        self.assertTrue(WebhookNotifier.post('http://cb', {'model_run_id': 'a', 'event': 'status'}))
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(post.call_args.kwargs['json'], {'model_run_id': 'a', 'event': 'status'})
+
+    def test_unreachable_callback_does_not_block_others(self):
+        notifier = WebhookNotifier()
+        notifier.idle_time = 0.05
+        unblock = threading.Event()
+        posted = threading.Event()
+
+        def post(url, payload):
+            if url == 'http://down':
+                unblock.wait(5)
+            else:
+                posted.set()
+            return True
+
+        with mock.patch.object(notifier, 'post', side_effect=post):
+            notifier.state_changed('http://down', ModelRunInfo(model_run_id='a', state=ModelState.READY))
+            notifier.state_changed('http://up', ModelRunInfo(model_run_id='b', state=ModelState.READY))
+            self.assertTrue(posted.wait(2))
+            unblock.set()
+            # the threads of the callbacks stop when they are idle
+            for _ in range(100):
+                if not notifier._queues:
+                    break
+                time.sleep(0.02)
+        self.assertEqual(notifier._queues, {})
+
+    def test_callback_url_must_be_http(self):
+        schema = OperaAdapterConfig.Schema()
+        self.assertEqual(schema.load({'callback_url': 'http://callback-service:8080/hook'}).callback_url,
+                         'http://callback-service:8080/hook')
+        for url in ['file:///etc/passwd', 'ftp://host/file', 'not a url']:
+            with self.assertRaises(ValidationError):
+                schema.load({'callback_url': url})
+
+
+class TestRunStatusEvents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"MINIO_ENDPOINT": "", "RESULT_DIR": self.tmp.name,
+                                                "WORKSPACE_ROOT": self.tmp.name, "EVENTS_KEEPALIVE": "0.05"})
+        self.env.start()
+        self.post = mock.patch('tno.aimms_adapter.model.run_events.WebhookNotifier.post')
+        self.post.start()
+        self.opera = Opera()
+        self.model_run_id = self.opera.request().model_run_id
+        self.opera.initialize(self.model_run_id, OperaAdapterConfig(callback_url='http://cb'))
+
+    def tearDown(self):
+        self.post.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def finish(self):
+        self.opera.finish_run(self.model_run_id, ModelRunInfo(model_run_id=self.model_run_id,
+                                                              state=ModelState.SUCCEEDED, result={'esdl': ESDL}))
+
+    def test_long_poll_returns_on_change_of_state(self):
+        threading.Timer(0.05, self.finish).start()
+        info = self.opera.wait_for_status(self.model_run_id, wait=5)
+        self.assertEqual(info.state, ModelState.SUCCEEDED)
+
+    def test_long_poll_returns_after_wait(self):
+        info = self.opera.wait_for_status(self.model_run_id, wait=0.05)
+        self.assertEqual(info.state, ModelState.READY)
+        # the client already knows a different state
+        info = self.opera.wait_for_status(self.model_run_id, wait=5, state=ModelState.ACCEPTED)
+        self.assertEqual(info.state, ModelState.READY)
+
+    def test_watch(self):
+        events = self.opera.watch(self.model_run_id)
+        self.assertEqual(next(events)[1].state, ModelState.READY)
+        self.assertEqual(next(events), (None, None))  # keepalive
+        threading.Timer(0.01, self.finish).start()
+        event, info = next(events)
+        self.assertEqual(event, 'status')
+        self.assertEqual(info.state, ModelState.SUCCEEDED)
+        self.assertEqual(info.result, {'path': self.opera.result_path(self.model_run_id)})
+        self.assertEqual(list(events), [])
+
+    def test_changes_are_reported_to_callback_url(self):
+        with mock.patch.object(self.opera.webhooks, '_send') as send:
+            self.opera.progress_changed(self.model_run_id, OperaAdapterConfig(callback_url='http://cb'),
+                                        AimmsProgress(lines=3))
+            self.finish()
+        self.assertEqual([(c.args[0], c.args[1]) for c in send.call_args_list],
+                         [('http://cb', 'progress'), ('http://cb', 'status')])
+        info = send.call_args.args[2]
+        self.assertEqual(info.state, ModelState.SUCCEEDED)
+        self.assertEqual(info.result, {'path': self.opera.result_path(self.model_run_id)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.types import ModelRunInfo, ModelState, OperaAdapterConfig
+
+ESDL = '<?xml version="1.0" encoding="UTF-8"?><esdl:EnergySystem xmlns:esdl="http://www.tno.nl/esdl" name="result"/>'
+
+
+class TestRunResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"MINIO_ENDPOINT": "", "RESULT_DIR": self.tmp.name,
+                                                "WORKSPACE_ROOT": self.tmp.name, "MAX_FINISHED_RUNS": "2",
+                                                "MAX_WORKERS": "3"})
+        self.env.start()
+        self.opera = Opera()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def finished_run(self, output_esdl_file_path=None) -> str:
+        model_run_id = self.opera.request().model_run_id
+        self.opera.initialize(model_run_id, OperaAdapterConfig(output_esdl_file_path=output_esdl_file_path))
+        self.opera.finish_run(model_run_id, ModelRunInfo(model_run_id=model_run_id, state=ModelState.SUCCEEDED,
+                                                         result={'esdl': ESDL}))
+        return model_run_id
+
+    def test_result_is_stored_when_run_finishes(self):
+        output = 'file://' + os.path.join(self.tmp.name, 'out', 'result.esdl')
+        model_run_id = self.finished_run(output)
+        self.assertEqual(self.opera.model_run_dict[model_run_id].result, {'path': output})
+        with open(output[7:]) as f:
+            self.assertEqual(f.read(), ESDL)
+
+        status = self.opera.status(model_run_id)
+        self.assertEqual(status.state, ModelState.SUCCEEDED)
+        self.assertIsNone(status.result)
+        results = self.opera.results(model_run_id)
+        self.assertEqual(results.state, ModelState.SUCCEEDED)
+        self.assertEqual(results.result, {'path': output})
+
+    def test_result_without_output_path_is_stored_in_result_dir(self):
+        model_run_id = self.finished_run()
+        path = self.opera.results(model_run_id).result['path']
+        self.assertEqual(path, 'file://' + os.path.join(self.tmp.name, model_run_id + '.esdl'))
+        self.opera.remove(model_run_id)
+        self.assertFalse(os.path.exists(path[7:]))
+
+    def test_oldest_finished_runs_are_evicted(self):
+        first = self.finished_run()
+        second = self.finished_run()
+        third = self.finished_run()
+        self.assertNotIn(first, self.opera.model_run_dict)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, first + '.esdl')))
+        self.assertEqual(self.opera.status(second).state, ModelState.SUCCEEDED)
+        self.assertEqual(self.opera.status(third).state, ModelState.SUCCEEDED)
+
+    def test_failed_run_keeps_reason(self):
+        model_run_id = self.opera.request().model_run_id
+        self.opera.finish_run(model_run_id, ModelRunInfo(model_run_id=model_run_id, state=ModelState.ERROR,
+                                                         reason="AIMMS failed"))
+        status = self.opera.status(model_run_id)
+        self.assertEqual((status.state, status.reason), (ModelState.ERROR, "AIMMS failed"))
+        self.assertEqual(self.opera.results(model_run_id).result, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from tno.aimms_adapter.model import opera as opera_module
+from tno.aimms_adapter.model.opera import Opera
+from tno.aimms_adapter.model.run_store import SQLiteRunStore, PROCESS, PROCESS_ID, process_alive, owner_alive, \
+    create_run_store, MemoryRunStore
+from tno.aimms_adapter.types import ModelRun, ModelState, OperaAdapterConfig
+
+
+def stopped_process_id() -> str:
+    """Owner of a run whose adapter process no longer exists"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+class TestSQLiteRunStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteRunStore(os.path.join(self.tmp.name, 'runs.db'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        run = ModelRun(state=ModelState.READY, config=OperaAdapterConfig(input_esdl_file_path='file://in.esdl',
+                                                                         priority=2),
+                       result=None, created_at=1.5, owner=PROCESS_ID)
+        self.store['a'] = run
+        self.assertIn('a', self.store)
+        self.assertEqual(self.store['a'], run)
+        self.assertEqual(list(self.store), ['a'])
+
+        run.state = ModelState.SUCCEEDED
+        run.result = {'path': 'file://out.esdl'}
+        self.store['a'] = run
+        self.assertEqual(self.store['a'].result, {'path': 'file://out.esdl'})
+        self.assertEqual(len(self.store), 1)
+
+        self.assertEqual(self.store.pop('a').state, ModelState.SUCCEEDED)
+        self.assertNotIn('a', self.store)
+        self.assertIsNone(self.store.get('a'))
+
+    def test_claim(self):
+        self.store['a'] = ModelRun(state=ModelState.PENDING, config=None, result=None, owner='other:1')
+        self.assertFalse(self.store.claim('a', 'another:2'))
+        self.assertTrue(self.store.claim('a', 'other:1'))
+        self.assertEqual(self.store['a'].owner, PROCESS_ID)
+        self.assertEqual(self.store['a'].owner_process, PROCESS)
+        # the run is no longer owned by the expected owner
+        self.assertFalse(self.store.claim('a', 'other:1'))
+        self.assertFalse(self.store.claim('unknown', None))
+
+    def test_create_run_store(self):
+        self.assertIsInstance(create_run_store('memory'), MemoryRunStore)
+        self.assertIsInstance(create_run_store('sqlite:///' + os.path.join(self.tmp.name, 'x.db')), SQLiteRunStore)
+        with self.assertRaises(ValueError):
+            create_run_store('ftp://runs')
+
+    def test_process_alive(self):
+        self.assertTrue(process_alive(PROCESS))
+        self.assertTrue(process_alive('some-other-host:1'))
+        self.assertFalse(process_alive(stopped_process_id()))
+
+    def test_owner_alive(self):
+        def run(owner, owner_process=None):
+            return ModelRun(state=ModelState.QUEUED, config=None, result=None, owner=owner, owner_process=owner_process)
+
+        self.assertTrue(owner_alive(run(PROCESS_ID, PROCESS)))
+        self.assertFalse(owner_alive(run(None)))
+        # the same host and pid before a restart of the container
+        self.assertFalse(owner_alive(run(f"{PROCESS}:0123456789abcdef", PROCESS)))
+        self.assertFalse(owner_alive(run(f"{stopped_process_id()}:0123456789abcdef", stopped_process_id())))
+        self.assertTrue(owner_alive(run('some-other-host:1:0123456789abcdef', 'some-other-host:1')))
+        # stored before the owner had a token
+        self.assertFalse(owner_alive(run(stopped_process_id())))
+        self.assertTrue(owner_alive(run('some-other-host:1')))
+
+
+class TestPersistentRuns(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {
+            "MINIO_ENDPOINT": "", "RESULT_DIR": self.tmp.name, "WORKSPACE_ROOT": self.tmp.name, "MAX_WORKERS": "1",
+            "RUN_STORE": "sqlite:///" + os.path.join(self.tmp.name, 'runs.db')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_runs_are_shared_between_adapters(self):
+        first = Opera()
+        model_run_id = first.request().model_run_id
+        self.assertEqual(first.model_run_dict[model_run_id].owner, PROCESS_ID)
+
+        second = Opera()
+        self.assertEqual(second.status(model_run_id).state, ModelState.ACCEPTED)
+        self.assertIsNotNone(second.model_run_dict[model_run_id].created_at)
+        first.remove(model_run_id)
+        self.assertEqual(second.status(model_run_id).state, ModelState.ERROR)
+
+    def test_run_of_other_process_is_taken_over(self):
+        opera = Opera()
+        opera.model_run_dict['a'] = ModelRun(state=ModelState.ACCEPTED, config=None, result=None,
+                                             owner='some-other-host:1')
+        info = opera.initialize('a', OperaAdapterConfig(input_esdl_file_path='file://in.esdl'))
+        self.assertEqual(info.state, ModelState.READY)
+        self.assertEqual(opera.model_run_dict['a'].owner, PROCESS_ID)
+        self.assertIsNotNone(opera.scheduler.slot_of('a'))
+
+        # the other process frees its slot for the run on its next request
+        other = Opera()
+        other.scheduler.admit('b')
+        other.model_run_dict['b'] = ModelRun(state=ModelState.ACCEPTED, config=None, result=None, owner='x:1')
+        self.assertEqual(other.request().state, ModelState.ACCEPTED)
+        self.assertIsNone(other.scheduler.slot_of('b'))
+
+    def queued_run(self, opera: Opera):
+        """Requests a run that waits for the worker slot of a first run, returns both and the waiting thread"""
+        config = OperaAdapterConfig(input_esdl_file_path='file://in.esdl')
+        first = opera.request().model_run_id
+        queued = opera.request().model_run_id
+        model_run = opera.model_run_dict[queued]
+        model_run.state = ModelState.QUEUED
+        model_run.config = config
+        opera.model_run_dict[queued] = model_run
+        thread = threading.Thread(target=opera.threaded_run, args=(queued, config), daemon=True)
+        thread.start()
+        return first, queued, thread
+
+    def test_run_cancelled_by_other_process_is_not_started(self):
+        opera = Opera()
+        with mock.patch.object(opera, 'start_aimms_model') as start_aimms_model:
+            first, queued, thread = self.queued_run(opera)
+            self.assertEqual(Opera().cancel(queued).reason, "Run was cancelled")
+            # the slot of the first run goes to the cancelled run, which gives it up without starting AIMMS
+            opera.cancel(first)
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        start_aimms_model.assert_not_called()
+        self.assertEqual(opera.model_run_dict[queued].state, ModelState.ERROR)
+        self.assertEqual(opera.model_run_dict[queued].reason, "Run was cancelled")
+        self.assertIsNone(opera.scheduler.slot_of(queued))
+        self.assertEqual(opera.scheduler.runs(), set())
+
+    def test_run_cancelled_by_other_process_is_discarded(self):
+        opera = Opera()
+        with mock.patch.object(opera, 'start_aimms_model') as start_aimms_model:
+            first, queued, thread = self.queued_run(opera)
+            Opera().cancel(queued)
+            # the next request frees the place of the cancelled run in the queue
+            self.assertEqual(opera.request().state, ModelState.PENDING)
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        start_aimms_model.assert_not_called()
+        self.assertEqual(opera.model_run_dict[queued].reason, "Run was cancelled")
+        self.assertNotIn(queued, opera.scheduler.runs())
+
+    def test_recover_runs(self):
+        # the flask executor proxy cannot be patched by mock.patch, replace it for this test
+        executor = mock.Mock()
+        self.addCleanup(setattr, opera_module, 'executor', opera_module.executor)
+        opera_module.executor = executor
+        stopped = stopped_process_id()
+        config = OperaAdapterConfig(input_esdl_file_path='file://in.esdl')
+        opera = Opera()
+        for created_at, (model_run_id, state, owner) in enumerate([('queued', ModelState.QUEUED, stopped),
+                                                                   ('running', ModelState.RUNNING, stopped),
+                                                                   ('alive', ModelState.QUEUED, 'some-other-host:1'),
+                                                                   ('pending', ModelState.PENDING, stopped)]):
+            opera.model_run_dict[model_run_id] = ModelRun(state=state, config=config, result=None,
+                                                          created_at=created_at, owner=owner)
+        # queued by an adapter with the same host:pid as this one, before a restart of its container
+        opera.model_run_dict['restarted'] = ModelRun(state=ModelState.QUEUED, config=config, result=None, created_at=4,
+                                                     owner=f"{PROCESS}:0123456789abcdef", owner_process=PROCESS)
+
+        opera.recover_runs()
+
+        self.assertEqual(opera.model_run_dict['queued'].owner, PROCESS_ID)
+        self.assertEqual(opera.model_run_dict['queued'].state, ModelState.QUEUED)
+        executor.submit_stored.assert_any_call('queued', opera.threaded_run, 'queued', config)
+        self.assertEqual(opera.model_run_dict['running'].state, ModelState.ERROR)
+        self.assertIsNotNone(opera.model_run_dict['running'].finished_at)
+        self.assertEqual(opera.model_run_dict['alive'].owner, 'some-other-host:1')
+        # the single worker slot is taken by the queued run
+        self.assertEqual(opera.model_run_dict['pending'].state, ModelState.PENDING)
+        self.assertEqual(opera.scheduler.position('pending'), 1)
+        self.assertEqual(opera.model_run_dict['restarted'].owner, PROCESS_ID)
+        executor.submit_stored.assert_called_with('restarted', opera.threaded_run, 'restarted', config)
+        self.assertEqual(opera.scheduler.position('restarted'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
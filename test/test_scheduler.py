@@ -0,0 +1,60 @@
+import threading
+import unittest
+
+from tno.aimms_adapter.model.scheduler import RunScheduler, QueueFullException
+
+
+class TestRunScheduler(unittest.TestCase):
+    def test_admit_and_queue(self):
+        scheduler = RunScheduler(slots=2, max_pending=1)
+        self.assertEqual(scheduler.admit('a').index, 0)
+        self.assertEqual(scheduler.admit('b').index, 1)
+        self.assertIsNone(scheduler.admit('c'))
+        self.assertEqual(scheduler.position('c'), 1)
+        with self.assertRaises(QueueFullException):
+            scheduler.admit('d')
+
+    def test_release_promotes_by_priority(self):
+        scheduler = RunScheduler(slots=1, max_pending=10)
+        scheduler.admit('a')
+        scheduler.admit('b')
+        scheduler.admit('c')
+        scheduler.reprioritize('c', -1)
+        self.assertEqual(scheduler.release('a'), 'c')
+        self.assertEqual(scheduler.slot_of('c').index, 0)
+        self.assertEqual(scheduler.position('b'), 1)
+
+    def test_waiting_run_is_woken_on_release(self):
+        scheduler = RunScheduler(slots=1, max_pending=10)
+        scheduler.admit('a')
+        scheduler.admit('b')
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(slot=scheduler.wait_for_slot('b')))
+        waiter.start()
+        scheduler.release('a')
+        waiter.join(timeout=5)
+        self.assertEqual(result['slot'].index, 0)
+
+    def test_discard_running_run_keeps_slot(self):
+        scheduler = RunScheduler(slots=1, max_pending=10)
+        scheduler.admit('a')
+        scheduler.admit('b')
+        scheduler.wait_for_slot('a')
+        self.assertIsNone(scheduler.discard('a'))
+        self.assertIsNone(scheduler.slot_of('b'))
+        self.assertEqual(scheduler.release('a'), 'b')
+
+    def test_discard_pending_run_wakes_waiter(self):
+        scheduler = RunScheduler(slots=1, max_pending=10)
+        scheduler.admit('a')
+        scheduler.admit('b')
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(slot=scheduler.wait_for_slot('b')))
+        waiter.start()
+        scheduler.discard('b')
+        waiter.join(timeout=5)
+        self.assertIsNone(result['slot'])
+
+
+if __name__ == '__main__':
+    unittest.main()
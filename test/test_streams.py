@@ -0,0 +1,33 @@
+import gzip
+import unittest
+
+from tno.aimms_adapter.model.streams import EncodedTextStream
+
+TEXT = '<?xml version="1.0" encoding="UTF-8"?>\n' + ''.join(f'<asset name="Zonnepark {i} – é"/>\n' for i in range(5000))
+
+
+class TestEncodedTextStream(unittest.TestCase):
+    def read_in_parts(self, stream, part_size: int) -> bytes:
+        parts = []
+        while True:
+            part = stream.read(part_size)
+            if not part:
+                return b''.join(parts)
+            self.assertLessEqual(len(part), part_size)
+            parts.append(part)
+
+    def test_encodes_in_chunks(self):
+        stream = EncodedTextStream(TEXT, chunk_size=1000)
+        self.assertEqual(self.read_in_parts(stream, 4096), TEXT.encode('utf-8'))
+
+    def test_gzip(self):
+        stream = EncodedTextStream(TEXT, gzip=True, chunk_size=1000)
+        self.assertEqual(gzip.decompress(self.read_in_parts(stream, 777)).decode('utf-8'), TEXT)
+
+    def test_read_all(self):
+        self.assertEqual(EncodedTextStream('').read(), b'')
+        self.assertEqual(EncodedTextStream(TEXT).read(), TEXT.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
+import os
 import unittest
+from datetime import datetime, timezone
+from unittest import mock
 
 from dotenv import load_dotenv
+from esdl import esdl
 from esdl.esdl_handler import EnergySystemHandler
 
-from tno.aimms_adapter.universal_link.universal_link import UniversalLink
+from tno.aimms_adapter.universal_link.universal_link import UniversalLink, infile_field, comparable, table_key, \
+    TableChanges, schema_comment
+
+ESDL = '<?xml version="1.0" encoding="UTF-8"?><esdl:EnergySystem xmlns:esdl="http://www.tno.nl/esdl" name="es"/>'
 
 
 class MyTestCase(unittest.TestCase):
@@ -18,5 +25,151 @@ class MyTestCase(unittest.TestCase):
         print(success, errormsg)
 
 
+@mock.patch('tno.aimms_adapter.universal_link.universal_link.create_engine')
+class TestBulkLoad(unittest.TestCase):
+    rows = [('a', esdl.PowerPlantTypeEnum.NUCLEAR_3RD_GENERATION, 1.5, None, True),
+            ('b', 'tab\there', 2, 'back\\slash', False),
+            ('c', 'line\nbreak', None, None, None)]
+
+    def test_insert_batches(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', load_method='insert', batch_size=2)
+        ul.bulk_load(['Producers', 'Empty'], [self.rows, []])
+        calls = ul.cursor.execute.call_args_list
+        self.assertEqual(len(calls), 2)
+        query, params = calls[0].args
+        self.assertEqual(query, "INSERT INTO `db`.`Producers` VALUES (%s,%s,%s,%s,%s),(%s,%s,%s,%s,%s)")
+        self.assertEqual(params[:5], ['a', 'NUCLEAR_3RD_GENERATION', 1.5, None, True])
+        self.assertEqual(calls[1].args[0], "INSERT INTO `db`.`Producers` VALUES (%s,%s,%s,%s,%s)")
+        ul.conn.commit.assert_called_once()
+
+    def test_load_data_infile(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', load_method='infile')
+        self.assertEqual(create_engine.call_args.kwargs['connect_args'], {'local_infile': True})
+        loaded = []
+
+        def execute(query, args):
+            with open(args[0], encoding='utf8') as f:
+                loaded.append((query, f.read()))
+        ul.cursor.execute.side_effect = execute
+        ul.bulk_load(['Producers'], [self.rows])
+
+        query, data = loaded[0]
+        self.assertEqual(query, "LOAD DATA LOCAL INFILE %s INTO TABLE `db`.`Producers` CHARACTER SET utf8mb4")
+        self.assertEqual(data.split('\n'), ['a\tNUCLEAR_3RD_GENERATION\t1.5\t\\N\t1',
+                                            'b\ttab\\there\t2\tback\\\\slash\t0',
+                                            'c\tline\\nbreak\t\\N\t\\N\t\\N', ''])
+        self.assertEqual(infile_field(None), '\\N')
+
+    def test_failed_load_is_rolled_back(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', load_method='insert')
+        ul.cursor.execute.side_effect = [None, RuntimeError("duplicate key")]
+        with self.assertRaises(RuntimeError):
+            ul.bulk_load(['Producers', 'Consumers'], [self.rows, self.rows])
+        ul.conn.rollback.assert_called_once()
+        ul.conn.commit.assert_not_called()
+
+    def test_database_is_created_once(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', load_method='insert')
+        tables = (['Producers', 'Consumers'], [('id varchar(100) Primary key',), ('id varchar(100) Primary key',)],
+                  [[('p1',), ('p2',)], [('c1',)]])
+        with mock.patch.object(ul, 'parse_esdl', return_value=tables):
+            success, error = ul.esdl_to_db(ESDL)
+        self.assertTrue(success, error)
+        queries = [c.args[0] for c in ul.cursor.execute.call_args_list]
+        self.assertEqual(queries, ['DROP DATABASE IF EXISTS db;', 'create database db;',
+                                   'create table Producers(id varchar(100) Primary key) '
+                                   f"COMMENT='{schema_comment(tables[1][0])}'",
+                                   'create table Consumers(id varchar(100) Primary key) '
+                                   f"COMMENT='{schema_comment(tables[1][1])}'",
+                                   'INSERT INTO `db`.`Producers` VALUES (%s),(%s)',
+                                   'INSERT INTO `db`.`Consumers` VALUES (%s)'])
+        ul.conn.commit.assert_called_once()
+
+
+@mock.patch('tno.aimms_adapter.universal_link.universal_link.create_engine')
+class TestIncrementalUpdate(unittest.TestCase):
+    producers = ('id varchar(100) Primary key', 'power DOUBLE', 'INDEX (power)')
+    arcs = ('Node1_id varchar(100)', 'carrier varchar(100)')
+
+    def test_update_changed_rows(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', update_mode='incremental')
+        cursor = ul.cursor
+        cursor.fetchall.side_effect = [
+            # INFORMATION_SCHEMA
+            [('Producers', schema_comment(self.producers)), ('Arcs', schema_comment(self.arcs)), ('Old', '')],
+            [('p1', 1.0), ('p2', 2.0), ('p4', 4.0)],  # Producers
+            [('a', 'x'), ('a', 'x')],  # Arcs
+        ]
+        cursor.fetchone.return_value = (4,)  # rows in Old
+        tables = (['Producers', 'Arcs', 'Consumers'], [self.producers, self.arcs, ('id varchar(100) Primary key',)],
+                  [[('p1', 1), ('p2', 3.0), ('p3', None)], [('a', 'x'), ('b', 'y')], [('c1',)]])
+        with mock.patch.object(ul, 'parse_esdl', return_value=tables):
+            success, summary = ul.esdl_to_db(ESDL)
+        self.assertTrue(success, summary)
+        self.assertEqual(ul.changes, {'Consumers': TableChanges(inserted=1, recreated=True),
+                                      'Old': TableChanges(deleted=4),
+                                      'Producers': TableChanges(inserted=1, updated=1, deleted=1),
+                                      'Arcs': TableChanges(inserted=1, deleted=1)})
+        self.assertIn('Producers: 1 inserted, 1 updated, 1 deleted', summary)
+
+        queries = [c.args[0] for c in cursor.execute.call_args_list]
+        self.assertNotIn('DROP DATABASE IF EXISTS db;', queries)
+        self.assertIn("CREATE TABLE `db`.`Consumers` (id varchar(100) Primary key) "
+                      f"COMMENT='{schema_comment(('id varchar(100) Primary key',))}'", queries)
+        self.assertIn('DROP TABLE `db`.`Old`', queries)
+        self.assertIn(mock.call('INSERT INTO `db`.`Producers` VALUES (%s,%s)', ['p3', None]),
+                      cursor.execute.call_args_list)
+        self.assertIn(mock.call('INSERT INTO `db`.`Arcs` VALUES (%s,%s)', ['b', 'y']), cursor.execute.call_args_list)
+        self.assertEqual([c.args for c in cursor.executemany.call_args_list], [
+            ('UPDATE `db`.`Producers` SET `power` = %s WHERE `id` = %s', [[3.0, 'p2']]),
+            ('DELETE FROM `db`.`Producers` WHERE `id` = %s', [['p4']]),
+            ('DELETE FROM `db`.`Arcs` WHERE `Node1_id` <=> %s AND `carrier` <=> %s LIMIT 1', [['a', 'x']])])
+        ul.conn.commit.assert_called_once()
+
+    def test_unchanged_database(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', update_mode='incremental')
+        ul.cursor.fetchall.side_effect = [[('Producers', schema_comment(self.producers))], [('p1', 1.0)]]
+        with mock.patch.object(ul, 'parse_esdl', return_value=(['Producers'], [self.producers], [[('p1', 1)]])):
+            self.assertEqual(ul.esdl_to_db(ESDL), (True, 'no changes'))
+        ul.cursor.executemany.assert_not_called()
+
+    def test_changed_definition_recreates_table(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', update_mode='incremental')
+        # same columns and data types, but a longer varchar, another key or no index
+        for old in [('id varchar(50) Primary key', 'power DOUBLE', 'INDEX (power)'),
+                    ('id varchar(100)', 'power DOUBLE', 'INDEX (power)'),
+                    ('id varchar(100) Primary key', 'power DOUBLE')]:
+            ul.cursor.reset_mock()
+            ul.cursor.fetchall.side_effect = [[('Producers', schema_comment(old))]]
+            with mock.patch.object(ul, 'parse_esdl', return_value=(['Producers'], [self.producers], [[('p1', 1)]])):
+                self.assertEqual(ul.esdl_to_db(ESDL), (True, 'Producers: 1 inserted, 0 updated, 0 deleted (recreated)'))
+            queries = [c.args[0] for c in ul.cursor.execute.call_args_list]
+            self.assertIn('DROP TABLE `db`.`Producers`', queries)
+
+    def test_duplicate_keys_are_rejected(self, create_engine):
+        ul = UniversalLink(host='h', database='db', user='u', password='p', update_mode='incremental')
+        ul.cursor.fetchall.side_effect = [[('Producers', schema_comment(self.producers))], [('p1', 1.0)]]
+        rows = [('p1', 1), ('p2', 2.0), ('p2', 3.0)]
+        with mock.patch.object(ul, 'parse_esdl', return_value=(['Producers'], [self.producers], [rows])):
+            success, error = ul.esdl_to_db(ESDL)
+        self.assertFalse(success)
+        self.assertIn("Table Producers has 1 duplicate primary keys (id), e.g. ('p2',)", error)
+        ul.cursor.executemany.assert_not_called()
+        ul.conn.rollback.assert_called_once()
+        ul.conn.commit.assert_not_called()
+
+    def test_comparable(self, create_engine):
+        self.assertEqual(comparable(esdl.AssetStateEnum.ENABLED, "ENUM('ENABLED','DISABLED')"), 'ENABLED')
+        self.assertEqual(comparable(True, 'BOOLEAN'), 1)
+        self.assertEqual(comparable(2, 'varchar(100)'), '2')
+        self.assertEqual(comparable('abc', 'varchar(2)'), 'ab')
+        self.assertEqual(comparable(datetime(2030, 1, 1, 0, 0, 0, 600000, tzinfo=timezone.utc), 'DATETIME'),
+                         datetime(2030, 1, 1, 0, 0, 1))
+        self.assertEqual(table_key(self.producers), ('id',))
+        self.assertEqual(table_key(('Node1_id varchar(100)', 'PRIMARY KEY (Node1_id, Node2_id)')),
+                         ('Node1_id', 'Node2_id'))
+        self.assertEqual(table_key(self.arcs), ())
+
+
 if __name__ == '__main__':
     unittest.main()
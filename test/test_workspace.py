@@ -0,0 +1,55 @@
+import configparser
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tno.aimms_adapter.model.workspace import RunWorkspace
+
+
+class TestRunWorkspace(unittest.TestCase):
+    def test_workspaces_are_isolated_and_removed(self):
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.dict(os.environ, {"WORKSPACE_ROOT": root, "AIMMS_RUN_FILE": "True"}):
+            first = RunWorkspace("run-1")
+            second = RunWorkspace("run-2")
+            self.assertNotEqual(first.access_database, second.access_database)
+            self.assertNotEqual(first.opera_output_folder, second.opera_output_folder)
+
+            first.create()
+            self.assertTrue(os.path.isdir(first.opera_output_folder))
+            with open(os.path.join(first.opera_output_folder, "Capacity.csv"), 'w') as f:
+                f.write("stale")
+            first.create()
+            self.assertEqual(os.listdir(first.opera_output_folder), [])
+
+            run = configparser.ConfigParser()
+            run.optionxform = str
+            run.read(first.run_file)
+            self.assertEqual(run['Opera']['AccessDatabase'], first.access_database)
+            self.assertEqual(run['Opera']['OutputFolder'], first.opera_output_folder)
+            self.assertIn(f"Dbq={first.access_database};", run['Opera']['ConnectionString'])
+
+            first.cleanup()
+            self.assertFalse(os.path.exists(first.working_dir))
+
+    def test_fixed_paths_without_run_file(self):
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.dict(os.environ, {"WORKSPACE_ROOT": root, "AIMMS_RUN_FILE": "False", "MAX_WORKERS": "4",
+                                             "OPERA_OUTPUT_FOLDER": os.path.join(root, "output")}):
+            from tno.aimms_adapter.settings import EnvSettings
+            self.assertEqual(EnvSettings.max_workers(), 1)
+            first = RunWorkspace("run-1")
+            second = RunWorkspace("run-2")
+            self.assertEqual(first.access_database, second.access_database)
+            self.assertEqual(first.opera_output_folder, os.path.join(root, "output"))
+            os.makedirs(first.opera_output_folder)
+            with open(os.path.join(first.opera_output_folder, "Capacity.csv"), 'w') as f:
+                f.write("stale")
+            first.create()
+            self.assertEqual(os.listdir(first.opera_output_folder), [])
+            self.assertFalse(os.path.exists(first.run_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,6 +35,8 @@ def create_app(object_name):
 
     env.init_app(app, env_file=".env")
     api.init_app(app)
+    # queued runs wait for a worker slot inside an executor thread
+    app.config.setdefault("EXECUTOR_MAX_WORKERS", EnvSettings.max_workers() + EnvSettings.max_pending_runs())
     executor.init_app(app)
 
     # Register blueprints.
@@ -46,12 +48,21 @@ def create_app(object_name):
 
     CORS(app, resources={r"/*": {"origins": "*"}})
 
+    from tno.aimms_adapter.model.object_store import object_store
+    object_store.start_health_probe(EnvSettings.minio_health_interval())
+
+    if EnvSettings.recover_runs():
+        from tno.aimms_adapter.apis.model_api import opera
+        # recovered runs are submitted to the executor, which copies the request context into its threads
+        with app.test_request_context():
+            opera.recover_runs()
+
     if EnvSettings.registry_endpoint():
         logger.info(f"Registering with MM Registry at {EnvSettings.registry_endpoint()}")
 
         # Register adapter to MM Registry
         registry_data = {"uri": EnvSettings.external_url(), "used_workers": 0, "name": "AIMMS-adapter-opera",
-                         "owner": "TNO", "version": "1.0", "max_workers": 1}
+                         "owner": "TNO", "version": "1.0", "max_workers": EnvSettings.max_workers()}
 
         try:
             r = requests.post(EnvSettings.registry_endpoint(), json=registry_data)
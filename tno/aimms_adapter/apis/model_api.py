@@ -1,10 +1,12 @@
-from flask import jsonify
+import json
+
+from flask import jsonify, Response, stream_with_context
 from flask_smorest import Blueprint
 from flask.views import MethodView
 
 from tno.aimms_adapter.model.opera import Opera
 from tno.shared.log import get_logger
-from tno.aimms_adapter.types import ModelRunInfo, OperaAdapterConfig
+from tno.aimms_adapter.types import ModelRunInfo, OperaAdapterConfig, StatusQuery
 
 opera = Opera()
 
@@ -44,12 +46,33 @@ class Run(MethodView):
 @api.route("/status/<model_run_id>")
 class Status(MethodView):
 
+    @api.arguments(StatusQuery.Schema(), location="query")
     @api.response(200, ModelRunInfo.Schema())
-    def get(self, model_run_id: str):
-        res = opera.status(model_run_id=model_run_id)
+    def get(self, query, model_run_id: str):
+        if query.wait:
+            # long-poll: answer as soon as the state changes
+            res = opera.wait_for_status(model_run_id=model_run_id, wait=query.wait, state=query.state)
+        else:
+            res = opera.status(model_run_id=model_run_id)
         return jsonify(res)
 
 
+@api.route("/events/<model_run_id>")
+class Events(MethodView):
+
+    def get(self, model_run_id: str):
+        """Streams the changes of state and the progress of a run as Server-Sent Events, until the run finishes"""
+        def stream():
+            for event, info in opera.watch(model_run_id=model_run_id):
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {event}\ndata: {json.dumps(ModelRunInfo.Schema().dump(info))}\n\n"
+
+        return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @api.route("/results/<model_run_id>")
 class Results(MethodView):
 
@@ -59,6 +82,15 @@ class Results(MethodView):
         return jsonify(res)
 
 
+@api.route("/cancel/<model_run_id>")
+class Cancel(MethodView):
+
+    @api.response(200, ModelRunInfo.Schema())
+    def get(self, model_run_id: str):
+        res = opera.cancel(model_run_id=model_run_id)
+        return jsonify(res)
+
+
 @api.route("/remove/<model_run_id>")
 class Remove(MethodView):
 
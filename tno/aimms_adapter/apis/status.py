@@ -1,5 +1,7 @@
+from flask import jsonify
 from flask_smorest import Blueprint
 from flask.views import MethodView
+from tno.aimms_adapter.model.object_store import object_store
 from tno.shared.log import get_logger
 
 logger = get_logger(__name__)
@@ -11,3 +13,11 @@ api = Blueprint("status", "status", url_prefix="/status")
 class Status(MethodView):
     def get(self):
         return "OK!"
+
+
+@api.route("/health")
+class Health(MethodView):
+    def get(self):
+        minio = object_store.health()
+        healthy = not minio["configured"] or minio["healthy"]
+        return jsonify({"status": "OK" if healthy else "DEGRADED", "minio": minio}), 200 if healthy else 503
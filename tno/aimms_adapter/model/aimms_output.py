@@ -0,0 +1,93 @@
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Deque, IO, List, Optional
+
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+# progress markers in the AIMMS and solver (e.g. CPLEX) output
+PHASE_RE = re.compile(r'\b(presolve|barrier|crossover|dual simplex|primal simplex|simplex|branch and bound|'
+                      r'MIP search|postsolve|solving|writing results)\b', re.IGNORECASE)
+ITERATION_RE = re.compile(r'\biter(?:ation)?s?\b\s*[:=]?\s*(\d+)', re.IGNORECASE)
+OBJECTIVE_RE = re.compile(r'\bobj(?:ective)?(?:\s+value)?\s*[:=]\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)',
+                          re.IGNORECASE)
+
+
+@dataclass
+class AimmsProgress:
+    phase: Optional[str] = None
+    iteration: Optional[int] = None
+    objective: Optional[float] = None
+    lines: int = 0  # number of output lines read
+    last_line: Optional[str] = None
+    last_output_time: Optional[float] = None  # time.monotonic() of the last output line
+
+    def update(self, line: str):
+        self.lines += 1
+        self.last_line = line
+        self.last_output_time = time.monotonic()
+        phase = PHASE_RE.search(line)
+        if phase:
+            self.phase = phase.group(1).lower()
+        iteration = ITERATION_RE.search(line)
+        if iteration:
+            self.iteration = int(iteration.group(1))
+        objective = OBJECTIVE_RE.search(line)
+        if objective:
+            try:
+                self.objective = float(objective.group(1))
+            except ValueError:
+                pass
+
+    def to_dict(self) -> dict:
+        progress = asdict(self)
+        del progress['last_output_time']
+        return progress
+
+
+class AimmsOutputReader:
+    """
+    Consumes the output of an AIMMS process in a separate thread. Every line is written to the log file of the run,
+    only the most recent lines are kept in memory, and progress markers are parsed from the output, so the status
+    of a run can be queried while AIMMS is solving.
+    """
+
+    def __init__(self, stream: IO[str], log_file: str, buffer_size: int = 200):
+        self.stream = stream
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self._progress = AimmsProgress()
+        self._recent: Deque[str] = deque(maxlen=buffer_size)
+        self._thread = threading.Thread(target=self._read, name="aimms-output-reader", daemon=True)
+
+    def start(self):
+        self._progress.last_output_time = time.monotonic()
+        self._thread.start()
+        return self
+
+    def join(self, timeout: float = None):
+        self._thread.join(timeout)
+
+    def progress(self) -> AimmsProgress:
+        """Returns a copy of the current progress"""
+        with self._lock:
+            return AimmsProgress(**asdict(self._progress))
+
+    def tail(self) -> List[str]:
+        """Returns the most recent lines of output"""
+        with self._lock:
+            return list(self._recent)
+
+    def _read(self):
+        with open(self.log_file, 'w') as aimms_log:
+            for line in self.stream:
+                aimms_log.write(line)
+                line = line.rstrip()
+                logger.debug("AIMMS: %s", line)
+                with self._lock:
+                    self._recent.append(line)
+                    self._progress.update(line)
@@ -0,0 +1,92 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+from tno.aimms_adapter.model.aimms_output import AimmsOutputReader, AimmsProgress
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+
+def new_process_group_kwargs() -> dict:
+    """Popen arguments that start a process in its own process group, so its whole tree can be killed"""
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(process: subprocess.Popen):
+    """Kills a process and all processes it started"""
+    if process.poll() is not None:
+        return
+    logger.info(f"Killing process tree of pid {process.pid}")
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+    except OSError as e:
+        logger.warning(f"Failed to kill process tree of pid {process.pid}: {e}")
+    if process.poll() is None:
+        process.kill()
+
+
+class AimmsProcess:
+    """
+    A running AIMMS process of a model run. Stops the process (and all processes it started) when it exceeds its
+    wall-clock timeout, when it produces no output for longer than its idle timeout or when it is cancelled.
+    Timeouts of 0 or None are disabled.
+    """
+
+    def __init__(self, params: List[str], log_file: str, buffer_size: int, timeout: Optional[float] = None,
+                 idle_timeout: Optional[float] = None, **popen_kwargs):
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.stop_reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.process = subprocess.Popen(params, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                        **new_process_group_kwargs(), **popen_kwargs)
+        self.reader = AimmsOutputReader(self.process.stdout, log_file, buffer_size).start()
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    def stop(self, reason: str):
+        """Kills the process tree, the reason is reported as the cause of the failed run"""
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+        logger.warning(f"Stopping AIMMS: {reason}")
+        kill_process_tree(self.process)
+
+    def wait(self, poll_interval: float = 1.0, on_progress: Optional[Callable[[AimmsProgress], None]] = None) -> int:
+        """
+        Waits for the process to finish while enforcing the timeouts, returns its exit code
+        :param on_progress: called with the progress of AIMMS every poll interval in which it produced output
+        """
+        lines = 0
+        while True:
+            try:
+                self.process.wait(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            progress = self.reader.progress()
+            if on_progress is not None and progress.lines != lines:
+                lines = progress.lines
+                on_progress(progress)
+            if self.timeout and now - self.started > self.timeout:
+                self.stop(f"AIMMS exceeded its run timeout of {self.timeout}s")
+            elif self.idle_timeout and now - progress.last_output_time > self.idle_timeout:
+                self.stop(f"AIMMS produced no output for {self.idle_timeout}s")
+        # a killed tree closes the output pipe, but do not hang on a process that escaped it
+        self.reader.join(timeout=None if self.stop_reason is None else 10)
+        return self.process.returncode
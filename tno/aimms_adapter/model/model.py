@@ -1,10 +1,20 @@
+import os
+import shutil
+import threading
+import time
 from abc import ABC, abstractmethod
-from io import BytesIO
-from typing import Dict
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
 from uuid import uuid4
 
-from minio import Minio
+from minio import Minio, S3Error
 
+from tno.aimms_adapter.model.object_store import object_store
+from tno.aimms_adapter.model.run_events import FINAL_STATES, RunEvents, WebhookNotifier
+from tno.aimms_adapter.model.run_store import create_run_store, PROCESS, PROCESS_ID, RunStore
+from tno.aimms_adapter.model.scheduler import RunScheduler, QueueFullException
+from tno.aimms_adapter.model.streams import EncodedTextStream
+from tno.aimms_adapter.model.workspace import RunWorkspace
 from tno.aimms_adapter.settings import EnvSettings
 from tno.aimms_adapter.types import ModelRun, ModelState, ModelRunInfo
 from tno.shared.log import get_logger
@@ -14,44 +24,81 @@ logger = get_logger(__name__)
 
 class Model(ABC):
     def __init__(self):
-        self.model_run_dict: Dict[str, ModelRun] = {}
-
-        self.minio_client = None
-        if EnvSettings.minio_endpoint():
-            logger.info(f"Connecting to Minio Object Store at {EnvSettings.minio_endpoint()}")
-            self.minio_client = Minio(
-                endpoint=EnvSettings.minio_endpoint(),
-                secure=EnvSettings.minio_secure(),
-                access_key=EnvSettings.minio_access_key(),
-                secret_key=EnvSettings.minio_secret_key()
-            )
-            buckets = self.minio_client.list_buckets()
-
-            for bucket in buckets:
-                logger.info(f" - Bucket: {bucket.name}, created {bucket.creation_date}")
+        # runs by model_run_id, a persistent store is shared with the other adapter processes
+        self.model_run_dict: RunStore = create_run_store()
+        # changes of runs wake up waiting status requests and are reported to the callback_url of the run
+        self.events = RunEvents()
+        self.webhooks = WebhookNotifier()
+        self.model_run_dict.add_listener(self.run_changed)
+        self.lock = threading.RLock()
+        self.scheduler = RunScheduler(slots=EnvSettings.max_workers(), max_pending=EnvSettings.max_pending_runs())
 
-        else:
+        self.known_buckets: Set[str] = set()
+        if not object_store.configured():
             logger.info("No Minio Object Store configured")
 
+    def run_changed(self, model_run_id: str, model_run: ModelRun):
+        self.events.publish(model_run_id)
+        if model_run.config is not None and model_run.config.callback_url:
+            self.webhooks.state_changed(model_run.config.callback_url, ModelRunInfo(
+                model_run_id=model_run_id,
+                state=model_run.state,
+                reason=model_run.reason,
+                result=model_run.result if model_run.state == ModelState.SUCCEEDED else None,
+            ))
+
+    @property
+    def minio_client(self) -> Optional[Minio]:
+        """Shared Minio client, connected on first use"""
+        return object_store.client
+
     def request(self):
         model_run_id = str(uuid4())
-        self.model_run_dict[model_run_id] = ModelRun(
-            state=ModelState.ACCEPTED,
-            config=None,
-            result=None,
-        )
+        self._release_lost_runs()
+        with self.lock:
+            try:
+                slot = self.scheduler.admit(model_run_id)
+            except QueueFullException as e:
+                return ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=ModelState.ERROR,
+                    reason=str(e)
+                )
+            self.model_run_dict[model_run_id] = ModelRun(
+                state=ModelState.ACCEPTED if slot else ModelState.PENDING,
+                config=None,
+                result=None,
+                created_at=time.time(),
+                owner=PROCESS_ID,
+                owner_process=PROCESS,
+            )
 
+        if slot is None:
+            return ModelRunInfo(
+                state=ModelState.PENDING,
+                model_run_id=model_run_id,
+                reason=f"All workers are busy, queued at position {self.scheduler.position(model_run_id)}"
+            )
         return ModelRunInfo(
-            state=self.model_run_dict[model_run_id].state,
+            state=ModelState.ACCEPTED,
             model_run_id=model_run_id,
         )
 
     def initialize(self, model_run_id: str, config=None):
-        if model_run_id in self.model_run_dict:
-            self.model_run_dict[model_run_id].config = config
-            self.model_run_dict[model_run_id].state = ModelState.READY
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
+            model_run = self.adopt(model_run_id, model_run)
+            if config is not None and config.priority is not None:
+                self.scheduler.reprioritize(model_run_id, config.priority)
+            with self.lock:
+                model_run = self.model_run_dict.get(model_run_id, model_run)
+                model_run.config = config
+                # a pending run stays pending until it is promoted to a worker slot
+                if model_run.state != ModelState.PENDING:
+                    model_run.state = ModelState.READY
+                self.model_run_dict[model_run_id] = model_run
             return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
+                state=model_run.state,
                 model_run_id=model_run_id,
             )
         else:
@@ -61,53 +108,105 @@ class Model(ABC):
                 reason="Error in Model.initialize(): model_run_id unknown"
             )
 
-    def load_from_minio(self, path):
+    @contextmanager
+    def open_from_minio(self, path):
+        """
+        Opens an object in Minio as a binary stream, that is read while the object is being downloaded.
+        The connection is returned to the pool when the stream is closed.
+        """
         bucket = path.split("/")[0]
         rest_of_path = "/".join(path.split("/")[1:])
 
         response = self.minio_client.get_object(bucket, rest_of_path)
-        if response:
-            logger.info(f"Minio response: {response}")
-            return response.data
+        logger.info(f"Streaming {rest_of_path} from Minio bucket {bucket}")
+        try:
+            yield response
+        finally:
+            response.close()
+            response.release_conn()
+
+    @contextmanager
+    def open_input(self, path):
+        """Opens the input at a file:// path or a path in Minio as a binary stream"""
+        if path[:7] == 'file://':
+            with open(path[7:], 'rb') as file:
+                yield file
         else:
-            logger.error(f"Failed to retrieve from Minio: bucket={bucket}, path={rest_of_path}")
+            with self.open_from_minio(path) as response:
+                yield response
+
+    def ensure_bucket(self, bucket: str):
+        """Creates the bucket if it does not exist yet, existing buckets are remembered for the process lifetime"""
+        if bucket in self.known_buckets:
+            return
+        if not self.minio_client.bucket_exists(bucket):
+            self.minio_client.make_bucket(bucket)
+        with self.lock:
+            self.known_buckets.add(bucket)
+
+    def input_version(self, path) -> Optional[tuple]:
+        """
+        Returns a key that changes when the input at this path changes: the ETag of a Minio object or the
+        modification time and size of a file, or None if the input cannot be found.
+        """
+        try:
+            if path[:7] == 'file://':
+                stat = os.stat(path[7:])
+                return path, stat.st_mtime_ns, stat.st_size
+            bucket = path.split("/")[0]
+            rest_of_path = "/".join(path.split("/")[1:])
+            return path, self.minio_client.stat_object(bucket, rest_of_path).etag
+        except (S3Error, OSError) as e:
+            logger.warning(f"Cannot determine the version of {path}: {e}")
             return None
 
+    def load_from_minio(self, path):
+        with self.open_from_minio(path) as response:
+            return response.read()
+
     @abstractmethod
     def process_results(self, result):
         pass
 
     def store_result(self, model_run_id: str, result):
-        if model_run_id in self.model_run_dict:
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
             res = self.process_results(result)
             if res:
-                path = self.model_run_dict[model_run_id].config.output_esdl_file_path
-                if self.minio_client:
-                    content = BytesIO(bytes(res, 'utf8'))
-
+                path = model_run.config.output_esdl_file_path or self.result_path(model_run_id)
+                if path[:7] != 'file://' and self.minio_client:
                     bucket = path.split("/")[0]
                     rest_of_path = "/".join(path.split("/")[1:])
+                    self.ensure_bucket(bucket)
 
-                    if not self.minio_client.bucket_exists(bucket):
-                        self.minio_client.make_bucket(bucket)
-
-                    self.minio_client.put_object(bucket, rest_of_path, content, content.getbuffer().nbytes)
+                    # multipart upload of the result, encoded (and compressed) part by part
+                    gzip = EnvSettings.minio_upload_gzip()
+                    self.minio_client.put_object(bucket, rest_of_path, EncodedTextStream(res, gzip=gzip), length=-1,
+                                                 part_size=EnvSettings.minio_upload_part_size(),
+                                                 metadata={"Content-Encoding": "gzip"} if gzip else None)
                 else:
                     if path[:7] == 'file://': # local file
                         filename = path[7:]
                         logger.info("Writing result ESDL to disk: " + filename)
+                        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
                         with open(filename, 'w') as file:
                             file.write(res)
                     else:
                         raise IOError("Don't know how to write file " + path)
 
-                self.model_run_dict[model_run_id].result = {
+                stored = {
                     "path": path
                 }
+                if result.get('parquet'):
+                    stored['parquet'] = self.store_files(path, result['parquet'])
             else:
-                self.model_run_dict[model_run_id].result = {
+                stored = {
                     "result": res
                 }
+            with self.lock:
+                model_run = self.model_run_dict.get(model_run_id, model_run)
+                model_run.result = stored
+                self.model_run_dict[model_run_id] = model_run
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.SUCCEEDED,
@@ -119,20 +218,103 @@ class Model(ABC):
                 reason="Error in Model.store_result(): model_run_id unknown"
             )
 
+    @staticmethod
+    def result_path(model_run_id: str) -> str:
+        """Local path for the result of a run without an output path"""
+        return 'file://' + os.path.abspath(os.path.join(EnvSettings.result_dir(), f"{model_run_id}.esdl"))
+
+    def finish_run(self, model_run_id: str, info: ModelRunInfo) -> ModelRunInfo:
+        """
+        Records the outcome of a finished run. Its result is stored right away and only a reference to the stored
+        result is kept in memory, so finished runs never hold on to their (possibly large) results.
+        :return: the outcome of the run with the reference to the stored result
+        """
+        if info.state == ModelState.SUCCEEDED and model_run_id in self.model_run_dict:
+            try:
+                stored = self.store_result(model_run_id=model_run_id, result=info.result)
+            except Exception as e:
+                logger.exception(f"Storing the result of run {model_run_id} failed")
+                stored = ModelRunInfo(model_run_id=model_run_id, state=ModelState.ERROR,
+                                      reason=f"Storing the result failed: {e}")
+            info = ModelRunInfo(model_run_id=model_run_id, state=stored.state, reason=stored.reason)
+        with self.lock:
+            model_run = self.model_run_dict.get(model_run_id)
+            if model_run is not None:
+                model_run.state = info.state
+                model_run.reason = info.reason
+                model_run.finished_at = time.time()
+                if info.state != ModelState.SUCCEEDED:
+                    model_run.result = {}
+                info.result = model_run.result
+                self.model_run_dict[model_run_id] = model_run
+        logger.info(f"Run {model_run_id} finished with state {info.state.value}")
+        self.evict_finished_runs()
+        return info
+
+    def evict_finished_runs(self):
+        """Removes finished runs that are older than the retention time or exceed the maximum number of runs"""
+        retention = EnvSettings.result_retention()
+        max_finished = EnvSettings.max_finished_runs()
+        now = time.time()
+        with self.lock:
+            finished = sorted((run.finished_at, model_run_id) for model_run_id, run in self.model_run_dict.items()
+                              if run.finished_at is not None)
+        expired = [model_run_id for finished_at, model_run_id in finished
+                   if retention and now - finished_at > retention]
+        if max_finished and len(finished) - len(expired) > max_finished:
+            remaining = [model_run_id for _, model_run_id in finished if model_run_id not in expired]
+            expired += remaining[:len(remaining) - max_finished]
+        for model_run_id in expired:
+            logger.info(f"Evicting finished run {model_run_id}")
+            self.remove(model_run_id)
+
+    def store_files(self, esdl_path: str, files: Dict[str, str]) -> Dict[str, str]:
+        """
+        Stores additional result files in a folder next to the result ESDL
+        :param esdl_path: path of the result ESDL in Minio or a file:// path
+        :param files: local paths of the files by table name
+        :return: the paths of the stored files by table name
+        """
+        base = os.path.splitext(esdl_path)[0] + "_results"
+        stored = {}
+        for name, local_path in files.items():
+            path = f"{base}/{os.path.basename(local_path)}"
+            if path[:7] != 'file://' and self.minio_client:
+                bucket = path.split("/")[0]
+                rest_of_path = "/".join(path.split("/")[1:])
+                self.ensure_bucket(bucket)
+                self.minio_client.fput_object(bucket, rest_of_path, local_path,
+                                              part_size=EnvSettings.minio_upload_part_size())
+            elif path[:7] == 'file://':
+                os.makedirs(os.path.dirname(path[7:]), exist_ok=True)
+                shutil.copyfile(local_path, path[7:])
+            else:
+                raise IOError("Don't know how to write file " + path)
+            stored[name] = path
+        logger.info(f"Stored {len(stored)} result files in {base}")
+        return stored
+
     def run(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            state = self.model_run_dict[model_run_id].state
-            if state != ModelState.READY:
-                res = ModelRunInfo(
-                    state=self.model_run_dict[model_run_id].state,
-                    model_run_id=model_run_id,
-                    reason="Error: Model is not in READY state"
-                )
-                return res
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
+            model_run = self.adopt(model_run_id, model_run)
+            with self.lock:
+                model_run = self.model_run_dict.get(model_run_id, model_run)
+                if model_run.state == ModelState.PENDING and model_run.config is not None:
+                    # start automatically as soon as a worker slot becomes available
+                    model_run.state = ModelState.QUEUED
+                elif model_run.state == ModelState.READY:
+                    model_run.state = ModelState.RUNNING
+                else:
+                    return ModelRunInfo(
+                        state=model_run.state,
+                        model_run_id=model_run_id,
+                        reason="Error: Model is not in READY state"
+                    )
+                self.model_run_dict[model_run_id] = model_run
 
-            self.model_run_dict[model_run_id].state = ModelState.RUNNING
             return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
+                state=model_run.state,
                 model_run_id=model_run_id,
             )
         else:
@@ -143,12 +325,14 @@ class Model(ABC):
             )
 
     def status(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
             # Dummy behaviour: Query status once, to let finish model
-            self.model_run_dict[model_run_id].state = ModelState.SUCCEEDED
+            model_run.state = ModelState.SUCCEEDED
+            self.model_run_dict[model_run_id] = model_run
 
             return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
+                state=model_run.state,
                 model_run_id=model_run_id,
             )
         else:
@@ -159,11 +343,12 @@ class Model(ABC):
             )
 
     def results(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
             return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
+                state=model_run.state,
                 model_run_id=model_run_id,
-                result=self.model_run_dict[model_run_id].result,
+                result=model_run.result,
             )
         else:
             return ModelRunInfo(
@@ -172,16 +357,82 @@ class Model(ABC):
                 reason="Error in Model.results(): model_run_id unknown"
             )
 
-    def remove(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            del self.model_run_dict[model_run_id]
-            # check if models are in pending state and accept the first one we find.
-            if len(self.model_run_dict.keys()) > 0:
-                for m in self.model_run_dict.values():
-                    if m.state == ModelState.PENDING:
-                        m.state == ModelState.ACCEPTED
-                        break
+    def release(self, model_run_id: str):
+        """Releases the worker slot of a finished run and promotes the next pending run"""
+        self._promote(self.scheduler.release(model_run_id))
+
+    def _promote(self, model_run_id: str | None):
+        if model_run_id is None:
+            return
+        with self.lock:
+            model_run = self.model_run_dict.get(model_run_id)
+            if model_run is not None and model_run.state == ModelState.PENDING:
+                model_run.state = ModelState.READY if model_run.config is not None else ModelState.ACCEPTED
+                self.model_run_dict[model_run_id] = model_run
+            # a QUEUED run is picked up by its waiting executor thread
+
+    def adopt(self, model_run_id: str, model_run: ModelRun) -> ModelRun:
+        """
+        Takes over a run that was requested from another adapter process, so it is scheduled in a worker slot of
+        this process. Runs that are queued, running or finished are left to the process that owns them.
+        :return: the run, owned by this process if it was taken over
+        """
+        if model_run.owner == PROCESS_ID or model_run.finished_at is not None or \
+                model_run.state in (ModelState.QUEUED, ModelState.RUNNING):
+            return model_run
+        if not self.model_run_dict.claim(model_run_id, model_run.owner):
+            # another process was first
+            return self.model_run_dict.get(model_run_id, model_run)
+        logger.info(f"Taking over run {model_run_id} from adapter process {model_run.owner}")
+        return self.schedule(model_run_id, model_run)
 
+    def schedule(self, model_run_id: str, model_run: ModelRun) -> ModelRun:
+        """Assigns a worker slot of this process to a run that it has taken over, or queues the run"""
+        with self.lock:
+            model_run = self.model_run_dict.get(model_run_id, model_run)
+            config = model_run.config
+            try:
+                slot = self.scheduler.admit(model_run_id, config.priority if config and config.priority else 0)
+            except QueueFullException as e:
+                model_run.state = ModelState.ERROR
+                model_run.reason = str(e)
+                model_run.finished_at = time.time()
+            else:
+                if slot is None and model_run.state != ModelState.QUEUED:
+                    model_run.state = ModelState.PENDING
+                elif slot is not None and model_run.state == ModelState.PENDING:
+                    model_run.state = ModelState.READY if config is not None else ModelState.ACCEPTED
+            self.model_run_dict[model_run_id] = model_run
+        return model_run
+
+    def _release_lost_runs(self):
+        """
+        Frees the slots of runs that were taken over by another adapter process, removed by one or finished by one,
+        e.g. cancelled while they were waiting for a slot
+        """
+        with self.lock:
+            for model_run_id in self.scheduler.runs():
+                if self.scheduler.is_running(model_run_id):
+                    continue
+                model_run = self.model_run_dict.get(model_run_id)
+                if model_run is None or model_run.owner != PROCESS_ID or model_run.finished_at is not None or \
+                        model_run.state in FINAL_STATES:
+                    self._promote(self.scheduler.discard(model_run_id))
+
+    def remove(self, model_run_id: str):
+        with self.lock:
+            model_run = self.model_run_dict.pop(model_run_id, None)
+        if model_run is not None:
+            self.events.forget(model_run_id)
+            if model_run.result and model_run.result.get("path") == self.result_path(model_run_id) and \
+                    os.path.exists(model_run.result["path"][7:]):
+                # result stored by the adapter itself, as the run had no output path
+                os.remove(model_run.result["path"][7:])
+            # free the slot (if not running) and accept the first pending run
+            self._promote(self.scheduler.discard(model_run_id))
+            if not self.scheduler.is_running(model_run_id):
+                # a running run cleans up its own workspace when it finishes
+                RunWorkspace(model_run_id).cleanup()
 
             return ModelRunInfo(
                 model_run_id=model_run_id,
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import certifi
+import urllib3
+from minio import Minio
+from urllib3.util import Retry, Timeout
+
+from tno.aimms_adapter.settings import EnvSettings
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class ObjectStore:
+    """
+    Minio client shared by all model runs. The client is created on first use, so the adapter starts without
+    contacting Minio, and its connection pool is sized to the number of workers, so concurrent runs reuse
+    connections. A background probe keeps track of whether Minio can be reached.
+    """
+
+    def __init__(self):
+        self._client: Optional[Minio] = None
+        self._lock = threading.Lock()
+        self._probe: Optional[threading.Thread] = None
+        self.healthy: Optional[bool] = None  # None until the first health check
+        self.last_check: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def configured() -> bool:
+        return bool(EnvSettings.minio_endpoint())
+
+    @property
+    def client(self) -> Optional[Minio]:
+        if self._client is None and self.configured():
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @staticmethod
+    def _create_client() -> Minio:
+        logger.info(f"Connecting to Minio Object Store at {EnvSettings.minio_endpoint()} "
+                    f"with a pool of {EnvSettings.minio_pool_size()} connections")
+        timeout = EnvSettings.minio_timeout()
+        http_client = urllib3.PoolManager(
+            timeout=Timeout(connect=timeout, read=timeout),
+            maxsize=EnvSettings.minio_pool_size(),
+            block=False,
+            cert_reqs='CERT_REQUIRED',
+            ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+            retries=Retry(
+                total=EnvSettings.minio_retries(),
+                backoff_factor=EnvSettings.minio_retry_backoff(),
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        return Minio(
+            endpoint=EnvSettings.minio_endpoint(),
+            secure=EnvSettings.minio_secure(),
+            access_key=EnvSettings.minio_access_key(),
+            secret_key=EnvSettings.minio_secret_key(),
+            http_client=http_client
+        )
+
+    def check_health(self) -> bool:
+        """Lists the buckets in Minio to check that it can be reached"""
+        client = self.client
+        if client is None:
+            return False
+        try:
+            buckets = client.list_buckets()
+            if not self.healthy:
+                logger.info(f"Minio Object Store is available with {len(buckets)} buckets")
+            self.healthy, self.last_error = True, None
+        except Exception as e:
+            if self.healthy is not False:
+                logger.warning(f"Minio Object Store is not available: {e}")
+            self.healthy, self.last_error = False, str(e)
+        self.last_check = datetime.now(timezone.utc)
+        return self.healthy
+
+    def start_health_probe(self, interval: int):
+        """Checks the health of Minio every interval seconds in a background thread"""
+        if not self.configured() or interval <= 0 or self._probe is not None:
+            return
+        self._probe = threading.Thread(target=self._run_probe, args=(interval,), name="minio-health-probe",
+                                       daemon=True)
+        self._probe.start()
+
+    def _run_probe(self, interval: int):
+        while True:
+            self.check_health()
+            time.sleep(interval)
+
+    def health(self) -> Dict[str, Any]:
+        if self.configured() and self._probe is None:
+            self.check_health()  # no background probe, check on request
+        return {
+            "configured": self.configured(),
+            "endpoint": EnvSettings.minio_endpoint(),
+            "healthy": self.healthy,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+            "error": self.last_error,
+        }
+
+
+object_store = ObjectStore()
@@ -1,15 +1,25 @@
 import base64
 import json
-import subprocess
+import os
+import time
 from time import sleep
-from uuid import uuid4
+from typing import Dict, Iterator, Optional, Set, Tuple
 
+import pandas as pd
 from minio import S3Error
 
+from tno.aimms_adapter.model.aimms_output import AimmsProgress
+from tno.aimms_adapter.model.aimms_process import AimmsProcess
 from tno.aimms_adapter.model.model import Model, ModelState
+from tno.aimms_adapter.model.opera_accessdb.database_cache import AccessDatabaseCache, changed_rows, VALUE_COLUMNS
 from tno.aimms_adapter.model.opera_accessdb.opera_access_importer import OperaAccessImporter, copy_clean_access_database
-from tno.aimms_adapter.model.opera_accessdb.results_processor import OperaResultsProcessor
+from tno.aimms_adapter.model.opera_accessdb.results_processor import OperaResultsProcessor, OperaResultsException
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_cache import ParsedESDLCache
 from tno.aimms_adapter.model.opera_esdl_parser.esdl_parser import OperaESDLParser
+from tno.aimms_adapter.model.run_events import FINAL_STATES
+from tno.aimms_adapter.model.run_store import PROCESS_ID, owner_alive
+from tno.aimms_adapter.model.scheduler import WorkerSlot
+from tno.aimms_adapter.model.workspace import RunWorkspace
 from tno.aimms_adapter.settings import EnvSettings
 from tno.aimms_adapter.types import ModelRunInfo, OperaAdapterConfig, ModelRun
 from tno.aimms_adapter import executor
@@ -19,67 +29,95 @@ logger = get_logger(__name__)
 
 
 class Opera(Model):
-    def request(self):
+    database_cache: AccessDatabaseCache = None
+    esdl_cache: ParsedESDLCache = None
+
+    def __init__(self):
+        super().__init__()
+        self.aimms_processes: Dict[str, AimmsProcess] = {}  # model_run_id -> running AIMMS process
+        self.cancelled_runs: Set[str] = set()
+
+    def get_database_cache(self) -> AccessDatabaseCache | None:
+        if self.database_cache is None and EnvSettings.access_database_cache_dir():
+            self.database_cache = AccessDatabaseCache(cache_dir=EnvSettings.access_database_cache_dir(),
+                                                      max_size_bytes=EnvSettings.access_database_cache_size(),
+                                                      clean_database=EnvSettings.clean_access_database())
+        return self.database_cache
+
+    def get_esdl_cache(self) -> ParsedESDLCache | None:
+        if self.esdl_cache is None and EnvSettings.esdl_cache_size() > 0:
+            self.esdl_cache = ParsedESDLCache(max_size_bytes=EnvSettings.esdl_cache_size())
+        return self.esdl_cache
+
+    def parse_input(self, path: str) -> Tuple[pd.DataFrame, pd.DataFrame, OperaESDLParser | None]:
+        """
+        Parses the input ESDL, or takes its dataframes from the cache if this version of the input was parsed before.
+        :return: tuple of the asset and carrier dataframes and the parser, which is None if the dataframes were cached
+        """
+        cache = self.get_esdl_cache()
+        version = self.input_version(path) if cache is not None else None
+        if version is not None:
+            cached = cache.get(version)
+            if cached is not None:
+                logger.info(f"Using cached parse of ESDL {path}")
+                return cached[0], cached[1], None
 
-        model_run_id = str(uuid4())
-        self.model_run_dict[model_run_id] = ModelRun(
-            state=ModelState.ACCEPTED,
-            config=None,
-            result=None,
-        )
-        if len(self.model_run_dict.keys()) > 1:
-            # there is already a model running
-            self.model_run_dict[model_run_id].state = ModelState.PENDING
-            return ModelRunInfo(
-                state=ModelState.PENDING,
-                reason="A model is already running",
-                model_run_id = model_run_id
-            )
-
-        return ModelRunInfo(
-            state=self.model_run_dict[model_run_id].state,
-            model_run_id=model_run_id,
-        )
-
-    def start_aimms_model(self, config: OperaAdapterConfig, model_run_id):
-        input_esdl: str
-        if config.input_esdl_file_path[:7] == 'file://':
-            logger.info(f"Loading ESDL from local disk at {config.input_esdl_file_path[7:]}")
-            # local file
-            with open(config.input_esdl_file_path[7:], 'r') as file:
-                input_esdl = file.read()
-        else: # assume minio
-            try:
-                logger.info(f"Loading ESDL from Inter Model Storage (Minio) at {config.input_esdl_file_path}")
-                input_esdl_bytes = self.load_from_minio(config.input_esdl_file_path)
-                if input_esdl_bytes is None:
-                    logger.error(f"Error retrieving {config.input_esdl_file_path} from Minio")
-                    return ModelRunInfo(
-                        model_run_id=model_run_id,
-                        state=ModelState.ERROR,
-                        reason=f"Error retrieving {config.input_esdl_file_path} from Minio"
-                    )
-                else:
-                    input_esdl = input_esdl_bytes.decode('utf-8')
-            except S3Error as e:
-                logger.error(f"Error retrieving {config.input_esdl_file_path} from Minio")
-                return ModelRunInfo(
-                    model_run_id=model_run_id,
-                    state=ModelState.ERROR,
-                    reason=f"Error retrieving {config.input_esdl_file_path} from Minio"
-                )
-
-
-        print('Input ESDL:', input_esdl)
+        parser = OperaESDLParser()
+        logger.info(f"Loading ESDL from {path}")
+        # local file or Inter Model Storage (Minio), parsed while it is read
+        with self.open_input(path) as esdl_stream:
+            esdl_in_dataframe, carriers = parser.parse(esdl_stream=esdl_stream)
+        if version is not None:
+            cache.put(version, esdl_in_dataframe, carriers)
+        return esdl_in_dataframe, carriers, parser
+
+    def import_into_access_database(self, esdl_in_dataframe, carriers, access_database):
+        """
+        Creates the Opera database for this run. Uses a cached database of an earlier import if the ESDL is the
+        same, or only updates the changed values if a database of an ESDL with the same structure is cached.
+        """
+        oai = OperaAccessImporter()
+        oai.commit_batch_size = EnvSettings.access_import_commit_batch_size()
+        cache = self.get_database_cache()
+        if cache is None:
+            copy_clean_access_database(EnvSettings.clean_access_database(), access_database)
+            oai.start_import(esdl_data_frame=esdl_in_dataframe, carriers=carriers, access_database=access_database)
+            return
+
+        structure_key, content_key = cache.keys(esdl_in_dataframe, carriers)
+        cached = cache.lookup(structure_key, content_key)
+        if cached and cached.content_key == content_key:
+            logger.info("Using cached Opera database for this ESDL, skipping import")
+            cache.restore(cached, access_database)
+            return
+        if cached:
+            changed_assets = changed_rows(esdl_in_dataframe, cached.esdl_data_frame, 'name', VALUE_COLUMNS)
+            changed_carriers = changed_rows(carriers, cached.carriers, 'name', ['cost'])
+            logger.info(f"Using cached Opera database of an ESDL with the same structure, "
+                        f"updating {len(changed_assets)} options and {len(changed_carriers)} carriers")
+            cache.restore(cached, access_database)
+            oai.start_delta_import(changed_assets=changed_assets, changed_carriers=changed_carriers,
+                                   access_database=access_database)
+        else:
+            copy_clean_access_database(EnvSettings.clean_access_database(), access_database)
+            oai.start_import(esdl_data_frame=esdl_in_dataframe, carriers=carriers, access_database=access_database)
+        cache.store(structure_key, content_key, esdl_in_dataframe, carriers, access_database)
 
+    def start_aimms_model(self, config: OperaAdapterConfig, model_run_id, slot: WorkerSlot):
         # convert ESDL to MySQL
         # logger.info("Converting ESDL using Universal Link")
         # ul = UniversalLink(host=EnvSettings.db_host(), database=EnvSettings.db_name(),
         #                    user=EnvSettings.db_user(), password=EnvSettings.db_password())
         # success, error = ul.esdl_to_db(input_esdl)
-        parser = OperaESDLParser()
         try:
-            esdl_in_dataframe, carriers = parser.parse(esdl_string=input_esdl)
+            esdl_in_dataframe, carriers, parser = self.parse_input(config.input_esdl_file_path)
+        except (S3Error, OSError) as e:
+            logger.error(f"Error retrieving {config.input_esdl_file_path}: {e}")
+            return ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason=f"Error retrieving {config.input_esdl_file_path}"
+            )
         except Exception as e:
             logger.error(f"Parse exception for ESDL input: {e}")
             return ModelRunInfo(
@@ -88,57 +126,104 @@ class Opera(Model):
                 reason=str(e)
             )
 
-        copy_clean_access_database(EnvSettings.clean_access_database(), EnvSettings.access_database())
+        workspace = RunWorkspace(model_run_id)
+        logger.info(f"Preparing workspace {workspace.working_dir} in worker slot {slot.index}")
+        workspace.create()
         logger.info("Importing ESDL into Opera database")
-        oai = OperaAccessImporter()
-        oai.start_import(esdl_data_frame=esdl_in_dataframe, carriers=carriers, access_database=EnvSettings.access_database())
+        try:
+            self.import_into_access_database(esdl_in_dataframe, carriers, workspace.access_database)
+        except Exception as e:
+            logger.error(f"Import of ESDL into Opera database failed: {e}")
+            # batches that were already committed cannot be rolled back, never leave a partial database behind
+            if os.path.exists(workspace.access_database):
+                os.remove(workspace.access_database)
+            return ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason=f"Import of ESDL into Opera database failed: {e}"
+            )
         # start aimms via subprocess
-        print(f"AIMMS binary at {EnvSettings.aimms_exe_path()}")
-        print(f"AIMMS model at {EnvSettings.aimms_model_path()}")
-        print(f"AIMMS start procedure {EnvSettings.aimms_procedure()}")
+        logger.debug("AIMMS binary at %s", EnvSettings.aimms_exe_path())
+        logger.debug("AIMMS model at %s", EnvSettings.aimms_model_path())
+        logger.debug("AIMMS start procedure %s", EnvSettings.aimms_procedure())
 
         aimms_exe_path = EnvSettings.aimms_exe_path()
         start_procedure = EnvSettings.aimms_procedure()
         aimms_model_path = EnvSettings.aimms_model_path()
         params = [aimms_exe_path, "-R", start_procedure, aimms_model_path] # --minimized
+        if EnvSettings.aimms_run_file():
+            # the model reads the database and output folder of this run from the run file, see README
+            params.append(workspace.run_file)
 
         # fake opera by running Ping command, that takes some time to run
         #params = ["ping", "-n", "10", "127.0.0.1"]
 
-        logger.info("Starting AIMMS...")
-        aimms = subprocess.Popen(params, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        running = True
-        output = []
-
-        while running:
-            for line in aimms.stdout: # this is blocking
-                logger.info(f"AIMMS: {line.strip()}")
-                output.append(line)
-            running = aimms.poll() is None
-            #if aimms.poll() is not None: # finished process
-            #    running = False
-
-        # wait for aimms to finish
-        print()
-        # get output
+        timeout = config.timeout if config.timeout is not None else EnvSettings.aimms_run_timeout()
+        idle_timeout = config.idle_timeout if config.idle_timeout is not None else EnvSettings.aimms_idle_timeout()
+
+        with self.lock:
+            if model_run_id in self.cancelled_runs:
+                return ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=ModelState.ERROR,
+                    reason="Run was cancelled before AIMMS started"
+                )
+            logger.info("Starting AIMMS...")
+            aimms = AimmsProcess(params, workspace.log_file, EnvSettings.aimms_output_buffer_lines(),
+                                 timeout=timeout, idle_timeout=idle_timeout, cwd=workspace.working_dir)
+            self.aimms_processes[model_run_id] = aimms
+        reader = aimms.reader
+
+        # wait for aimms to finish, or to be stopped by a timeout or cancel
+        aimms.wait(on_progress=lambda aimms_progress: self.progress_changed(model_run_id, config, aimms_progress))
+        progress = reader.progress()
+        logger.info("AIMMS exited with code %s after %s lines of output, see %s", aimms.returncode, progress.lines,
+                    workspace.log_file)
+        if aimms.stop_reason is not None:
+            logger.error("Last output from AIMMS: %s", '\n'.join(reader.tail()))
+            return ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason=aimms.stop_reason,
+            )
         if aimms.returncode == 0:
             logger.info("AIMMS has finished, collecting results...")
+            if parser is None:
+                # the dataframes came from the cache, the results are written into a freshly loaded energy system
+                parser = OperaESDLParser()
+                with self.open_input(config.input_esdl_file_path) as esdl_stream:
+                    parser.load_from_stream(esdl_stream)
             esh = parser.get_energy_system_Hander()
             orp = OperaResultsProcessor(input_df=esdl_in_dataframe,
                                         esh=esh,
-                                        output_path=EnvSettings.opera_output_folder())
-            orp.update_production_capacities()
+                                        output_path=workspace.opera_output_folder)
+            try:
+                orp.process(EnvSettings.opera_result_mappers())
+            except OperaResultsException as e:
+                logger.error("AIMMS finished without usable results: %s", e)
+                return ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=ModelState.ERROR,
+                    reason=f"AIMMS finished without usable results: {e}"
+                )
             updated_esdl_string = esh.to_string()
+            result = {'esdl': updated_esdl_string}
+            if EnvSettings.opera_parquet_export():
+                try:
+                    result['parquet'] = orp.export_parquet(os.path.join(workspace.working_dir, "parquet"))
+                except Exception:
+                    # the Parquet tables are an optional addition to the result ESDL
+                    logger.exception("Exporting the Opera results to Parquet failed")
 
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.SUCCEEDED,
-                result = {'esdl': updated_esdl_string}
+                result = result
             )#, simulation_id
         else:
             # error
             logger.error(f'Running AIMMS failed, returncode={aimms.returncode}')
-            logger.error(f'Output from AIMMS: {output}')
+            logger.error("Last output from AIMMS: %s", '\n'.join(reader.tail()))
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
@@ -153,18 +238,53 @@ class Opera(Model):
     # pass
 
     def threaded_run(self, model_run_id, config):
-        print("Threaded_run:", config)
+        logger.debug("Threaded_run: %s", config)
+
+        # wait until a worker slot is available for this run
+        slot = self.scheduler.wait_for_slot(model_run_id)
+        with self.lock:
+            model_run = self.model_run_dict.get(model_run_id)
+            finished = model_run is not None and (model_run.finished_at is not None or
+                                                  model_run.state in FINAL_STATES)
+            if slot is not None and model_run is not None and not finished:
+                model_run.state = ModelState.RUNNING
+                model_run.started_at = time.time()
+                self.model_run_dict[model_run_id] = model_run
+        if finished:
+            # cancelled while waiting for a slot, possibly by another adapter process
+            logger.info(f"Not starting run {model_run_id}, it finished with state {model_run.state.value}")
+            if slot is not None:
+                self.release(model_run_id)
+            return ModelRunInfo(model_run_id=model_run_id, state=model_run.state, reason=model_run.reason,
+                                result=model_run.result)
+        if slot is None:
+            return self.finish_run(model_run_id, ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason="Run was removed before a worker slot became available"
+            ))
 
         # start AIMMS run
-        start_aimms_info = self.start_aimms_model(config, model_run_id)
-        if start_aimms_info.state == ModelState.RUNNING:
-            # monitor AIMMS progress
-            #monitor_essim_progress_info = Opera.monitor_essim_progress(simulation_id, model_run_id)
-            #if monitor_essim_progress_info.state == ModelState.ERROR:
-            #    return monitor_essim_progress_info
-            return start_aimms_info
-        else:
-            return start_aimms_info
+        try:
+            start_aimms_info = self.start_aimms_model(config, model_run_id, slot)
+        except Exception as e:
+            logger.exception(f"Run {model_run_id} failed")
+            start_aimms_info = ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason=f"Run failed: {e}"
+            )
+        finally:
+            with self.lock:
+                self.aimms_processes.pop(model_run_id, None)
+                cancelled = model_run_id in self.cancelled_runs
+                self.cancelled_runs.discard(model_run_id)
+            self.release(model_run_id)
+            if cancelled or model_run_id not in self.model_run_dict:
+                # cancelled or removed while running
+                RunWorkspace(model_run_id).cleanup()
+        # store the result, the future of this run only keeps a reference to it
+        return self.finish_run(model_run_id, start_aimms_info)
 
         ## Monitor KPI progress
         #monitor_kpi_progress_info = Opera.monitor_kpi_progress(simulation_id, model_run_id)
@@ -174,10 +294,9 @@ class Opera(Model):
 
         res = Model.run(self, model_run_id=model_run_id)
 
-        if model_run_id in self.model_run_dict and self.model_run_dict[model_run_id].state == ModelState.RUNNING:
+        if res.reason is None and res.state in (ModelState.RUNNING, ModelState.QUEUED):
             config: OperaAdapterConfig = self.model_run_dict[model_run_id].config
             executor.submit_stored(model_run_id, self.threaded_run, model_run_id, config)
-            res.state = self.model_run_dict[model_run_id].state
             return res
         else:
             return ModelRunInfo(
@@ -187,23 +306,42 @@ class Opera(Model):
             )
 
     def status(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            if not executor.futures.done(model_run_id):
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None:
+            position = self.scheduler.position(model_run_id)
+            if position is not None:
                 return ModelRunInfo(
-                    state=self.model_run_dict[model_run_id].state,
+                    state=model_run.state,
                     model_run_id=model_run_id,
-                    reason=f"executor.futures._state: {executor.futures._state(model_run_id)}"
+                    reason=f"Waiting for a free worker, queued at position {position}"
                 )
-            else:
-                #print("executor.futures._state: ", executor.futures._state(model_run_id))   # FINISHED
-                future = executor.futures.pop(model_run_id)
-                executor.futures.add(model_run_id, future)   # Put it back on again, so it can be retreived in results
-                model_run_info = future.result()
-                if model_run_info.result is not None:
-                    print('Model execution result:', model_run_info.result)
-                else:
-                    logger.warning("No result in model_run_info variable")
-                return model_run_info
+            if model_run.finished_at is not None:
+                # the outcome is recorded in the run itself, the result is only returned by results()
+                return ModelRunInfo(
+                    state=model_run.state,
+                    model_run_id=model_run_id,
+                    reason=model_run.reason
+                )
+            aimms = self.aimms_processes.get(model_run_id)
+            if aimms is not None:
+                progress = aimms.reader.progress()
+                return ModelRunInfo(
+                    state=model_run.state,
+                    model_run_id=model_run_id,
+                    reason=f"AIMMS is running: {progress.lines} lines of output, phase {progress.phase}",
+                    progress=progress.to_dict()
+                )
+            if model_run.owner != PROCESS_ID:
+                return ModelRunInfo(
+                    state=model_run.state,
+                    model_run_id=model_run_id,
+                    reason=f"Run is scheduled by adapter process {model_run.owner}"
+                )
+            return ModelRunInfo(
+                state=model_run.state,
+                model_run_id=model_run_id,
+                reason=f"executor.futures._state: {executor.futures._state(model_run_id)}"
+            )
         else:
             return ModelRunInfo(
                 model_run_id=model_run_id,
@@ -211,35 +349,166 @@ class Opera(Model):
                 reason="Error in ESSIM.status(): model_run_id unknown"
             )
 
-    def process_results(self, result):
-        return result['esdl']  # returns the ESDL string of the updated ESDL
-
-    def results(self, model_run_id: str):
-        # Issue: if status already runs executor.future.pop, future does not exist anymore
-        if executor.futures.done(model_run_id):
-            if model_run_id in self.model_run_dict:
-                future = executor.futures.pop(model_run_id)
-                model_run_info = future.result()
-                if model_run_info.result is not None:
-                    print("Opera Run has ESDL result:")
-                    print(model_run_info.result)
-                else:
-                    logger.warning("No result in model_run_info variable")
-
-                self.model_run_dict[model_run_id].state = model_run_info.state
-                if model_run_info.state == ModelState.SUCCEEDED:
-                    self.model_run_dict[model_run_id].result = model_run_info.result
-
-                    Model.store_result(self, model_run_id=model_run_id, result=model_run_info.result)
-                else:
-                    self.model_run_dict[model_run_id].result = {}
-
-                return Model.results(self, model_run_id=model_run_id)
-            else:
+    def progress_changed(self, model_run_id: str, config: OperaAdapterConfig, progress: AimmsProgress):
+        self.events.publish(model_run_id)
+        if config.callback_url:
+            self.webhooks.progress(config.callback_url, ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.RUNNING,
+                reason=f"AIMMS is running: {progress.lines} lines of output, phase {progress.phase}",
+                progress=progress.to_dict()
+            ))
+
+    def _wait_for_event(self, model_run_id: str, version: int, timeout: float) -> int:
+        """Waits for a change of the run, a run of another adapter process is checked in the run store"""
+        model_run = self.model_run_dict.get(model_run_id)
+        if model_run is not None and model_run.owner != PROCESS_ID:
+            timeout = min(timeout, EnvSettings.events_poll_interval())
+        return self.events.wait(model_run_id, version, timeout)
+
+    def wait_for_status(self, model_run_id: str, wait: float, state: Optional[ModelState] = None) -> ModelRunInfo:
+        """
+        Long-poll for the status of a run: returns as soon as its state differs from the given state
+        :param wait: maximum number of seconds to wait, limited to STATUS_MAX_WAIT
+        :param state: the state known to the client, by default the state of the run when the request arrived
+        """
+        deadline = time.monotonic() + min(wait, EnvSettings.status_max_wait())
+        version = self.events.version(model_run_id)
+        info = self.status(model_run_id)
+        state = state or info.state
+        while info.state == state and info.state not in FINAL_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            version = self._wait_for_event(model_run_id, version, remaining)
+            info = self.status(model_run_id)
+        return info
+
+    def watch(self, model_run_id: str) -> Iterator[Tuple[Optional[str], Optional[ModelRunInfo]]]:
+        """
+        Yields ('status', info) for every change of state of a run and ('progress', info) for every change of its
+        progress, until the run has finished. Yields (None, None) when nothing changed for EVENTS_KEEPALIVE seconds.
+        """
+        keepalive = EnvSettings.events_keepalive()
+        state, lines = None, None
+        last_event = time.monotonic()
+        while True:
+            version = self.events.version(model_run_id)
+            info = self.status(model_run_id)
+            if info.state != state:
+                state = info.state
+                if info.state == ModelState.SUCCEEDED:
+                    info.result = self.results(model_run_id).result
+                yield 'status', info
+                if info.state in FINAL_STATES:
+                    return
+                last_event = time.monotonic()
+            elif info.progress is not None and info.progress['lines'] != lines:
+                lines = info.progress['lines']
+                yield 'progress', info
+                last_event = time.monotonic()
+            elif time.monotonic() - last_event >= keepalive:
+                yield None, None
+                last_event = time.monotonic()
+            self._wait_for_event(model_run_id, version, max(keepalive - (time.monotonic() - last_event), 0.1))
+
+    def cancel(self, model_run_id: str):
+        """
+        Stops a run: a queued run is taken out of the queue, a running AIMMS process is killed together with all
+        processes it started. The slot of the run is released and its workspace removed. A finished run is left as is.
+        """
+        with self.lock:
+            model_run = self.model_run_dict.get(model_run_id)
+            if model_run is None:
                 return ModelRunInfo(
                     model_run_id=model_run_id,
                     state=ModelState.ERROR,
-                    reason="Error in ESSIM.results(): model_run_id unknown"
+                    reason="Error in Opera.cancel(): model_run_id unknown"
+                )
+            if model_run.owner != PROCESS_ID and model_run.state == ModelState.RUNNING:
+                return ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=model_run.state,
+                    reason=f"Error in Opera.cancel(): run is executed by adapter process {model_run.owner}"
                 )
+            if model_run.finished_at is not None or model_run.state in FINAL_STATES:
+                return ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=model_run.state,
+                    reason="Error in Opera.cancel(): run has already finished"
+                )
+            model_run.state = ModelState.ERROR
+            model_run.reason = "Run was cancelled"
+            running = self.scheduler.is_running(model_run_id)
+            if running:
+                # the executor thread of the run releases its slot and workspace when AIMMS has stopped
+                self.cancelled_runs.add(model_run_id)
+            elif model_run.finished_at is None:
+                model_run.finished_at = time.time()
+            self.model_run_dict[model_run_id] = model_run
+            aimms = self.aimms_processes.get(model_run_id)
+        if running:
+            if aimms is not None:
+                aimms.stop("Run was cancelled")
+        else:
+            self._promote(self.scheduler.discard(model_run_id))
+            RunWorkspace(model_run_id).cleanup()
+        logger.info(f"Cancelled run {model_run_id}")
+        return ModelRunInfo(
+            model_run_id=model_run_id,
+            state=ModelState.ERROR,
+            reason="Run was cancelled"
+        )
+
+    def recover_runs(self):
+        """
+        Takes over the unfinished runs of adapter processes that no longer exist, e.g. after a restart. Queued runs
+        are scheduled again and start when a worker slot becomes available, runs that were running have lost their
+        AIMMS process and are marked as failed.
+        """
+        runs = sorted(self.model_run_dict.items(), key=lambda item: item[1].created_at or 0)  # in order of arrival
+        for model_run_id, model_run in runs:
+            if model_run.finished_at is not None or owner_alive(model_run):
+                continue
+            if not self.model_run_dict.claim(model_run_id, model_run.owner):
+                continue
+            logger.info(f"Recovering run {model_run_id} in state {model_run.state.value} of stopped adapter "
+                        f"process {model_run.owner}")
+            if model_run.state == ModelState.RUNNING:
+                RunWorkspace(model_run_id).cleanup()
+                self.finish_run(model_run_id, ModelRunInfo(
+                    model_run_id=model_run_id,
+                    state=ModelState.ERROR,
+                    reason="The adapter stopped while the run was running"
+                ))
+                continue
+            model_run = self.schedule(model_run_id, model_run)
+            if model_run.state == ModelState.QUEUED:
+                # a queued run starts by itself as soon as it gets a slot
+                executor.submit_stored(model_run_id, self.threaded_run, model_run_id, model_run.config)
+
+    def process_results(self, result):
+        return result['esdl']  # returns the ESDL string of the updated ESDL
+
+    def results(self, model_run_id: str):
+        if model_run_id in self.model_run_dict:
+            if executor.futures.done(model_run_id):
+                executor.futures.pop(model_run_id)  # the result has been stored when the run finished
+            model_run = self.model_run_dict.get(model_run_id)
+            return ModelRunInfo(
+                state=model_run.state,
+                model_run_id=model_run_id,
+                result=model_run.result,
+                reason=model_run.reason
+            )
         else:
-            return Model.results(self, model_run_id=model_run_id)
+            return ModelRunInfo(
+                model_run_id=model_run_id,
+                state=ModelState.ERROR,
+                reason="Error in Opera.results(): model_run_id unknown"
+            )
+
+    def remove(self, model_run_id: str):
+        if executor.futures.done(model_run_id):
+            executor.futures.pop(model_run_id)
+        return Model.remove(self, model_run_id=model_run_id)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+import pandas as pd
+
+from tno.aimms_adapter.model.opera_accessdb.opera_access_importer import not_empty
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
+# columns of the ESDL dataframe that only change values in existing rows of the Opera database
+VALUE_COLUMNS = ['power_min', 'power_max', 'efficiency', 'investment_cost', 'o_m_cost', 'variable_o_m_cost',
+                 'profiles_in']
+# columns that determine which options, activities and carriers are created in the Opera database
+STRUCTURE_COLUMNS = ['category', 'esdlType', 'name', 'carrier_in', 'carrier_out', 'opera_equivalent']
+STORAGE_COLUMNS = ['storage_capacity', 'storage_charge_efficiency', 'storage_discharge_efficiency',
+                   'storage_slow_loadtime', 'storage_fast_loadtime', 'storage_slow_unloadtime',
+                   'storage_fast_unloadtime', 'storage_losses_perhour']
+
+
+def costs_defined(row: pd.Series) -> bool:
+    return any(not_empty(row[c]) and float(row[c]) != 0.0 for c in ['investment_cost', 'o_m_cost', 'variable_o_m_cost'])
+
+
+def carrier_price_defined(carrier: pd.Series) -> bool:
+    return not_empty(carrier['cost']) and float(carrier['cost']) != 0.0
+
+
+def _hash_frames(*frames: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    for frame in frames:
+        h.update(','.join(frame.columns).encode('utf8'))
+        h.update(pd.util.hash_pandas_object(frame.astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def structural_frames(esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns the parts of the asset and carrier dataframes that define the structure of the Opera database. Two
+    inputs with the same structure only differ in values that can be updated in place. Storage is always part of
+    the structure, as its values are spread over many tables.
+    """
+    assets = esdl_data_frame[STRUCTURE_COLUMNS].copy()
+    assets['costs_defined'] = esdl_data_frame.apply(costs_defined, axis=1) if len(esdl_data_frame) else []
+    assets['power_min_defined'] = esdl_data_frame['power_min'].notna()
+    assets['power_max_defined'] = esdl_data_frame['power_max'].notna()
+    is_storage = esdl_data_frame['category'] == 'Storage'
+    for column in VALUE_COLUMNS + STORAGE_COLUMNS:
+        assets[column] = esdl_data_frame[column].where(is_storage)
+    carrier_structure = carriers[['name']].copy()
+    carrier_structure['price_defined'] = carriers.apply(carrier_price_defined, axis=1) if len(carriers) else []
+    return assets, carrier_structure
+
+
+def esdl_fingerprint(esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame, salt: str = '') -> Tuple[str, str]:
+    """
+    :return: tuple of (structure key, content key) of the parsed ESDL
+    """
+    assets = esdl_data_frame.drop(columns=['id', 'Nr'], errors='ignore')
+    structure_key = _hash_frames(*structural_frames(esdl_data_frame, carriers))
+    content_key = _hash_frames(assets, carriers[['name', 'cost']])
+    salt_hash = hashlib.sha256(salt.encode('utf8')).hexdigest()
+    return (hashlib.sha256((structure_key + salt_hash).encode('utf8')).hexdigest()[:32],
+            hashlib.sha256((content_key + salt_hash).encode('utf8')).hexdigest()[:32])
+
+
+def changed_rows(new: pd.DataFrame, old: pd.DataFrame, key: str, columns: List[str]) -> pd.DataFrame:
+    """Returns the rows of new of which any of the columns differ from the row with the same key in old"""
+    merged = new.merge(old[[key] + columns].drop_duplicates(key), on=key, how='left', suffixes=('', '_cached'))
+    changed = pd.Series(False, index=merged.index)
+    for column in columns:
+        a = merged[column].astype(str)
+        b = merged[column + '_cached'].astype(str)
+        changed |= a != b
+    return new[changed.values]
+
+
+@dataclass
+class CachedDatabase:
+    structure_key: str
+    content_key: str
+    database: str  # path of the cached Access database
+    esdl_data_frame: pd.DataFrame
+    carriers: pd.DataFrame
+
+
+class AccessDatabaseCache:
+    """
+    Content-addressed cache of Access databases into which an ESDL has been imported. Entries are grouped by the
+    structure of the ESDL, so an input that only differs in capacities or costs can start from a cached database
+    and only update those values. Least recently used entries are evicted when the cache exceeds its size.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int, clean_database: str):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.lock = threading.Lock()
+        # a changed clean database invalidates all entries
+        stat = os.stat(clean_database)
+        self.salt = f"{os.path.abspath(clean_database)}:{stat.st_size}:{stat.st_mtime_ns}"
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def keys(self, esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame) -> Tuple[str, str]:
+        return esdl_fingerprint(esdl_data_frame, carriers, self.salt)
+
+    def lookup(self, structure_key: str, content_key: str) -> Optional[CachedDatabase]:
+        """
+        Returns the cached database with the same content or, if not available, the most recently used cached
+        database with the same structure. The keys are those returned by keys(), so the caller hashes the ESDL only
+        once for the lookup and the store.
+        """
+        with self.lock:
+            entry_dir = os.path.join(self.cache_dir, structure_key)
+            if not os.path.isdir(entry_dir):
+                return None
+            candidates = [f[:-4] for f in os.listdir(entry_dir) if f.endswith('.mdb')]
+            if not candidates:
+                return None
+            if content_key not in candidates:
+                candidates.sort(key=lambda c: os.path.getmtime(os.path.join(entry_dir, c + '.mdb')), reverse=True)
+            key = content_key if content_key in candidates else candidates[0]
+            database = os.path.join(entry_dir, key + '.mdb')
+            try:
+                cached_df = pd.read_pickle(os.path.join(entry_dir, key + '.assets.pkl'))
+                cached_carriers = pd.read_pickle(os.path.join(entry_dir, key + '.carriers.pkl'))
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring corrupt cache entry {database}: {e}")
+                return None
+            os.utime(database)  # mark as recently used
+            return CachedDatabase(structure_key, key, database, cached_df, cached_carriers)
+
+    def restore(self, entry: CachedDatabase, target_db: str):
+        log.info(f"Copying cached Opera DB {entry.database} to target {target_db}")
+        os.makedirs(os.path.dirname(os.path.abspath(target_db)), exist_ok=True)
+        shutil.copy2(entry.database, target_db)
+
+    def store(self, structure_key: str, content_key: str, esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame,
+              imported_db: str):
+        entry_dir = os.path.join(self.cache_dir, structure_key)
+        os.makedirs(entry_dir, exist_ok=True)
+        tmp = os.path.join(entry_dir, f".{uuid4()}.tmp")
+        base = os.path.join(entry_dir, content_key)
+        esdl_data_frame.drop(columns=['Nr'], errors='ignore').to_pickle(base + '.assets.pkl')
+        carriers.to_pickle(base + '.carriers.pkl')
+        shutil.copyfile(imported_db, tmp)
+        os.replace(tmp, base + '.mdb')
+        log.info(f"Stored imported Opera DB in cache as {structure_key}/{content_key}")
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used databases until the cache fits its maximum size"""
+        with self.lock:
+            entries = []
+            total = 0
+            for structure_key in os.listdir(self.cache_dir):
+                entry_dir = os.path.join(self.cache_dir, structure_key)
+                if not os.path.isdir(entry_dir):
+                    continue
+                for f in os.listdir(entry_dir):
+                    if f.endswith('.mdb'):
+                        path = os.path.join(entry_dir, f)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, path, stat.st_size))
+                        total += stat.st_size
+            entries.sort()
+            while total > self.max_size_bytes and entries:
+                _, path, size = entries.pop(0)
+                log.info(f"Evicting {path} from Opera DB cache")
+                for suffix in ('.mdb', '.assets.pkl', '.carriers.pkl'):
+                    try:
+                        os.remove(path[:-4] + suffix)
+                    except OSError:
+                        pass
+                total -= size
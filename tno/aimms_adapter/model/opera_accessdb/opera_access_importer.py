@@ -1,11 +1,14 @@
+import os
 import shutil
+import time
+from contextlib import contextmanager
 from enum import Enum
-from typing import TypedDict
+from typing import TypedDict, Dict, List
 
 import pandas as pd
-import pandas.io.sql as psql
 import sqlalchemy as sa
 
+from tno.aimms_adapter.model.opera_accessdb.statements import PreparedStatements, insert_statement
 from tno.shared.log import get_logger
 
 log = get_logger(__name__)
@@ -38,8 +41,41 @@ def activity_name(activity):
     return 'Activity_' + activity
 
 
+def baseline_value(profiles_in) -> float:
+    """Annual demand of an activity: the sum of the SingleValue profiles of the InPorts (comma separated)"""
+    if pd.isna(profiles_in) or str(profiles_in).strip() == '':
+        return 0.0
+    return sum(float(v) for v in str(profiles_in).split(','))
+
+
+def none_if_na(value):
+    return None if not isinstance(value, str) and pd.isna(value) else value
+
+
+def output_effect(row: pd.Series):
+    """Effect of an option on its output carrier (negative efficiency) in the Energiegebruik table"""
+    return -row['efficiency'] if row['efficiency'] != 0.0 or not pd.isna(row['efficiency']) else -1
+
+
+OPTIES = 'Opties'
+ACTIVITEITEN = 'Activiteiten'
+ACTIVITEIT_BASELINE = 'ActiviteitBaseline(activiteit,scenario,jaar)'
+BESCHIKBARE_VARIANTEN = 'Beschikbare varianten'
+KOSTEN = 'Kosten(Optie,Variant,Jaar)'
+ENERGIEGEBRUIK = 'Energiegebruik(Optie,Energiedrager,Variant,Jaar)'
+CATJAARSCEN = 'CatJaarScen(categorie,jaar,scenario)'
+OPTIE_ACTIVITEIT = 'OptieActiviteit(Optie,Activiteit)'
+REFERENCE_TABLES = [OPTIES, ACTIVITEITEN, ACTIVITEIT_BASELINE, BESCHIKBARE_VARIANTEN, KOSTEN, ENERGIEGEBRUIK,
+                    CATJAARSCEN, OPTIE_ACTIVITEIT]
+# columns set for every new (non-storage) option
+OPTION_COLUMNS = ['Naam optie', 'Sector', 'Unit of Capacity', 'Eenheid activiteit', 'Cap2Act', 'Optie onbeperkt',
+                  'Capaciteit onbeperkt']
+COST_COLUMNS = ['Investeringskosten', 'Overig operationeel kosten/baten', 'Variabele kosten']
+
+
 def copy_clean_access_database(emtpy_source, target_db):
     log.info(f"Copying empty Opera DB to target {target_db}")
+    os.makedirs(os.path.dirname(os.path.abspath(target_db)), exist_ok=True)
     shutil.copy2(emtpy_source, target_db)
 
 
@@ -52,8 +88,14 @@ class OperaAccessImporter:
     engine = None  # db engine
     conn = None  # db connection
     cursor = None  # db cursor
+    statements: PreparedStatements = None  # parameterized statements, prepared once per connection
     not_consumer_options: pd.DataFrame = None
     consumer_options: pd.DataFrame = None
+    tables: Dict[str, pd.DataFrame] = None  # in-memory copy of the reference tables used by the bulk import
+    commit_batch_size: int = 0  # commit after this many written rows, 0 commits the whole import at once
+    pending_rows: int = 0  # rows written since the last commit
+    rows_written: int = 0  # rows written by the last import
+    timings: Dict[str, float] = None  # duration in seconds of each phase of the last import
 
     def init(self, year=2030, scenario='MMvIB', default_sector="Energie"):
         self.year = year
@@ -64,7 +106,7 @@ class OperaAccessImporter:
         #access_file = r'C:\data\git\aimms-adapter\esdl2opera_access\Opties_mmvib.mdb'
         odbc_string = r'Driver={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=' + access_file + ';'
 
-        print(f"Connecting to database {access_file}")
+        log.debug("Connecting to database %s", access_file)
         connection_url = sa.engine.URL.create(
             "access+pyodbc",
             query={"odbc_connect": odbc_string}
@@ -75,15 +117,21 @@ class OperaAccessImporter:
         self.cursor = self.conn.cursor()
 
     def disconnect(self):
+        if self.statements is not None:
+            self.statements.close()
+            self.statements = None
         self.cursor.close()
         self.conn.close()
 
-    def start_import(self, esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame, access_database: str):
+    def start_import(self, esdl_data_frame: pd.DataFrame, carriers: pd.DataFrame, access_database: str,
+                     bulk: bool = True):
         """
         Connects to database file and uses esdl-dataframe to create opera database
         :param esdl_data_frame: dataframe extracting all relevant info for all the assets in the ESDL
         :param carriers: dataframe describing the carriers in the ESDL
         :param access_database: the path to the access database
+        :param bulk: read the reference tables once and insert all rows per table at once, instead of querying
+        the database for each asset
         :return:
         """
         self.df = esdl_data_frame
@@ -93,13 +141,146 @@ class OperaAccessImporter:
         self.consumer_options = self.df[is_consumer]
 
         #self.copy_clean_access_database()
+        self.timings = {}
+        self.rows_written = 0
         self.connect_to_access(access_file=access_database)
-        self._create_energycarriers()
-        self._add_activities()  # first activities, then options
-        self._add_options()
-        self._update_option_related_tables()
-        self.disconnect()
-        log.info("Import to Opera finished")
+        self.statements = PreparedStatements(self.conn)
+        try:
+            with self._phase('energy carriers'):
+                self._create_energycarriers()
+            if bulk:
+                with self._phase('reference tables'):
+                    self._prefetch_reference_tables()
+                with self._phase('activities'):
+                    self._bulk_add_activities()  # first activities, then options
+                with self._phase('options'):
+                    self._bulk_add_options()
+                with self._phase('option related tables'):
+                    self._bulk_update_option_related_tables()
+            else:
+                with self._phase('activities'):
+                    self._add_activities()  # first activities, then options
+                with self._phase('options'):
+                    self._add_options()
+                with self._phase('option related tables'):
+                    self._update_option_related_tables()
+            with self._phase('commit'):
+                self._commit()
+        except Exception:
+            log.exception("Import to Opera failed, rolling back")
+            self.conn.rollback()
+            raise
+        finally:
+            self.disconnect()
+        log.info("Import to Opera finished in %.2fs, %s rows written (%s)", sum(self.timings.values()),
+                 self.rows_written, ', '.join(f'{phase}: {t:.2f}s' for phase, t in self.timings.items()))
+
+    def start_delta_import(self, changed_assets: pd.DataFrame, changed_carriers: pd.DataFrame, access_database: str):
+        """
+        Updates the values of options, activities and carriers that are already in the database, e.g. in a
+        database from the AccessDatabaseCache that was imported from an ESDL with the same structure
+        :param changed_assets: rows of the esdl-dataframe with changed capacities, costs, efficiencies or demand
+        :param changed_carriers: rows of the carrier dataframe with changed prices
+        :param access_database: the path to the access database
+        """
+        self.timings = {}
+        self.rows_written = 0
+        self.connect_to_access(access_file=access_database)
+        self.statements = PreparedStatements(self.conn)
+        try:
+            with self._phase('updates'):
+                self._update_values(changed_assets, changed_carriers)
+            with self._phase('commit'):
+                self._commit()
+        except Exception:
+            log.exception("Delta import to Opera failed, rolling back")
+            self.conn.rollback()
+            raise
+        finally:
+            self.disconnect()
+        log.info("Delta import to Opera finished in %.2fs: %s options and %s carriers updated",
+                 sum(self.timings.values()), len(changed_assets), len(changed_carriers))
+
+    def _update_values(self, changed_assets: pd.DataFrame, changed_carriers: pd.DataFrame):
+        for index, carrier in changed_carriers.iterrows():
+            if not_empty(carrier['cost']):
+                log.debug('Updating price of energy carrier %s', carrier['name'])
+                self._execute("UPDATE [EconomieNationaal(Energiedrager,Jaar,Scenario)] SET [Nationale prijs] = ? "
+                              "WHERE [Energiedrager] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                              (float(carrier['cost']), opera_energycarrier(carrier['name']), self.year, self.scenario))
+
+        for index, row in changed_assets.iterrows():
+            log.debug('Updating values of option %s', row['name'])
+            nr = int(self.statements.execute("SELECT [Nr] FROM [Opties] WHERE [Naam optie] = ?",
+                                             (row['name'],)).fetchone()[0])
+
+            costs = [float(row[c]) if not_empty(row[c]) else 0.0 for c in ['investment_cost', 'o_m_cost', 'variable_o_m_cost']]
+            self._execute("UPDATE [Kosten(Optie,Variant,Jaar)] SET [Investeringskosten] = ?, "
+                          "[Overig operationeel kosten/baten] = ?, [Variabele kosten] = ? "
+                          "WHERE [Nr] = ? AND [Jaar] = ?", (*costs, nr, self.year))
+
+            if not pd.isna(row['power_max']) or not pd.isna(row['power_min']):
+                max_capacity = row['power_max'] if not pd.isna(row['power_max']) else None
+                min_capacity = row['power_min'] if not pd.isna(row['power_min']) else 0
+                if max_capacity is None:
+                    self._execute("UPDATE [CatJaarScen(categorie,jaar,scenario)] SET [Min totale capaciteit] = ? "
+                                  "WHERE [Categorie] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                                  (min_capacity, str(nr), str(self.year), self.scenario))
+                else:
+                    self._execute("UPDATE [CatJaarScen(categorie,jaar,scenario)] SET [Max totale capaciteit] = ?, "
+                                  "[Min totale capaciteit] = ? WHERE [Categorie] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                                  (max_capacity, min_capacity, str(nr), str(self.year), self.scenario))
+
+            if row['carrier_out']:
+                self._execute("UPDATE [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] SET [Effect] = ? "
+                              "WHERE [Nr] = ? AND [Jaar] = ? AND [Energiedrager] = ?",
+                              (str(output_effect(row)), nr, self.year, opera_energycarrier(row['carrier_out'])))
+
+            if row['category'] == 'Consumer':
+                value = baseline_value(row['profiles_in'])
+                self._execute("UPDATE [ActiviteitBaseline(activiteit,scenario,jaar)] SET [Waarde] = ? "
+                              "WHERE [Activiteit] = ? AND [Scenario] = ? AND [Jaar] = ?",
+                              (value, activity_name(row['name']), self.scenario, self.year))
+            self._checkpoint()
+
+    @contextmanager
+    def _phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            log.debug("Import phase '%s' took %.2fs", name, self.timings[name])
+
+    def _execute(self, sql: str, params: tuple = ()):
+        self.pending_rows += 1
+        self.rows_written += 1
+        return self.statements.execute(sql, params)
+
+    def _executemany(self, sql: str, values: List[tuple]):
+        self.pending_rows += len(values)
+        self.rows_written += len(values)
+        self.statements.executemany(sql, values)
+
+    def _insert(self, table: str, values: Dict):
+        self._execute(insert_statement(table, values.keys()), tuple(values.values()))
+
+    def _insert_dataframe(self, table: str, df: pd.DataFrame):
+        values = [tuple(none_if_na(v) for v in t) for t in df.itertuples(index=False, name=None)]
+        self._executemany(insert_statement(table, df.columns), values)
+
+    def _read_sql(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """Reads a query on the import connection, so rows that are not yet committed are included"""
+        return self.statements.query(sql, params)
+
+    def _checkpoint(self):
+        """Commits the rows written so far if the commit batch size is reached"""
+        if 0 < self.commit_batch_size <= self.pending_rows:
+            self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        self.pending_rows = 0
 
     def _create_energycarriers(self):
         # TODO: use ESDL price information for carriers
@@ -108,8 +289,7 @@ class OperaAccessImporter:
             #if carrier == "": continue
             carrier_name = carrier['name']
             new_carrier_name = opera_energycarrier(carrier['name'])
-            sql = "SELECT * FROM [Energiedragers] WHERE [Energiedrager] = '{}'".format(new_carrier_name)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [Energiedragers] WHERE [Energiedrager] = ?", (new_carrier_name,))
             if df.shape[0] == 0:  # not in table yet, insert
                 vraagisaanbod = False
                 generiek = False
@@ -120,7 +300,7 @@ class OperaAccessImporter:
                 price = 0.0
                 if not_empty(carrier['cost']):
                     price = float(carrier['cost'])
-                    print("Using ESDL-defined energy carrier cost")
+                    log.debug("Using ESDL-defined energy carrier cost")
                 # rest of the if statement in case no cost is assigned
                 elif carrier_name.lower().startswith("ele"):
                     vraagisaanbod = True
@@ -142,73 +322,66 @@ class OperaAccessImporter:
                     generiek = True
                     warmte = True
                 else:
-                    print(f"EnergyCarrier {carrier_name} is not matched to a similar energy carrier in Opera, using default values")
+                    log.warning("EnergyCarrier %s is not matched to a similar energy carrier in Opera, using default values", carrier_name)
 
-                print(f"Inserting new Energy carrier {new_carrier_name}")
-                sql = f"INSERT INTO [Energiedragers] ([Energiedrager],[Eenheid],[VraagIsAanbod], [Generiek], [Basisenergiedrager], [Elektriciteit], [Warmte]) " \
-                      f" VALUES ('{new_carrier_name}', 'PJ', {vraagisaanbod}, {generiek}, {basisenergiedrager}, {electriciteit}, {warmte});"
-                print(sql)
-                self.cursor.execute(sql)
+                log.debug("Inserting new Energy carrier %s", new_carrier_name)
+                self._insert('Energiedragers', {'Energiedrager': new_carrier_name, 'Eenheid': 'PJ',
+                                                'VraagIsAanbod': vraagisaanbod, 'Generiek': generiek,
+                                                'Basisenergiedrager': basisenergiedrager,
+                                                'Elektriciteit': electriciteit, 'Warmte': warmte})
 
                 if price != 0.0:
-                    print(f"Inserting Energy carrier price {price} for {new_carrier_name}")
-                    sql = f"INSERT INTO [EconomieNationaal(Energiedrager,Jaar,Scenario)] ([Energiedrager],[Jaar],[Scenario], [Nationale prijs]) " \
-                          f" VALUES ('{new_carrier_name}', {self.year}, '{self.scenario}', {price});"
-                    print(sql)
-                    self.cursor.execute(sql)
+                    log.debug("Inserting Energy carrier price %s for %s", price, new_carrier_name)
+                    self._insert('EconomieNationaal(Energiedrager,Jaar,Scenario)',
+                                 {'Energiedrager': new_carrier_name, 'Jaar': self.year, 'Scenario': self.scenario,
+                                  'Nationale prijs': price})
                 else:
-                    print(f"WARNING: No price is set for {new_carrier_name}")
+                    log.warning("No price is set for %s", new_carrier_name)
             else:
-                print(f"Energy carrier {new_carrier_name} already present")
-        self.conn.commit()
+                log.debug("Energy carrier %s already present", new_carrier_name)
+        self._checkpoint()
 
     def _add_activities(self):
         for index, row in self.consumer_options.iterrows():
             activiteiten_name = activity_name(row['name'])
             eenheid = 'PJ'
-            sql = "SELECT * FROM [Activiteiten] WHERE [Activiteit] = '{}'".format(activiteiten_name)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [Activiteiten] WHERE [Activiteit] = ?", (activiteiten_name,))
             if df.shape[0] == 0:  # Case where new activity is NOT in table 'Activiteiten'
-                print(f'Adding {activiteiten_name} to [Activiteiten]')
+                log.debug("Adding %s to [Activiteiten]", activiteiten_name)
 
-                sql = f"INSERT INTO [Activiteiten] ([Activiteit],[Eenheid]) VALUES ('{activiteiten_name}', '{eenheid}' )"
-                self.cursor.execute(sql)
+                self._insert(ACTIVITEITEN, {'Activiteit': activiteiten_name, 'Eenheid': eenheid})
             else:
-                print(f"{activiteiten_name} already in [Activiteiten]")
+                log.debug("%s already in [Activiteiten]", activiteiten_name)
 
             # add to ActiviteitBaseline(activiteit,scenario,jaar) the annual demand
-            sql = "SELECT * FROM [ActiviteitBaseline(activiteit,scenario,jaar)] WHERE [Activiteit] = '{}' AND [Scenario] = '{}' AND [Jaar] = {}" \
-                .format(activiteiten_name, self.scenario, self.year)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql(f"SELECT * FROM [{ACTIVITEIT_BASELINE}] WHERE [Activiteit] = ? AND [Scenario] = ? AND [Jaar] = ?",
+                                (activiteiten_name, self.scenario, self.year))
             if df.shape[0] == 0:  # Case where new activity is NOT in table 'ActiviteitBaseline'
-                print(f'Adding {activiteiten_name} to [ActiviteitBaseline]')
+                log.debug("Adding %s to [ActiviteitBaseline]", activiteiten_name)
                 #value = row['power'] if not pd.isna(row['power']) else 0.0
                 # for activities: use InPort profile
-                value = row['profiles_in'] if not pd.isna(row['profiles_in']) else 0.0
-                sql = f"INSERT INTO [ActiviteitBaseline(activiteit,scenario,jaar)] ([Activiteit],[Scenario], [Jaar], [Waarde]) VALUES " \
-                      f"('{activiteiten_name}', '{self.scenario}', {self.year}, {value} )"
-                self.cursor.execute(sql)
+                value = baseline_value(row['profiles_in'])
+                self._insert(ACTIVITEIT_BASELINE, {'Activiteit': activiteiten_name, 'Scenario': self.scenario,
+                                                   'Jaar': self.year, 'Waarde': value})
             else:
-                print(f"{activiteiten_name} already in [ActiviteitBaseline]")
+                log.debug("%s already in [ActiviteitBaseline]", activiteiten_name)
 
-        self.conn.commit()
+        self._checkpoint()
 
     def _add_options(self):
         ## Add option to Opties table
         for index, row in self.df.iterrows():
             new_opt = row['name']
-            sql = "SELECT * FROM [Opties] WHERE [Naam optie] = '{}'".format(new_opt)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [Opties] WHERE [Naam optie] = ?", (new_opt,))
             ref_option_name = row.opera_equivalent
             if df.shape[0] == 0:  # Case where new option is NOT in table 'Opties'
-                print(f'Adding {new_opt} to [Opties]')
+                log.debug("Adding %s to [Opties]", new_opt)
                 if row['category'] == 'Storage':
                     self._add_storage(row)
                 else:
-                    sql = "SELECT * FROM [Opties] WHERE [Naam optie] = '{}'".format(ref_option_name)
-                    df_ref_option = psql.read_sql(sql, self.engine)
+                    df_ref_option = self._read_sql("SELECT * FROM [Opties] WHERE [Naam optie] = ?", (ref_option_name,))
                     if df_ref_option.empty:
-                        print(f"#######################      There is no Opera equivalent defined for {new_opt}, creating a new one!  ###################")
+                        log.debug("There is no Opera equivalent defined for %s, creating a new one!", new_opt)
                         df_ref_option = pd.DataFrame([{'Nr': 1}])  # create dataframe with one row.
                         df_ref_option['Doelstof'] = 'CO2'  # Default doelstof in Opera
                     df_ref_option = df_ref_option.drop('Nr', axis=1)
@@ -229,17 +402,11 @@ class OperaAccessImporter:
                         #df_ref_option['ReferentieOptie'] = -1   # Fix to get Opera working
                         # df_ref_option['Landelijk beperkt'] = True   # Fix only needed for Windturbine
 
-                    col = [[i] for i in df_ref_option.columns]
-                    sql = 'INSERT INTO [Opties] ({}) VALUES ({}{})'.format(str(col)[1:-1],
-                            '?,' * (len(df_ref_option.columns) - 1), '?').replace("'", "")
-                    values = list(df_ref_option.itertuples(index=False, name=None))
-                    print(sql)
-                    print(values)
-                    self.cursor.executemany(sql, values)
+                    self._insert_dataframe(OPTIES, df_ref_option)
             else: # option already in Opties table
-                print(f"{new_opt} ({df.Nr.values}) already in [Opties]")
+                log.debug("%s (%s) already in [Opties]", new_opt, df.Nr.values)
 
-        self.conn.commit()
+        self._checkpoint()
 
     def _add_storage(self, row: pd.Series):
 
@@ -254,82 +421,77 @@ class OperaAccessImporter:
         # do we need to set value for: Optie onbeperkt, Landelijk beperkt, Capaciteit onbeperkt, Flexibel?
 
         config_storage = {'Unit of Capacity': 'PJ'}
-        sql = f"INSERT INTO [Opties] ([Naam optie], [Unit of Capacity], [Eenheid activiteit], [Cap2Act], [Sector], " \
-              f"[LaadOpslagOptie], [OntlaadOpslagOptie], [VoorraadOpslagOptie], [Levensduur], [Doelstof]) VALUES (" \
-              f"'{row['name']}', 'PJ', 'PJ', 1, '{self.default_sector}', {False}, {False}, {True}, {lifetime}, 'CO2')"
-        print(sql)
-        self.cursor.execute(sql)
-        storage_id = self.cursor.execute("SELECT @@Identity").fetchone()[0]
-        sql = f"INSERT INTO [Opties] ([Naam optie], [Unit of Capacity], [Eenheid activiteit], [Cap2Act], [Sector], " \
-              f"[LaadOpslagOptie], [OntlaadOpslagOptie], [VoorraadOpslagOptie], [Levensduur], " \
-              f"[Doelstof], [ConnectorPointOption]) VALUES (" \
-              f"'{chargerName}', 'GW', 'PJ', {31.536}, '{self.default_sector}', {True}, {False}, {False}, {lifetime}," \
-              f" 'CO2', {True})"
-        self.cursor.execute(sql)
-        charger_id = self.cursor.execute("SELECT @@Identity").fetchone()[0]
-        sql = f"INSERT INTO [Opties] ([Naam optie], [Unit of Capacity], [Eenheid activiteit], [Cap2Act], [Sector], " \
-              f"[LaadOpslagOptie], [OntlaadOpslagOptie], [VoorraadOpslagOptie], [Levensduur], [Doelstof]) VALUES (" \
-              f"'{dischargerName}','GW', 'PJ', {31.536}, '{self.default_sector}', {False}, {True}, {False}, {lifetime}, 'CO2')"
-        self.cursor.execute(sql)
-        discharger_id = self.cursor.execute("SELECT @@Identity").fetchone()[0]
-
-        print(f"storage_id: {storage_id}, charger_id={charger_id}, discharger_id={discharger_id}")
-        self.conn.commit()
+        self._insert(OPTIES, {'Naam optie': row['name'], 'Unit of Capacity': 'PJ', 'Eenheid activiteit': 'PJ',
+                              'Cap2Act': 1, 'Sector': self.default_sector, 'LaadOpslagOptie': False,
+                              'OntlaadOpslagOptie': False, 'VoorraadOpslagOptie': True, 'Levensduur': lifetime,
+                              'Doelstof': 'CO2'})
+        storage_id = self.statements.execute("SELECT @@Identity").fetchone()[0]
+        self._insert(OPTIES, {'Naam optie': chargerName, 'Unit of Capacity': 'GW', 'Eenheid activiteit': 'PJ',
+                              'Cap2Act': 31.536, 'Sector': self.default_sector, 'LaadOpslagOptie': True,
+                              'OntlaadOpslagOptie': False, 'VoorraadOpslagOptie': False, 'Levensduur': lifetime,
+                              'Doelstof': 'CO2', 'ConnectorPointOption': True})
+        charger_id = self.statements.execute("SELECT @@Identity").fetchone()[0]
+        self._insert(OPTIES, {'Naam optie': dischargerName, 'Unit of Capacity': 'GW', 'Eenheid activiteit': 'PJ',
+                              'Cap2Act': 31.536, 'Sector': self.default_sector, 'LaadOpslagOptie': False,
+                              'OntlaadOpslagOptie': True, 'VoorraadOpslagOptie': False, 'Levensduur': lifetime,
+                              'Doelstof': 'CO2'})
+        discharger_id = self.statements.execute("SELECT @@Identity").fetchone()[0]
+
+        log.debug("storage_id: %s, charger_id=%s, discharger_id=%s", storage_id, charger_id, discharger_id)
+        self._checkpoint()
         storage_option: OperaStorageOption = {'name': row['name'], 'nr': storage_id, 'type': StorageType.STORAGE}
         charger_option: OperaStorageOption = {'name': chargerName, 'nr': charger_id, 'type': StorageType.CHARGER}
         discharger_option: OperaStorageOption = {'name': dischargerName, 'nr': discharger_id, 'type': StorageType.DISCHARGER}
         opera_storage_options = [storage_option, charger_option, discharger_option]
 
         for optie in opera_storage_options:
-            sql = "SELECT * FROM [Beschikbare varianten] WHERE [Nr] = {}".format(optie['nr'])
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [Beschikbare varianten] WHERE [Nr] = ?", (optie['nr'],))
 
             if df.shape[0] == 0:  # Case where new option is NOT in table 'Beschikbare varianten'
-                print(f"Adding new option {optie['name']} to [Beschikbare varianten]")
+                log.debug('Adding new option %s to [Beschikbare varianten]', optie['name'])
                 # insert using defaults
-                q = f"INSERT INTO [Beschikbare varianten] ([Nr], [Variant], [Beschikbaar]) VALUES ({optie['nr']}, 1, 1)"
-                self.cursor.execute(q)
+                self._insert(BESCHIKBARE_VARIANTEN, {'Nr': optie['nr'], 'Variant': 1, 'Beschikbaar': 1})
             else:
-                print(f"Option {optie['nr']}/{optie['name']} is already in [Beschikbare varianten]")
-                print(df)
-        self.conn.commit()
+                log.debug('Option %s/%s is already in [Beschikbare varianten]', optie['nr'], optie['name'])
+                log.debug("%s", df)
+        self._checkpoint()
 
         # Define flows in OpgelegdeToegestaneFlows
         # manual for charger -> storage and for storage -> discharger
         input_energiedrager = row['carrier_in']
         opera_energiedrager = opera_energycarrier(input_energiedrager)
-        sql = "SELECT * FROM [OpgelegdeToegestaneFlows] WHERE [OptieVan] = {}".format(charger_option['nr'])
-        df = psql.read_sql(sql, self.engine)
+        df = self._read_sql("SELECT * FROM [OpgelegdeToegestaneFlows] WHERE [OptieVan] = ?", (charger_option['nr'],))
         if df.shape[0] == 0:  # Case where flow is NOT in table 'OpgelegdeToegestaneFlows'
-            print(f"Adding new flow {charger_option['name']}->{storage_option['name']} to [OpgelegdeToegestaneFlows]")
+            log.debug('Adding new flow %s->%s to [OpgelegdeToegestaneFlows]', charger_option['name'], storage_option['name'])
             # insert using defaults
             opmerking = "Storage: Charger -> storage"
-            q = f"INSERT INTO [OpgelegdeToegestaneFlows] ([Energiedrager], [OptieVan], [OptieNaar], [Match], [Opmerking]) " \
-                f" VALUES ('{opera_energiedrager}', {charger_option['nr']}, {storage_option['nr']}, 1, '{opmerking}')"
-            self.cursor.execute(q)
+            self._insert('OpgelegdeToegestaneFlows', {'Energiedrager': opera_energiedrager,
+                                                      'OptieVan': charger_option['nr'],
+                                                      'OptieNaar': storage_option['nr'], 'Match': 1,
+                                                      'Opmerking': opmerking})
         else:
-            print(f"Flow {charger_option['name']}->{storage_option['name']} is already in [OpgelegdeToegestaneFlows]")
-        self.conn.commit()
+            log.debug('Flow %s->%s is already in [OpgelegdeToegestaneFlows]', charger_option['name'], storage_option['name'])
+        self._checkpoint()
 
-        sql = "SELECT * FROM [OpgelegdeToegestaneFlows] WHERE [OptieVan] = {}".format(storage_option['nr'])
-        df = psql.read_sql(sql, self.engine)
+        df = self._read_sql("SELECT * FROM [OpgelegdeToegestaneFlows] WHERE [OptieVan] = ?", (storage_option['nr'],))
         if df.shape[0] == 0:  # Case where flow is NOT in table 'OpgelegdeToegestaneFlows'
-            print(f"Adding new flow {storage_option['name']}->{discharger_option['name']} to [OpgelegdeToegestaneFlows]")
+            log.debug('Adding new flow %s->%s to [OpgelegdeToegestaneFlows]', storage_option['name'], discharger_option['name'])
             # insert using defaults
             opmerking = "Storage: Storage -> Discharger"
-            q = f"INSERT INTO [OpgelegdeToegestaneFlows] ([Energiedrager], [OptieVan], [OptieNaar], [Match], [Opmerking]) " \
-                f" VALUES ('{opera_energiedrager}', {storage_option['nr']}, {discharger_option['nr']}, 1, '{opmerking}')"
-            self.cursor.execute(q)
+            self._insert('OpgelegdeToegestaneFlows', {'Energiedrager': opera_energiedrager,
+                                                      'OptieVan': storage_option['nr'],
+                                                      'OptieNaar': discharger_option['nr'], 'Match': 1,
+                                                      'Opmerking': opmerking})
         else:
-            print(f"Flow {storage_option['name']}->{discharger_option['name']} is already in [OpgelegdeToegestaneFlows]")
-        self.conn.commit()
+            log.debug('Flow %s->%s is already in [OpgelegdeToegestaneFlows]', storage_option['name'], discharger_option['name'])
+        self._checkpoint()
 
         # energiedrageraloc [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)]
         for optie in opera_storage_options:
-            sql = "SELECT * FROM [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)] WHERE [Nr] = {}".format(optie['nr'])
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)] WHERE [Nr] = ?",
+                                (optie['nr'],))
             if df.shape[0] == 0:  # Case where flow is NOT in table 'OpgelegdeToegestaneFlows'
-                print(f"Adding Effect of {optie['name']} to [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)]")
+                log.debug('Adding Effect of %s to [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)]', optie['name'])
                 effect = -1
                 if optie['type'] == StorageType.CHARGER:
                     effect = 1
@@ -338,19 +500,16 @@ class OperaAccessImporter:
                 # todo: in esdl.InputOutputBehavior is used here, use that.
                 # todo: constructiejaar is now hardcoded and same as self.year
 
-                q = f"INSERT INTO [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)] ([Nr], [Energiedrager], [Variant], [ConstructieJaar], [Jaar], [Effect]) " \
-                    f" VALUES (" \
-                    f"{optie['nr']}, '{opera_energiedrager}', 1, {self.year}, {self.year}, {effect}" \
-                    f")"
-                self.cursor.execute(q)
+                self._insert('EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)',
+                             {'Nr': optie['nr'], 'Energiedrager': opera_energiedrager, 'Variant': 1,
+                              'ConstructieJaar': self.year, 'Jaar': self.year, 'Effect': effect})
             else:
-                print(f"Effect of {optie['name']} is already in [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)]")
+                log.debug('Effect of %s is already in [EnergieDragerAlloc(Optie,Energiedrager,Var,ConstrJaar,Jaar)]', optie['name'])
 
             # add Efficiency to [TechnischeParameters(Optie,Jaar)]
-            sql = "SELECT * FROM [TechnischeParameters(Optie,Jaar)] WHERE [Nr] = {}".format(optie['nr'])
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [TechnischeParameters(Optie,Jaar)] WHERE [Nr] = ?", (optie['nr'],))
             if df.shape[0] == 0:  # Case where flow is NOT in table 'OpgelegdeToegestaneFlows'
-                print(f"Adding efficiency of {optie['name']} to [TechnischeParameters(Optie,Jaar)]")
+                log.debug('Adding efficiency of %s to [TechnischeParameters(Optie,Jaar)]', optie['name'])
                 efficiency = 1
                 if optie['type'] == StorageType.CHARGER:
                     efficiency = row['storage_charge_efficiency'] if not_empty(row['storage_charge_efficiency']) else 1
@@ -358,23 +517,19 @@ class OperaAccessImporter:
                     efficiency = row['efficiency'] if not_empty(row['efficiency']) else 1
                 if optie['type'] == StorageType.DISCHARGER:
                     efficiency = row['storage_discharge_efficiency'] if not_empty(row['storage_discharge_efficiency']) else 1
-                q = f"INSERT INTO [TechnischeParameters(Optie,Jaar)] ([Nr], [Jaar], [AvailabilityFactor], [Rendement]) " \
-                    f" VALUES (" \
-                    f"{optie['nr']}, {self.year}, 0.99, {efficiency}" \
-                    f")"
-                self.cursor.execute(q)
+                self._insert('TechnischeParameters(Optie,Jaar)', {'Nr': optie['nr'], 'Jaar': self.year,
+                                                                  'AvailabilityFactor': 0.99, 'Rendement': efficiency})
             else:
-                print(f"Efficiency of {optie['name']} is already in [TechnischeParameters(Optie,Jaar)]")
-            self.conn.commit()
+                log.debug('Efficiency of %s is already in [TechnischeParameters(Optie,Jaar)]', optie['name'])
+            self._checkpoint()
 
             # add storage options to ([OpslagOpties(Optie,ConstrJr)]
-            sql = "SELECT * FROM [OpslagOpties(Optie,ConstrJr)] WHERE [Nr] = {}".format(optie['nr'])
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [OpslagOpties(Optie,ConstrJr)] WHERE [Nr] = ?", (optie['nr'],))
             if df.shape[0] == 0:  # Case where flow is NOT in table 'OpgelegdeToegestaneFlows'
-                print(f"Adding storage options of {optie['name']} to [OpslagOpties(Optie,ConstrJr)]")
-                verliesperuur = 'Null' # check if None works or 0
-                slowloadtime = 'Null'
-                fastloadtime = 'Null'
+                log.debug('Adding storage options of %s to [OpslagOpties(Optie,ConstrJr)]', optie['name'])
+                verliesperuur = None
+                slowloadtime = None
+                fastloadtime = None
                 if optie['type'] == StorageType.CHARGER:
                     slowloadtime = row['storage_slow_loadtime'] if not_empty(row['storage_slow_loadtime']) else 1
                     fastloadtime = row['storage_fast_loadtime'] if not_empty(row['storage_fast_loadtime']) else 1
@@ -383,56 +538,51 @@ class OperaAccessImporter:
                 if optie['type'] == StorageType.DISCHARGER:
                     slowloadtime = row['storage_slow_unloadtime'] if not_empty(row['storage_slow_unloadtime']) else 1
                     fastloadtime = row['storage_fast_unloadtime'] if not_empty(row['storage_fast_unloadtime']) else 1
-                q = f"INSERT INTO [OpslagOpties(Optie,ConstrJr)] ([Nr], [ConstructieJaar], [VerliesPerUur], [SlowLoadTime], [FastLoadTime]) " \
-                    f" VALUES (" \
-                    f"{optie['nr']}, {self.year}, {verliesperuur}, {slowloadtime}, {fastloadtime}" \
-                    f")"
-                print(q)
-                self.cursor.execute(q)
+                self._insert('OpslagOpties(Optie,ConstrJr)', {'Nr': optie['nr'], 'ConstructieJaar': self.year,
+                                                              'VerliesPerUur': verliesperuur,
+                                                              'SlowLoadTime': slowloadtime,
+                                                              'FastLoadTime': fastloadtime})
             else:
-                print(f"Storage options for {optie['name']} is already in [OpslagOpties(Optie,ConstrJr)]")
-            self.conn.commit()
+                log.debug('Storage options for %s is already in [OpslagOpties(Optie,ConstrJr)]', optie['name'])
+            self._checkpoint()
 
 
         # add Kosten, only to storage medium ([OpslagOpties(Optie,ConstrJr)] (battery for now only)
         # todo: for hydrogen, all options have cost (charger, discharger)
-        sql = "SELECT * FROM [Kosten(Optie,Variant,Jaar)] WHERE [Nr] = {} AND [Jaar] = '{}'".format(
-            storage_option['nr'],  self.year)
-        df = psql.read_sql(sql, self.engine)
+        df = self._read_sql(f"SELECT * FROM [{KOSTEN}] WHERE [Nr] = ? AND [Jaar] = ?", (storage_option['nr'], self.year))
         if df.shape[0] == 0:  # Case where no kost for this option
-            print(f"Adding Cost for {storage_option['name']} to [Kosten(Optie,Variant,Jaar)]")
+            log.debug('Adding Cost for %s to [Kosten(Optie,Variant,Jaar)]', storage_option['name'])
             investerings_kosten = row['investment_cost'] if not_empty(row['investment_cost']) else 0.0
             om_kosten = row['o_m_cost'] if not_empty(row['o_m_cost']) else 0.0
             variable_kosten = row['variable_o_m_cost'] if not_empty(row['variable_o_m_cost']) else 0.0
-            q = f"INSERT INTO [Kosten(Optie,Variant,Jaar)] ([Nr], [Variant], [Jaar], [InvesteringsKosten], [Overig operationeel kosten/baten], [Variabele kosten]) " \
-                f" VALUES (" \
-                f"{storage_option['nr']}, 1, {self.year}, {investerings_kosten}, {om_kosten}, {variable_kosten}" \
-                f")"
-            self.cursor.execute(q)
+            self._insert(KOSTEN, {'Nr': storage_option['nr'], 'Variant': 1, 'Jaar': self.year,
+                                  'InvesteringsKosten': investerings_kosten,
+                                  'Overig operationeel kosten/baten': om_kosten, 'Variabele kosten': variable_kosten})
         else:
-            print(f"Cost for {storage_option['name']} is already in [Kosten(Optie,Variant,Jaar)]")
-        self.conn.commit()
+            log.debug('Cost for %s is already in [Kosten(Optie,Variant,Jaar)]', storage_option['name'])
+        self._checkpoint()
 
         # OptieNetwerken not used for now, as we currently don't use the EnergyNetworks in Opera (e.g. HS, MS, LS, HHD, HLD)
 
         ## Add option to CatJaarScen table to set capacity ranges for storage options (not charge and discharger)
-        sql = "SELECT * FROM [CatJaarScen(categorie,jaar,scenario)] WHERE [Categorie] = '{}' AND [Jaar] = '{}' AND [Scenario] = '{}'".format(
-            storage_id, self.year, self.scenario)
-        df = psql.read_sql(sql, self.engine)
+        df = self._read_sql(f"SELECT * FROM [{CATJAARSCEN}] WHERE [Categorie] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                            (str(storage_id), str(self.year), self.scenario))
         if df.shape[0] == 0:  # Case where new option is NOT in table 'CatJaarScen'
-            print(f"Adding new CatJaarScen for optie {storage_id}/{storage_option['name']}")
+            log.debug('Adding new CatJaarScen for optie %s/%s', storage_id, storage_option['name'])
             max_capacity = row['power_max'] if not pd.isna(row['power_max']) else 0  # None
             min_capacity = row['power_min'] if not pd.isna(row['power_min']) else 0
             # currently not filling in columns [Max aantal], [Max kosten], [Min aantal], [Min kosten],
-            sql = f'INSERT INTO [CatJaarScen(categorie,jaar,scenario)] ([Categorie], [Jaar], [Scenario], ' \
-                  f'[Max aantal], [Max kosten], [Min aantal], [Min kosten], ' \
-                  f'[Max totale capaciteit], [Min totale capaciteit], [Min Activiteit Jaar], [Max Activiteit Jaar]) ' \
-                  f"VALUES ('{storage_id}', '{self.year}', '{self.scenario}', 0,0,0,0, " \
-                  f"{max_capacity}, {min_capacity}, 0, 0 );"
-            self.cursor.execute(sql)
-            self.conn.commit()
+            self._insert_catjaarscen(storage_id, max_capacity, min_capacity)
+            self._checkpoint()
         else:
-            print(f"Option {storage_id}/{storage_option['name']} is already present in [CatJaarScen(categorie,jaar,scenario)] with scenario {self.scenario}")
+            log.debug('Option %s/%s is already present in [CatJaarScen(categorie,jaar,scenario)] with scenario %s', storage_id, storage_option['name'], self.scenario)
+
+    def _insert_catjaarscen(self, nr: int, max_capacity, min_capacity):
+        # currently not filling in columns [Max aantal], [Max kosten], [Min aantal], [Min kosten],
+        self._insert(CATJAARSCEN, {'Categorie': str(nr), 'Jaar': str(self.year), 'Scenario': self.scenario,
+                                   'Max aantal': 0, 'Max kosten': 0, 'Min aantal': 0, 'Min kosten': 0,
+                                   'Max totale capaciteit': max_capacity, 'Min totale capaciteit': min_capacity,
+                                   'Min Activiteit Jaar': 0, 'Max Activiteit Jaar': 0})
 
     def _update_storage_related_tables(self, row: pd.Series):
         pass
@@ -447,20 +597,19 @@ class OperaAccessImporter:
             #else:
             #    continue  # skip storage in this method, handled in _update_storage_related_tables()
             new_opt = row['name']
-            print("Updating related tables for option:", new_opt)
+            log.debug("Updating related tables for option: %s", new_opt)
             ref_option_name = row.opera_equivalent
-            sql = "SELECT * FROM [Opties] WHERE [Naam optie] = '{}'".format(new_opt)
-            df_optie = psql.read_sql(sql, self.engine)
-            new_optie_nr = int(df_optie.Nr)
+            df_optie = self._read_sql("SELECT * FROM [Opties] WHERE [Naam optie] = ?", (new_opt,))
+            new_optie_nr = int(df_optie.Nr.iloc[0])
             row['Nr'] = new_optie_nr
 
             ## Add option to Beschikbare varianten table
-            sql = "SELECT * FROM [Beschikbare varianten] WHERE [Nr] = {}".format(new_optie_nr)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql("SELECT * FROM [Beschikbare varianten] WHERE [Nr] = ?", (new_optie_nr,))
 
             if ref_option_name is not None and not pd.isna(ref_option_name):
-                sql = "SELECT * FROM [Opties] WHERE [Naam optie] = '{}'".format(ref_option_name)
-                df_ref_option = psql.read_sql(sql, self.engine)
+                df_ref_option = self._read_sql("SELECT * FROM [Opties] WHERE [Naam optie] = ?", (ref_option_name,))
+                if df_ref_option.empty:
+                    df_ref_option = None
             else:
                 df_ref_option = None
 
@@ -468,34 +617,22 @@ class OperaAccessImporter:
 
                 if df_ref_option is not None:
                     # copy data from the reference [Beschikbare varianten] and use that to insert new option
-                    sql = "SELECT * FROM [Beschikbare varianten] WHERE [Nr] = {}".format(int(df_ref_option.Nr))
-                    df3 = psql.read_sql(sql, self.engine)
-                    df3.Nr = df_optie.Nr
-                    col = [[i] for i in df3.columns]
-
-                    q = 'INSERT INTO [Beschikbare varianten] ({}) VALUES ({}{})'.format(str(col)[1:-1], '?,' * (
-                            len(df3.columns) - 1), '?').replace("'", "")
-                    values = list(df3.itertuples(index=False, name=None))
-                    print(q, values)
-                    self.cursor.executemany(q, values)
+                    df3 = self._read_sql("SELECT * FROM [Beschikbare varianten] WHERE [Nr] = ?", (int(df_ref_option.Nr.iloc[0]),))
+                    df3.Nr = new_optie_nr
+                    self._insert_dataframe(BESCHIKBARE_VARIANTEN, df3)
                 else:
-                    print(f"Adding new option {df_optie['Naam optie'].values} to [Beschikbare varianten]")
+                    log.debug('Adding new option %s to [Beschikbare varianten]', df_optie['Naam optie'].values)
                     # insert using defaults
-                    q = f'INSERT INTO [Beschikbare varianten] ([Nr], [Variant], [Beschikbaar]) VALUES ({new_optie_nr}, 1, 1)'
-                    print(q)
-                    res = self.cursor.execute(q)
-                    print(res)
-                self.conn.commit()
+                    self._insert(BESCHIKBARE_VARIANTEN, {'Nr': new_optie_nr, 'Variant': 1, 'Beschikbaar': 1})
+                self._checkpoint()
 
             else:
-                print(f'Option {df_optie.Nr.values}/{new_opt} is already in [Beschikbare varianten]')
-                print(df)
+                log.debug("Option %s/%s is already in [Beschikbare varianten]", df_optie.Nr.values, new_opt)
+                log.debug("%s", df)
 
             ## Add option to Kosten table
 
-            sql = "SELECT * FROM [Kosten(Optie,Variant,Jaar)] WHERE [Nr] = {} AND [Jaar] = '{}'".format(new_optie_nr,
-                                                                                                        self.year)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql(f"SELECT * FROM [{KOSTEN}] WHERE [Nr] = ? AND [Jaar] = ?", (new_optie_nr, self.year))
 
             investment_cost = row['investment_cost'] if not_empty(row['investment_cost']) else 0.0
             o_m_cost = row['o_m_cost'] if not_empty(row['o_m_cost']) else 0.0
@@ -504,87 +641,70 @@ class OperaAccessImporter:
 
             if df.shape[0] == 0 and not no_costs_defined:  # Case where new option is NOT in table 'Kosten'
                 if df_ref_option is not None:
-                    sql = "SELECT * FROM [Kosten(Optie,Variant,Jaar)] WHERE [Nr] = {} AND [Jaar] = '{}'".format(
-                        int(df_ref_option.Nr),
-                        self.year)
-                    df3 = psql.read_sql(sql, self.engine)
+                    df3 = self._read_sql(f"SELECT * FROM [{KOSTEN}] WHERE [Nr] = ? AND [Jaar] = ?",
+                                         (int(df_ref_option.Nr.iloc[0]), self.year))
                     if df3.empty: # if no costs are found for reference option, create new
-                        df3 = pd.DataFrame({'Nr': new_optie_nr, 'Variant': 1, 'Jaar': self.year})
-                    print(df3)
-                    df3.Nr = df_optie.Nr
+                        df3 = pd.DataFrame([{'Nr': new_optie_nr, 'Variant': 1, 'Jaar': self.year}])
+                    df3.Nr = new_optie_nr
                     df3['Investeringskosten'] = float(investment_cost)
                     df3['Overig operationeel kosten/baten'] = float(o_m_cost)
                     df3['Variabele kosten'] = float(variable_cost)
                     # Do we need to add more costs (?)
-                    col = [[i] for i in df3.columns]
-
-                    sql = 'INSERT INTO [Kosten(Optie,Variant,Jaar)] ({}) VALUES ({}{})'.format(str(col)[1:-1], '?,' * (
-                                len(df3.columns) - 1), '?').replace("'", "")
-                    values = list(df3.itertuples(index=False, name=None))
-                    print(sql)
-                    print(values)
-                    self.cursor.executemany(sql, values)
+                    self._insert_dataframe(KOSTEN, df3)
                 else:
                     # TODO add overige kosten?
-                    q = f'INSERT INTO [Kosten(Optie,Variant,Jaar)] ([Nr], [Variant], [Jaar], [Investeringskosten], [Overig operationeel kosten/baten], [Variabele kosten]) ' \
-                        f'VALUES ({new_optie_nr}, 1, {self.year}, {float(investment_cost)}, {float(o_m_cost)}, {float(variable_cost)})'
-                    self.cursor.execute(q)
-                self.conn.commit()
+                    self._insert(KOSTEN, {'Nr': new_optie_nr, 'Variant': 1, 'Jaar': self.year,
+                                          'Investeringskosten': float(investment_cost),
+                                          'Overig operationeel kosten/baten': float(o_m_cost),
+                                          'Variabele kosten': float(variable_cost)})
+                self._checkpoint()
             else:
                 if no_costs_defined:
-                    print(f"All costs are empty for {df_optie.Nr.values}/{new_opt}, not adding to [Kosten(Optie,Variant,Jaar)]")
+                    log.debug("All costs are empty for %s/%s, not adding to [Kosten(Optie,Variant,Jaar)]", df_optie.Nr.values, new_opt)
                 else:
-                    print(f'Option {df_optie.Nr.values}/{new_opt} has already costs attached in [Kosten(Optie,Variant,Jaar)]')
-                    print(df)
+                    log.debug("Option %s/%s has already costs attached in [Kosten(Optie,Variant,Jaar)]", df_optie.Nr.values, new_opt)
+                    log.debug("%s", df)
 
             # Add option to Energiegebruik table, update efficiency in  Effect column (x unit required for 1 unit of output)
             # first input carriers
             esdl_carrier_in = row['carrier_in']
             if esdl_carrier_in is not None and esdl_carrier_in:
                 carrier_in = opera_energycarrier(esdl_carrier_in)  # convert to Opera version of this ESDL carrier
-                sql = "SELECT * FROM [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] WHERE [Nr] = {} AND [Jaar] = '{}' AND [Energiedrager] = '{}'".format(
-                    new_optie_nr, self.year, carrier_in)
-                df = psql.read_sql(sql, self.engine)
+                df = self._read_sql(f"SELECT * FROM [{ENERGIEGEBRUIK}] WHERE [Nr] = ? AND [Jaar] = ? AND [Energiedrager] = ?",
+                                    (new_optie_nr, self.year, carrier_in))
                 if df.shape[0] == 0:  # Case where new option is NOT in table 'Energiegebruik'
-                    print(f"Inserting efficiency for option {new_opt} and carrier_in {carrier_in}")
-                    sql = f"INSERT INTO [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] ([Nr],[Energiedrager],[Variant],[Jaar],[Effect]) VALUES " \
-                          f"({new_optie_nr}, '{carrier_in}', {1}, {self.year}, '{1}');"  # Effect for consumption is always 1
-                    print(sql)
-                    self.cursor.execute(sql)
+                    log.debug("Inserting efficiency for option %s and carrier_in %s", new_opt, carrier_in)
+                    # Effect for consumption is always 1
+                    self._insert(ENERGIEGEBRUIK, {'Nr': new_optie_nr, 'Energiedrager': carrier_in, 'Variant': 1,
+                                                  'Jaar': self.year, 'Effect': '1'})
                 else:
-                    print(
-                        f'Option {df_optie.Nr.values}/{new_opt} is already present in [Energiegebruik(Optie,Energiedrager,Variant,Jaar)]')
+                    log.debug("Option %s/%s is already present in [Energiegebruik(Optie,Energiedrager,Variant,Jaar)]", df_optie.Nr.values, new_opt)
 
             carrier_out = row['carrier_out']
             if carrier_out is not None and carrier_out:
                 carrier_out = opera_energycarrier(carrier_out)  # convert to opera equivalent of this ESDL carrier
-                sql = "SELECT * FROM [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] WHERE [Nr] = {} AND [Jaar] = '{}' AND [Energiedrager] = '{}'".format(
-                    new_optie_nr, self.year, carrier_out)
-                df = psql.read_sql(sql, self.engine)
+                df = self._read_sql(f"SELECT * FROM [{ENERGIEGEBRUIK}] WHERE [Nr] = ? AND [Jaar] = ? AND [Energiedrager] = ?",
+                                    (new_optie_nr, self.year, carrier_out))
                 if df.shape[0] == 0:  # Case where new option is NOT in table 'Energiegebruik'
-                    print(f"Inserting efficiency for option {new_opt} and carrier_out {carrier_out}")
+                    log.debug("Inserting efficiency for option %s and carrier_out %s", new_opt, carrier_out)
                     # Effect is a 'Short Text' column. insert as string and use . as decimal separator instead of ,
-                    effect = -row['efficiency'] if row['efficiency'] != 0.0 or not pd.isna(row['efficiency']) else -1
-                    sql = f"INSERT INTO [Energiegebruik(Optie,Energiedrager,Variant,Jaar)] ([Nr],[Energiedrager],[Variant],[Jaar],[Effect]) VALUES " \
-                          f"({new_optie_nr}, '{carrier_out}', {1}, {self.year}, '{str(effect)}');"
-                    self.cursor.execute(sql)
+                    effect = output_effect(row)
+                    self._insert(ENERGIEGEBRUIK, {'Nr': new_optie_nr, 'Energiedrager': carrier_out, 'Variant': 1,
+                                                  'Jaar': self.year, 'Effect': str(effect)})
                 else:
-                    print(
-                        f'Option {df_optie.Nr.values}/{new_opt} is already present in [Energiegebruik(Optie,Energiedrager,Variant,Jaar)]')
+                    log.debug("Option %s/%s is already present in [Energiegebruik(Optie,Energiedrager,Variant,Jaar)]", df_optie.Nr.values, new_opt)
 
             ## Add option to CatJaarScen table
-            sql = "SELECT * FROM [CatJaarScen(categorie,jaar,scenario)] WHERE [Categorie] = '{}' AND [Jaar] = '{}' AND [Scenario] = '{}'".format(
-                new_optie_nr, self.year, self.scenario)
-            df = psql.read_sql(sql, self.engine)
+            df = self._read_sql(f"SELECT * FROM [{CATJAARSCEN}] WHERE [Categorie] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                                (str(new_optie_nr), str(self.year), self.scenario))
             if df.shape[0] == 0:  # Case where new option is NOT in table 'CatJaarScen'
                 df3 = pd.DataFrame()
                 if df_ref_option is not None:
-                    sql = "SELECT * FROM [CatJaarScen(categorie,jaar,scenario)] WHERE [Categorie] = '{}' AND [Jaar] = '{}' AND [Scenario] = '{}'".format(
-                        int(df_ref_option.Nr), self.year, self.scenario)
-                    df3 = psql.read_sql(sql, self.engine)
+                    df3 = self._read_sql(f"SELECT * FROM [{CATJAARSCEN}] WHERE [Categorie] = ? AND [Jaar] = ? AND [Scenario] = ?",
+                                         (str(int(df_ref_option.Nr.iloc[0])), str(self.year), self.scenario))
                 if not df3.empty:  # can use reference option
-                    print(f"Adding new CatJaarScen for optie {new_optie_nr}/{new_opt}, based on reference option {ref_option_name}")
-                    df3.Categorie = new_optie_nr
+                    log.debug("Adding new CatJaarScen for optie %s/%s, based on reference option %s", new_optie_nr, new_opt, ref_option_name)
+                    df3.Categorie = str(new_optie_nr)
                     df3['Max totale capaciteit'] = row['power_max'] if not pd.isna(row['power_max']) else None
                     df3['Min totale capaciteit'] = row['power_min'] if not pd.isna(row['power_min']) else 0
                     df3['Max Activiteit Jaar'] = 0
@@ -592,51 +712,229 @@ class OperaAccessImporter:
                     df3['ActiviteitMinimaalGelijkBaseline'] = False  # Fix to get Opera  working
 
 
-                    col = [[i] for i in df3.columns]
-                    sql = 'INSERT INTO [CatJaarScen(categorie,jaar,scenario)] ({}) VALUES ({}{})'.format(str(col)[1:-1], '?,' * (len(df3.columns) - 1), '?').replace("'", "")
-                    #print(sql)
-                    #print(df3)
-                    #print(list(df3.itertuples(index=False, name=None)))
-                    self.cursor.executemany(
-                        sql,
-                        list(df3.itertuples(index=False, name=None)))
+                    self._insert_dataframe(CATJAARSCEN, df3)
                 else:
-                    print(f"Adding new CatJaarScen for optie {new_optie_nr}/{new_opt}")
+                    log.debug("Adding new CatJaarScen for optie %s/%s", new_optie_nr, new_opt)
                     max_capacity = row['power_max'] if not pd.isna(row['power_max']) else 0 #None
                     min_capacity = row['power_min'] if not pd.isna(row['power_min']) else 0
-                    # currently not filling in columns [Max aantal], [Max kosten], [Min aantal], [Min kosten],
-                    sql = f'INSERT INTO [CatJaarScen(categorie,jaar,scenario)] ([Categorie], [Jaar], [Scenario], ' \
-                          f'[Max aantal], [Max kosten], [Min aantal], [Min kosten], ' \
-                          f'[Max totale capaciteit], [Min totale capaciteit], [Min Activiteit Jaar], [Max Activiteit Jaar]) ' \
-                          f"VALUES ('{new_optie_nr}', '{self.year}', '{self.scenario}', 0, 0, 0, 0, {max_capacity}, {min_capacity}, {0}, {0});"
-                    #print(sql)
-                    self.cursor.execute(sql)
+                    self._insert_catjaarscen(new_optie_nr, max_capacity, min_capacity)
 
-                self.conn.commit()
+                self._checkpoint()
 
             else:
-                print(
-                    f'Option {df_optie.Nr.values}/{new_opt} is already present in [CatJaarScen(categorie,jaar,scenario)] with scenario {self.scenario}')
-                print(df)
+                log.debug("Option %s/%s is already present in [CatJaarScen(categorie,jaar,scenario)] with scenario %s", df_optie.Nr.values, new_opt, self.scenario)
+                log.debug("%s", df)
 
             if row['category'] == 'Consumer':
                 activiteiten_name = activity_name(row['name'])
                 # TODO: OptieActiviteit(Optie,Activiteit) : connect option to activiteit.
-                sql = "SELECT * FROM [OptieActiviteit(Optie,Activiteit)] WHERE [Optie] = {} AND [Activiteit] = '{}'" \
-                    .format(new_optie_nr, activiteiten_name)
-                df = psql.read_sql(sql, self.engine)
+                df = self._read_sql(f"SELECT * FROM [{OPTIE_ACTIVITEIT}] WHERE [Optie] = ? AND [Activiteit] = ?",
+                                    (new_optie_nr, activiteiten_name))
                 if df.shape[0] == 0:  # Case where new activity is NOT in table 'ActiviteitBaseline'
-                    print(f'Adding {activiteiten_name} to [OptieActiviteit]')
-                    sql = f"INSERT INTO [OptieActiviteit(Optie,Activiteit)] ([Optie],[Activiteit], [Match]) VALUES " \
-                          f"({new_optie_nr}, '{activiteiten_name}', {True})"
-                    self.cursor.execute(sql)
+                    log.debug("Adding %s to [OptieActiviteit]", activiteiten_name)
+                    self._insert(OPTIE_ACTIVITEIT, {'Optie': new_optie_nr, 'Activiteit': activiteiten_name,
+                                                    'Match': True})
                 else:
-                    print(f"{activiteiten_name} already in [OptieActiviteit]")
+                    log.debug("%s already in [OptieActiviteit]", activiteiten_name)
 
             ### A similar procedure can be done to include activities (demands)
             # following slide "Database (5)" in the file "D:\MMVIB\MMvIB\Working with OPERA_20220907.pptx"
             # It is crucial that the table 'OptieActiviteit' connect (match) the number of the included Options and an Activiteit (demand) in OPERA
 
-        self.conn.commit()
-
-
+        self._checkpoint()
+
+    # Bulk import: every reference table is read once, new rows are determined on the dataframes and each table
+    # is written with a single executemany
+
+    def _prefetch_reference_tables(self):
+        self.tables = {}
+        for table in REFERENCE_TABLES:
+            self.tables[table] = self._read_sql(f"SELECT * FROM [{table}]")
+        log.debug("Prefetched %s Opera reference tables", len(REFERENCE_TABLES))
+
+    def _current_year(self, table: str, scenario: bool = False) -> pd.DataFrame:
+        df = self.tables[table]
+        selection = pd.to_numeric(df['Jaar'], errors='coerce') == self.year
+        if scenario:
+            selection &= df['Scenario'] == self.scenario
+        return df[selection]
+
+    def _bulk_insert(self, table: str, rows: pd.DataFrame):
+        """Inserts all rows with one parameterized statement and adds them to the in-memory reference table"""
+        if rows.empty:
+            return
+        log.debug("Inserting %s rows into [%s]", len(rows), table)
+        self._insert_dataframe(table, rows)
+        if table in self.tables:
+            self.tables[table] = pd.concat([self.tables[table], rows], ignore_index=True)
+
+    def _bulk_add_activities(self):
+        consumers = self.consumer_options.drop_duplicates('name')
+        activities = pd.DataFrame({'Activiteit': consumers['name'].map(activity_name),
+                                   'Waarde': consumers['profiles_in'].map(baseline_value)})
+
+        new_activities = activities[~activities['Activiteit'].isin(self.tables[ACTIVITEITEN]['Activiteit'])]
+        self._bulk_insert(ACTIVITEITEN, pd.DataFrame({'Activiteit': new_activities['Activiteit'], 'Eenheid': 'PJ'}))
+
+        baseline = self._current_year(ACTIVITEIT_BASELINE, scenario=True)
+        new_baseline = activities[~activities['Activiteit'].isin(baseline['Activiteit'])]
+        self._bulk_insert(ACTIVITEIT_BASELINE, pd.DataFrame({'Activiteit': new_baseline['Activiteit'],
+                                                             'Scenario': self.scenario,
+                                                             'Jaar': self.year,
+                                                             'Waarde': new_baseline['Waarde']}))
+        self._checkpoint()
+
+    def _bulk_add_options(self):
+        opties = self.tables[OPTIES]
+        new_options = self.df[~self.df['name'].isin(opties['Naam optie'])].drop_duplicates('name')
+
+        # storage options need the ids of the created options, so are added one by one
+        for index, row in new_options[new_options['category'] == 'Storage'].iterrows():
+            self._add_storage(row)
+        new_options = new_options[new_options['category'] != 'Storage']
+
+        # copy the reference option (the Opera equivalent) if available
+        reference = opties.drop(columns='Nr').drop_duplicates('Naam optie').rename(columns={'Naam optie': '_ref'})
+        merged = new_options[['name', 'category', 'opera_equivalent']].merge(
+            reference, left_on='opera_equivalent', right_on='_ref', how='left', indicator='_has_ref')
+        has_ref = merged['_has_ref'] == 'both'
+        for name in merged.loc[~has_ref, 'name']:
+            log.debug("There is no Opera equivalent defined for %s, creating a new one", name)
+
+        is_consumer = merged['category'] == 'Consumer'
+        merged['Naam optie'] = merged['name']
+        merged['Sector'] = 'Energie'  # use an unused sector in opera for now (see Sectoren table)
+        merged['Unit of Capacity'] = is_consumer.map({True: 'PJ', False: 'GW'})
+        merged['Eenheid activiteit'] = 'PJ'
+        merged['Cap2Act'] = is_consumer.map({True: 1, False: 31.536})
+        merged['Optie onbeperkt'] = True  # Fix to get Opera working
+        merged['Capaciteit onbeperkt'] = True
+        merged.loc[~has_ref, 'Doelstof'] = 'CO2'  # Default doelstof in Opera
+
+        option_columns = list(dict.fromkeys(['Naam optie'] + [c for c in reference.columns if c != '_ref'] + OPTION_COLUMNS))
+        self._bulk_insert(OPTIES, merged.loc[has_ref, option_columns])
+        self._bulk_insert(OPTIES, merged.loc[~has_ref, ['Doelstof'] + OPTION_COLUMNS])
+
+        self._checkpoint()
+
+        # read back the ids (Nr) of the new options
+        self.tables[OPTIES] = self._read_sql(f"SELECT * FROM [{OPTIES}]")
+
+    def _bulk_update_option_related_tables(self):
+        opties = self.tables[OPTIES].drop_duplicates('Naam optie').set_index('Naam optie')['Nr']
+        self.df['Nr'] = self.df['name'].map(opties).fillna(0).astype(int)
+
+        options = self.df[self.df['category'] != 'Storage'].drop_duplicates('name').copy()
+        options['ref_nr'] = options['opera_equivalent'].map(opties)
+        for column in ['investment_cost', 'o_m_cost', 'variable_o_m_cost']:
+            options[column] = pd.to_numeric(options[column], errors='coerce').fillna(0.0)
+
+        self._bulk_add_beschikbare_varianten(options)
+        self._bulk_add_kosten(options)
+        self._bulk_add_energiegebruik(options)
+        self._bulk_add_catjaarscen(options)
+        self._bulk_add_optie_activiteit(options)
+        self._checkpoint()
+
+    def _copy_reference_rows(self, options: pd.DataFrame, reference_table: pd.DataFrame, key: str) -> pd.DataFrame:
+        """Returns the rows of the reference options in the reference table, with key set to the new option Nr"""
+        with_ref = options[options['ref_nr'].notna()][['Nr', 'ref_nr', 'name']]
+        ref_rows = reference_table.copy()
+        ref_rows['_ref_key'] = pd.to_numeric(ref_rows[key], errors='coerce').astype(float)
+        with_ref = with_ref.assign(_ref_key=with_ref['ref_nr'].astype(float))
+        copied = with_ref.merge(ref_rows.drop(columns=key), on='_ref_key')
+        copied = copied.rename(columns={'Nr': key} if key != 'Nr' else {})
+        return copied
+
+    def _bulk_add_beschikbare_varianten(self, options: pd.DataFrame):
+        bv = self.tables[BESCHIKBARE_VARIANTEN]
+        todo = options[~options['Nr'].isin(bv['Nr'])]
+        copied = self._copy_reference_rows(todo, bv, 'Nr')
+        self._bulk_insert(BESCHIKBARE_VARIANTEN, copied[list(bv.columns)])
+        # insert using defaults
+        defaults = todo[~todo['name'].isin(copied['name'])]
+        self._bulk_insert(BESCHIKBARE_VARIANTEN, pd.DataFrame({'Nr': defaults['Nr'], 'Variant': 1, 'Beschikbaar': 1}))
+
+    def _bulk_add_kosten(self, options: pd.DataFrame):
+        kosten = self._current_year(KOSTEN)
+        costs = options[['investment_cost', 'o_m_cost', 'variable_o_m_cost']]
+        costs_defined = (costs != 0.0).any(axis=1)
+        todo = options[~options['Nr'].isin(kosten['Nr']) & costs_defined]
+        for name in options.loc[~costs_defined, 'name']:
+            log.debug("All costs are empty for %s, not adding to [%s]", name, KOSTEN)
+
+        copied = self._copy_reference_rows(todo, kosten, 'Nr')
+        copied = copied.merge(todo[['name', 'investment_cost', 'o_m_cost', 'variable_o_m_cost']], on='name')
+        for column, cost in zip(COST_COLUMNS, ['investment_cost', 'o_m_cost', 'variable_o_m_cost']):
+            copied[_column_name(kosten, column)] = copied[cost]
+        kosten_columns = list(dict.fromkeys(list(kosten.columns) + [_column_name(kosten, c) for c in COST_COLUMNS]))
+        self._bulk_insert(KOSTEN, copied[kosten_columns])
+
+        defaults = todo[~todo['name'].isin(copied['name'])]
+        self._bulk_insert(KOSTEN, pd.DataFrame({'Nr': defaults['Nr'], 'Variant': 1, 'Jaar': self.year,
+                                                COST_COLUMNS[0]: defaults['investment_cost'],
+                                                COST_COLUMNS[1]: defaults['o_m_cost'],
+                                                COST_COLUMNS[2]: defaults['variable_o_m_cost']}))
+
+    def _bulk_add_energiegebruik(self, options: pd.DataFrame):
+        # Add option to Energiegebruik table, update efficiency in Effect column (x unit required for 1 unit of output)
+        carrier_in = options[options['carrier_in'].fillna('') != '']
+        carrier_out = options[options['carrier_out'].fillna('') != '']
+        rows = pd.concat([
+            pd.DataFrame({'Nr': carrier_in['Nr'], 'Energiedrager': carrier_in['carrier_in'].map(opera_energycarrier),
+                          'Effect': '1'}),  # Effect for consumption is always 1
+            # Effect is a 'Short Text' column. insert as string and use . as decimal separator instead of ,
+            pd.DataFrame({'Nr': carrier_out['Nr'], 'Energiedrager': carrier_out['carrier_out'].map(opera_energycarrier),
+                          'Effect': carrier_out.apply(output_effect, axis=1).astype(str)
+                          if len(carrier_out) else pd.Series(dtype='str')}),
+        ], ignore_index=True).drop_duplicates(['Nr', 'Energiedrager'])
+
+        existing = self._current_year(ENERGIEGEBRUIK)
+        existing_keys = set(zip(existing['Nr'], existing['Energiedrager']))
+        rows = rows[[key not in existing_keys for key in zip(rows['Nr'], rows['Energiedrager'])]]
+        self._bulk_insert(ENERGIEGEBRUIK, pd.DataFrame({'Nr': rows['Nr'], 'Energiedrager': rows['Energiedrager'],
+                                                        'Variant': 1, 'Jaar': self.year, 'Effect': rows['Effect']}))
+
+    def _bulk_add_catjaarscen(self, options: pd.DataFrame):
+        catjaarscen = self._current_year(CATJAARSCEN, scenario=True)
+        todo = options[~options['Nr'].isin(pd.to_numeric(catjaarscen['Categorie'], errors='coerce'))]
+
+        copied = self._copy_reference_rows(todo, catjaarscen, 'Categorie')
+        copied['Categorie'] = copied['Categorie'].astype(str)
+        copied = copied.merge(todo[['name', 'power_min', 'power_max']], on='name')
+        copied['Max totale capaciteit'] = copied['power_max'].where(copied['power_max'].notna(), None)
+        copied['Min totale capaciteit'] = copied['power_min'].where(copied['power_min'].notna(), 0)
+        copied['Max Activiteit Jaar'] = 0
+        copied['Min Activiteit Jaar'] = 0
+        copied['ActiviteitMinimaalGelijkBaseline'] = False  # Fix to get Opera  working
+        self._bulk_insert(CATJAARSCEN, copied[list(dict.fromkeys(list(catjaarscen.columns) + [
+            'Max totale capaciteit', 'Min totale capaciteit', 'Max Activiteit Jaar', 'Min Activiteit Jaar',
+            'ActiviteitMinimaalGelijkBaseline']))])
+
+        # currently not filling in columns [Max aantal], [Max kosten], [Min aantal], [Min kosten]
+        defaults = todo[~todo['name'].isin(copied['name'])]
+        self._bulk_insert(CATJAARSCEN, pd.DataFrame({
+            'Categorie': defaults['Nr'].astype(str), 'Jaar': str(self.year), 'Scenario': self.scenario,
+            'Max aantal': 0, 'Max kosten': 0, 'Min aantal': 0, 'Min kosten': 0,
+            'Max totale capaciteit': defaults['power_max'].where(defaults['power_max'].notna(), 0),
+            'Min totale capaciteit': defaults['power_min'].where(defaults['power_min'].notna(), 0),
+            'Min Activiteit Jaar': 0, 'Max Activiteit Jaar': 0}))
+
+    def _bulk_add_optie_activiteit(self, options: pd.DataFrame):
+        # It is crucial that the table 'OptieActiviteit' connect (match) the number of the included Options and an
+        # Activiteit (demand) in OPERA
+        consumers = options[options['category'] == 'Consumer']
+        rows = pd.DataFrame({'Optie': consumers['Nr'], 'Activiteit': consumers['name'].map(activity_name),
+                             'Match': True})
+        existing = self.tables[OPTIE_ACTIVITEIT]
+        existing_keys = set(zip(existing['Optie'], existing['Activiteit']))
+        rows = rows[[key not in existing_keys for key in zip(rows['Optie'], rows['Activiteit'])]]
+        self._bulk_insert(OPTIE_ACTIVITEIT, rows)
+
+
+def _column_name(df: pd.DataFrame, column: str) -> str:
+    """Returns the name of the column in df that matches case-insensitively (Access is case-insensitive)"""
+    for c in df.columns:
+        if c.lower() == column.lower():
+            return c
+    return column
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import esdl
+import numpy as np
+import pandas as pd
+from esdl.esdl_handler import EnergySystemHandler
+
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_index import esdl_index
+from tno.aimms_adapter.model.opera_esdl_parser.unit import convert_to_unit, POWER_IN_GW, POWER_IN_W
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
+
+@dataclass
+class ResultFile:
+    """An Opera output CSV and the columns (with their dtype) that a mapper reads from it"""
+    name: str
+    columns: Dict[str, str]
+
+
+class AssetIndex:
+    """
+    The input assets of a run, indexed once for all result mappers. Opera options are matched to assets by name,
+    as the options are named after the assets they were created from. Assets with the same name all get the results
+    of their option.
+    """
+
+    def __init__(self, esh: EnergySystemHandler, input_df: pd.DataFrame):
+        self.esh = esh
+        self.esdl = esdl_index(esh)
+        self.assets = input_df[['id', 'name', 'power_min', 'power_max']].drop_duplicates('id')
+        shared = self.assets['name'].duplicated(keep=False)
+        for name, count in self.assets.loc[shared, 'name'].value_counts(sort=False).items():
+            log.warning(f"{count} assets are named {name}, they all get the Opera results of that name")
+
+    def match(self, table: pd.DataFrame) -> pd.DataFrame:
+        """Returns the rows of an Opera output table joined with the asset they belong to"""
+        return self.assets.merge(table, left_on='name', right_on='Name', how='inner', sort=False)
+
+    def get(self, asset_id: str) -> Optional[esdl.EnergyAsset]:
+        return self.esdl.get(asset_id)
+
+
+class ResultMapper(ABC):
+    """Writes the results in one or more Opera output files into the ESDL"""
+    name: str
+    files: List[ResultFile]
+    # a run fails without the results of a required mapper, the results of other mappers are skipped when missing
+    required: bool = False
+
+    @abstractmethod
+    def apply(self, tables: Dict[str, pd.DataFrame], index: AssetIndex):
+        """
+        :param tables: the files of this mapper by name, with an extra Name column: the option without its number
+        :param index: the input assets
+        """
+        pass
+
+
+class CapacityMapper(ResultMapper):
+    """Updates the power of the assets with the capacities that Opera has chosen"""
+    name = 'capacity'
+    required = True
+    # Regions,Option,Variant,Construction year,View year,Capacity
+    files = [ResultFile("Capacity.csv", {'Option': 'str', 'Capacity': 'float'}),
+             ResultFile("UoCapacity.csv", {'Option': 'str', 'UoCapacity': 'str'})]
+
+    def apply(self, tables: Dict[str, pd.DataFrame], index: AssetIndex):
+        capacity = pd.merge(left=tables["Capacity.csv"], right=tables["UoCapacity.csv"][['Option', 'UoCapacity']],
+                            on='Option', )
+        duplicated = capacity['Name'].duplicated(keep=False)
+        for asset_name in capacity.loc[duplicated, 'Name'].unique():
+            log.warning(f"Ignoring {asset_name} as Opera reports more than one capacity for it")
+        capacity = capacity[~duplicated]
+
+        matched = index.match(capacity[['Name', 'Capacity', 'UoCapacity']])
+        log.debug("Found capacities for %s of %s assets", len(matched), len(index.assets))
+        for row in matched.itertuples(index=False):
+            asset_name = row.name
+            updated_capacity_in_GW = row.Capacity
+            source_unit = POWER_IN_GW
+            if row.UoCapacity != 'GW':
+                log.info(f"Ignoring {asset_name} as its unit is not GW, which is incompatible with the power attribute of this ESDL asset")
+                continue  # we can only handle GW for power attribute now
+            min_capacity_range = row.power_min # convert_to_unit(row['power_min'], POWER_IN_W, POWER_IN_GW)
+            max_capacity_range = row.power_max #convert_to_unit(row['power_max'], POWER_IN_W, POWER_IN_GW)
+
+            id = row.id
+            asset: esdl.EnergyAsset = index.get(id)
+            if asset and hasattr(asset, 'power'):
+                power_in_w = convert_to_unit(updated_capacity_in_GW, source_unit, POWER_IN_W)
+                old_power_in_GW = convert_to_unit(asset.power, POWER_IN_W, source_unit)
+                if min_capacity_range and max_capacity_range and \
+                        not np.isnan(min_capacity_range) and not np.isnan(max_capacity_range):
+                    log.debug("Found updated capacity for %s: %s GW in range [%.2f-%.2f], old power=%s GW", asset_name, updated_capacity_in_GW, min_capacity_range, max_capacity_range, old_power_in_GW)
+                    # clear constraints, as these have been solved
+                    asset.constraint.clear()
+                else:
+                    log.debug("Found updated capacity for %s: %s GW (old power=%s GW)", asset_name, updated_capacity_in_GW, old_power_in_GW)
+                asset.power = power_in_w
+
+            else:
+                log.error(f"Can't find asset in ESDL: asset_id={id}, asset_name={asset_name} with attribute 'power'")
+
+
+# all result mappers by name, OPERA_RESULT_MAPPERS selects which of these are applied. A mapper for another Opera
+# output file is added here
+RESULT_MAPPERS: Dict[str, ResultMapper] = {mapper.name: mapper for mapper in [
+    CapacityMapper(),
+]}
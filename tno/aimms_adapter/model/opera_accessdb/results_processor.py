@@ -1,17 +1,22 @@
 import os
 from os.path import abspath
+from typing import Dict, List, Tuple
 
-import esdl
-import numpy as np
 import pandas as pd
 from esdl.esdl_handler import EnergySystemHandler
 
+from tno.aimms_adapter.model.opera_accessdb.result_mappers import ResultMapper, RESULT_MAPPERS, AssetIndex, \
+    CapacityMapper
 from tno.aimms_adapter.model.opera_esdl_parser.unit import convert_to_unit, POWER_IN_GW, POWER_IN_W
 from tno.shared.log import get_logger
 
 log = get_logger(__name__)
 
 
+class OperaResultsException(Exception):
+    pass
+
+
 class OperaResultsProcessor:
     output_path: str
     esh: EnergySystemHandler
@@ -26,49 +31,158 @@ class OperaResultsProcessor:
         es = self.esh.get_energy_system()
         es.description = es.description + "\nIncluding Opera results"
         es.version = str(float(es.version) + 1.0)
-        log.debug(f"Expecting Opera outputs in {abspath(output_path)}")
+        log.debug("Expecting Opera outputs in %s", abspath(output_path))
 
     def get_updated_energysystem(self):
         return self.esh.get_energy_system()
 
+    def scan_output(self) -> Dict[str, str]:
+        """Lists the output folder once, returns the path of each file by its lowercase name"""
+        with os.scandir(self.output_path) as entries:
+            return {entry.name.lower(): entry.path for entry in entries if entry.is_file()}
+
+    def read_tables(self, mappers: List[ResultMapper], output_files: Dict[str, str]) \
+            -> Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]:
+        """
+        Reads every file that is used by the mappers once, with only the columns that the mappers use. Columns that
+        are not in a file are left out, so that a mapper with a wrong layout cannot break the other mappers.
+        :return: the tables by file name, with an extra Name column: the option without its number, and the errors
+        of the files that could not be read
+        """
+        columns: Dict[str, Dict[str, str]] = {}
+        for mapper in mappers:
+            for result_file in mapper.files:
+                columns.setdefault(result_file.name, {}).update(result_file.columns)
+        tables = {}
+        errors = {}
+        for name, dtypes in columns.items():
+            try:
+                # only the text columns are typed here, the others are checked per mapper by mapper_tables
+                tables[name] = pd.read_csv(output_files[name.lower()], encoding='latin_1',
+                                           usecols=lambda column: column in dtypes,
+                                           dtype={column: t for column, t in dtypes.items() if t == 'str'})
+            except Exception as e:
+                log.error(f"Cannot read Opera output {name}: {e}")
+                errors[name] = e
+                continue
+            if 'Option' in tables[name].columns:
+                # split option into nr and name
+                tables[name]['Name'] = tables[name]['Option'].str.split(' ', n=1).str[1]
+            log.debug("Read %s rows from %s", len(tables[name]), name)
+        return tables, errors
+
+    @staticmethod
+    def mapper_tables(mapper: ResultMapper, tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """
+        Returns the files of the mapper with the columns it reads in their dtype
+        :raises ValueError: if a column is missing from a file or has values that do not match its dtype
+        """
+        mapper_tables = {}
+        for result_file in mapper.files:
+            table = tables[result_file.name]
+            missing = [column for column in result_file.columns if column not in table.columns]
+            if missing:
+                raise ValueError(f"{result_file.name} has no column {', '.join(missing)}")
+            numeric = {column: t for column, t in result_file.columns.items() if t != 'str'}
+            try:
+                mapper_tables[result_file.name] = table.astype(numeric)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{result_file.name} has values of the wrong type: {e}") from e
+        return mapper_tables
+
+    def skip(self, mapper: ResultMapper, reason: str):
+        """Skips the results of an optional mapper, a run without the results of a required mapper fails"""
+        if mapper.required:
+            raise OperaResultsException(f"Cannot process Opera {mapper.name} results: {reason}")
+        log.warning(f"Skipping Opera {mapper.name} results: {reason}")
+
+    def process(self, mapper_names: List[str] = None):
+        """
+        Writes the Opera results into the energy system. The output folder is scanned and each output file is read
+        only once, after which all mappers are applied with the same index of the input assets. The required mappers
+        (capacity) are always applied. The results of an optional mapper of which the files are missing or do not
+        have the expected columns are skipped.
+        :param mapper_names: names of the RESULT_MAPPERS to apply, all if None
+        :raises OperaResultsException: if the results of a required mapper are missing or cannot be processed
+        """
+        mapper_names = list(RESULT_MAPPERS) if mapper_names is None else mapper_names
+        required = [name for name, mapper in RESULT_MAPPERS.items() if mapper.required]
+        output_files = self.scan_output()
+        mappers = []
+        for name in dict.fromkeys(required + list(mapper_names)):
+            mapper = RESULT_MAPPERS.get(name)
+            if mapper is None:
+                log.warning(f"Unknown Opera result mapper {name}")
+                continue
+            missing = [f.name for f in mapper.files if f.name.lower() not in output_files]
+            if missing:
+                self.skip(mapper, f"{', '.join(missing)} not found in {self.output_path}")
+                continue
+            mappers.append(mapper)
+
+        tables, errors = self.read_tables(mappers, output_files)
+        index = AssetIndex(self.esh, self.df)
+        applied = []
+        for mapper in mappers:
+            unreadable = [f.name for f in mapper.files if f.name in errors]
+            if unreadable:
+                self.skip(mapper, f"cannot read {', '.join(unreadable)}")
+                continue
+            try:
+                mapper_tables = self.mapper_tables(mapper, tables)
+            except ValueError as e:
+                self.skip(mapper, str(e))
+                continue
+            log.debug("Applying Opera %s results", mapper.name)
+            try:
+                mapper.apply(mapper_tables, index)
+            except Exception as e:
+                if mapper.required:
+                    raise OperaResultsException(f"Cannot process Opera {mapper.name} results: {e}") from e
+                log.exception(f"Applying Opera {mapper.name} results failed, skipping them")
+                continue
+            applied.append(mapper.name)
+        log.info(f"Processed Opera results: {', '.join(applied) or 'none'}")
+
+    def asset_capacities(self) -> pd.DataFrame:
+        """Returns the input assets with their power in the (updated) energy system, all values in GW"""
+        columns = ['id', 'name', 'category', 'esdlType', 'opera_equivalent', 'power_min', 'power_max']
+        capacities = self.df[columns].copy()
+        index = AssetIndex(self.esh, self.df)
+        power = []
+        for asset_id in capacities['id']:
+            asset = index.get(asset_id)
+            power.append(convert_to_unit(asset.power, POWER_IN_W, POWER_IN_GW)
+                         if asset is not None and hasattr(asset, 'power') else None)
+        capacities['power'] = pd.Series(power, index=capacities.index, dtype='float')
+        return capacities
+
+    def export_parquet(self, directory: str) -> Dict[str, str]:
+        """
+        Writes the capacities of the assets and every Opera output CSV as Parquet tables, so results can be analysed
+        without parsing the ESDL. Requires pyarrow.
+        :return: the paths of the written files by table name, empty if Parquet is not available
+        """
+        tables = {'capacities': self.asset_capacities()}
+        for path in self.scan_output().values():
+            name, extension = os.path.splitext(os.path.basename(path))
+            if extension.lower() == '.csv':
+                tables[name] = pd.read_csv(path, encoding='latin_1')
+        os.makedirs(directory, exist_ok=True)
+        files = {}
+        try:
+            for name, table in tables.items():
+                files[name] = os.path.join(directory, name + '.parquet')
+                table.to_parquet(files[name], index=False)
+        except ImportError as e:
+            log.warning(f"Cannot export Opera results to Parquet: {e}")
+            return {}
+        log.info(f"Exported {len(files)} Opera result tables to Parquet in {directory}")
+        return files
+
     def update_production_capacities(self):
         """
         Updates the production capacities of all assets in the input dataframe using the id and name of the option
         and updates this in the energy system that is loaded with the esh specified in the constructor of this class.
         """
-        capacity = pd.read_csv(self.output_path + os.sep + "Capacity.csv", encoding='latin_1')
-        unitOfCapacity = pd.read_csv(self.output_path + os.sep + "UoCapacity.csv", encoding='latin_1')
-        capacity = pd.merge(left=capacity, right=unitOfCapacity, on='Option', )
-        # Regions,Option,Variant,Construction year,View year,Capacity
-        #capacity = capacity.groupby(['Option', 'UoCapacity'], axis=1).sum()
-        # split option into nr and name
-        capacity[['Nr', 'Name']] = capacity['Option'].str.split(' ', n=1, expand=True)
-        for index, row in self.df.iterrows():  # iterate through input list
-            asset_name = row['name']
-            found = capacity[capacity['Name'] == asset_name]
-            if not found.empty:
-                updated_capacity_in_GW = found['Capacity'].item()
-                unit = found['UoCapacity'].item()
-                source_unit = POWER_IN_GW
-                if unit != 'GW':
-                    log.info(f"Ignoring {asset_name} as its unit is not GW, which is incompatible with the power attribute of this ESDL asset")
-                    continue  # we can only handle GW for power attribute now
-                min_capacity_range = row['power_min'] # convert_to_unit(row['power_min'], POWER_IN_W, POWER_IN_GW)
-                max_capacity_range = row['power_max'] #convert_to_unit(row['power_max'], POWER_IN_W, POWER_IN_GW)
-
-                id = row['id']
-                asset: esdl.EnergyAsset = self.esh.get_by_id(id)
-                if asset and hasattr(asset, 'power'):
-                    power_in_w = convert_to_unit(updated_capacity_in_GW, source_unit, POWER_IN_W)
-                    old_power_in_GW = convert_to_unit(asset.power, POWER_IN_W, source_unit)
-                    if min_capacity_range and max_capacity_range and \
-                            not np.isnan(min_capacity_range) and not np.isnan(max_capacity_range):
-                        log.debug(f"Found updated capacity for {asset_name}: {updated_capacity_in_GW} GW in range [{min_capacity_range:.2f}-{max_capacity_range:.2f}], old power={old_power_in_GW} GW")
-                        # clear constraints, as these have been solved
-                        asset.constraint.clear()
-                    else:
-                        log.debug(f"Found updated capacity for {asset_name}: {updated_capacity_in_GW} GW (old power={old_power_in_GW} GW)")
-                    asset.power = power_in_w
-
-                else:
-                    log.error(f"Can't find asset in ESDL: asset_id={id}, asset_name={asset_name} with attribute 'power'")
+        self.process([CapacityMapper.name])
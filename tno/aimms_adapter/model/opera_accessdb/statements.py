@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
+
+def insert_statement(table: str, columns: Iterable[str]) -> str:
+    """Returns a parameterized INSERT statement for the columns of the table"""
+    columns = list(columns)
+    return f"INSERT INTO [{table}] ({', '.join(f'[{c}]' for c in columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+class PreparedStatements:
+    """
+    Executes parameterized statements on a DB-API connection. Each distinct statement gets its own cursor, so the
+    driver (pyodbc, sqlite3) prepares it only once per connection and reuses it for every following execution with
+    other values.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursors: Dict[str, object] = {}
+
+    def cursor(self, sql: str):
+        cursor = self.cursors.get(sql)
+        if cursor is None:
+            cursor = self.conn.cursor()
+            self.cursors[sql] = cursor
+        return cursor
+
+    def execute(self, sql: str, params: tuple = ()):
+        cursor = self.cursor(sql)
+        cursor.execute(sql, params)
+        return cursor
+
+    def executemany(self, sql: str, values: List[tuple]):
+        if values:
+            self.cursor(sql).executemany(sql, values)
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        cursor = self.execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        return pd.DataFrame.from_records([tuple(r) for r in cursor.fetchall()], columns=columns)
+
+    def close(self):
+        log.debug("Closing %s prepared statements", len(self.cursors))
+        for cursor in self.cursors.values():
+            cursor.close()
+        self.cursors = {}
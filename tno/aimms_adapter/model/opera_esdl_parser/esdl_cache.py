@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import pandas as pd
+
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
+
+def frame_size(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(deep=True, index=True).sum())
+
+
+class ParsedESDLCache:
+    """
+    In-memory cache of the asset and carrier dataframes of parsed ESDLs. Entries are keyed by the version of the
+    input (e.g. the ETag of a Minio object or the modification time and size of a file), so a run on an unchanged
+    input skips its download and parse. Least recently used entries are evicted when the cache exceeds its size.
+    """
+
+    def __init__(self, max_size_bytes: int):
+        self.max_size_bytes = max_size_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, Tuple[pd.DataFrame, pd.DataFrame, int]] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Returns copies of the cached dataframes, so a run can never change the cached entry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            assets, carriers, _ = entry
+        return assets.copy(), carriers.copy()
+
+    def put(self, key: Hashable, assets: pd.DataFrame, carriers: pd.DataFrame):
+        size = frame_size(assets) + frame_size(carriers)
+        if size > self.max_size_bytes:
+            log.debug("Parsed ESDL of %s bytes does not fit in the cache", size)
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[key] = (assets.copy(), carriers.copy(), size)
+            self.size += size
+            while self.size > self.max_size_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+        log.debug("Cached parsed ESDL %s, cache size %s bytes", key, self.size)
@@ -0,0 +1,64 @@
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+from esdl import esdl
+from esdl.esdl_handler import EnergySystemHandler
+from pyecore.ecore import EClass, EObject
+
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
+
+class ESDLIndex:
+    """
+    Index of the contents of an energy system, built in a single pass over the model: the instances of each class
+    (including those of its subclasses, in document order), the objects by id and the children of each container.
+    Replaces a walk of the whole model per esh.get_all_instances_of_type call.
+    """
+
+    def __init__(self, energy_system: esdl.EnergySystem):
+        self.energy_system = energy_system
+        self._instances: Dict[EClass, List[EObject]] = {}
+        self._ids: Dict[str, EObject] = {}
+        self._children: Dict[EObject, List[EObject]] = {}
+        types: Dict[EClass, Tuple[EClass, ...]] = {}  # an eClass and its supertypes
+        count = 0
+        for element in energy_system.eAllContents():
+            count += 1
+            eclass = element.eClass
+            eclass_types = types.get(eclass)
+            if eclass_types is None:
+                eclass_types = types[eclass] = (eclass,) + tuple(eclass.eAllSuperTypes())
+            for t in eclass_types:
+                self._instances.setdefault(t, []).append(element)
+            element_id = getattr(element, 'id', None)
+            if element_id is not None:
+                self._ids[element_id] = element
+            self._children.setdefault(element.eContainer(), []).append(element)
+        log.debug("Indexed %s objects of %s classes", count, len(types))
+
+    def of_type(self, esdl_type: Union[Type[EObject], EClass]) -> List[EObject]:
+        """All instances of the type or one of its subtypes, like esh.get_all_instances_of_type"""
+        eclass = esdl_type if isinstance(esdl_type, EClass) else esdl_type.eClass
+        return list(self._instances.get(eclass, ()))
+
+    def get(self, object_id: str) -> Optional[EObject]:
+        return self._ids.get(object_id)
+
+    def children(self, container: EObject) -> List[EObject]:
+        """The objects that are directly contained by the container"""
+        return list(self._children.get(container, ()))
+
+
+def esdl_index(esh: EnergySystemHandler) -> ESDLIndex:
+    """
+    Returns the index of the energy system of the handler, which is built once and shared by everyone using the
+    same handler (the parser, the results processor and the Universal Link). A newly loaded energy system is indexed
+    again. Objects added to the energy system after indexing are not in the index.
+    """
+    energy_system = esh.get_energy_system()
+    index: Optional[ESDLIndex] = getattr(esh, '_esdl_index', None)
+    if index is None or index.energy_system is not energy_system:
+        index = ESDLIndex(energy_system)
+        esh._esdl_index = index
+    return index
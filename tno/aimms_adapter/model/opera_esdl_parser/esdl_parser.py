@@ -1,19 +1,82 @@
 from dataclasses import dataclass
-from typing import Tuple, Union, Optional, List
+from typing import BinaryIO, Dict, Tuple, Union, Optional, List
 
 from esdl.esdl_handler import EnergySystemHandler
+from pyecore.resources import URI
+from .esdl_index import esdl_index
 from .unit import convert_to_unit, POWER_IN_GW, ENERGY_IN_PJ, COST_IN_MEur, POWER_IN_W, COST_IN_Eur_per_MWh, \
     ENERGY_IN_J, UnitException, COST_IN_MEur_per_GW, COST_IN_MEur_per_GW_per_year, COST_IN_MEur_per_PJ, \
     COST_IN_Eur_per_GJ
 import esdl
 import pandas as pd
 
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
+
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', 200)
 
 # current asset types that are not supported by this parser or Opera import
 IGNORED_ASSETS_TUPLE = (esdl.Transport, esdl.Export)
 
+# columns and dtypes of the asset dataframe
+ASSET_COLUMNS = {
+    'category': 'str',
+    'id': 'str',
+    'esdlType': 'str',
+    'name': 'str',
+    'power_min': 'float',
+    'power_max': 'float',
+    'power': 'float',
+    'efficiency': 'float',
+    'investment_cost': 'float',
+    'o_m_cost': 'float',
+    'variable_o_m_cost': 'float',
+    'marginal_cost': 'float',
+    'carrier_in': 'str',
+    'carrier_out': 'str',
+    'profiles_in': 'str',
+    'profiles_out': 'str',
+    'storage_capacity': 'float',
+    'storage_charge_efficiency': 'float',
+    'storage_discharge_efficiency': 'float',
+    'storage_slow_loadtime': 'float',
+    'storage_fast_loadtime': 'float',
+    'storage_slow_unloadtime': 'float',
+    'storage_fast_unloadtime': 'float',
+    'storage_losses_perhour': 'float',
+    'opera_equivalent': 'str',
+}
+# columns and dtypes of the carrier dataframe
+CARRIER_COLUMNS = {
+    'name': 'str',
+    'id': 'str',
+    'cost': 'float',
+    'unit': 'str',
+}
+
+
+def build_dataframe(rows: List[list], columns: Dict[str, str]) -> pd.DataFrame:
+    """Builds a dataframe at once from the collected rows, with a column of the given dtype per value"""
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return pd.DataFrame({name: pd.Series(column, dtype=dtype)
+                         for (name, dtype), column in zip(columns.items(), values)})
+
+
+class StreamURI(URI):
+    """URI of an ESDL that is read from a binary stream, so the XML parser consumes it incrementally"""
+
+    def __init__(self, uri: str, stream: BinaryIO):
+        super().__init__(uri)
+        self.stream = stream
+
+    def create_instream(self):
+        return self.stream
+
+    def close_stream(self):
+        pass  # the stream is owned by the caller
+
 
 class OperaESDLParser:
     def __init__(self):
@@ -22,58 +85,45 @@ class OperaESDLParser:
     def get_energy_system_Hander(self) -> EnergySystemHandler:
         return self.esh
 
-    def parse(self, esdl_string: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def load_from_stream(self, esdl_stream: BinaryIO) -> esdl.EnergySystem:
+        esh = self.esh
+        esh.resource = esh.rset.create_resource(StreamURI('from_stream.esdl', esdl_stream))
+        esh.resource.load()
+        esh.energy_system = esh.resource.contents[0]
+        return esh.energy_system
+
+    def parse(self, esdl_string: str = None, esdl_stream: BinaryIO = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Extracts Cost, ranges of production and values of demand
-        :param esdl_string:
+        :param esdl_string: the ESDL as string
+        :param esdl_stream: binary stream of the ESDL, used instead of esdl_string to avoid reading it into memory first
         :return: Tuple of 2 dataframes: assets and carriers
         """
-        print(f"Power unit : {POWER_IN_GW.description}")
-        print(f"Energy unit: {ENERGY_IN_PJ.description}")
-        print(f"CAPEX Cost unit: {COST_IN_MEur_per_GW.description}")
-        print(f"OPEX Cost unit: {COST_IN_MEur_per_GW_per_year.description}")
-        print(f"Variable OPEX Cost unit: {COST_IN_MEur_per_PJ.description}")
-        print(f"Marginal Cost unit: {COST_IN_Eur_per_MWh.description}")
-
-        self.esh.load_from_string(esdl_string)
-        energy_assets = self.esh.get_all_instances_of_type(esdl.EnergyAsset)
-        df = pd.DataFrame({'category': pd.Series(dtype='str'),
-                           'id': pd.Series(dtype='str'),
-                           'esdlType': pd.Series(dtype='str'),
-                           'name': pd.Series(dtype='str'),
-                           'power_min': pd.Series(dtype='float'),
-                           'power_max': pd.Series(dtype='float'),
-                           'power': pd.Series(dtype='float'),
-                           'efficiency': pd.Series(dtype='float'),
-                           'investment_cost': pd.Series(dtype='float'),
-                           'o_m_cost': pd.Series(dtype='float'),
-                           'variable_o_m_cost': pd.Series(dtype='float'),
-                           'marginal_cost': pd.Series(dtype='float'),
-                           'carrier_in': pd.Series(dtype='str'),
-                           'carrier_out': pd.Series(dtype='str'),
-                           'profiles_in': pd.Series(dtype='str'),
-                           'profiles_out': pd.Series(dtype='str'),
-                           'storage_capacity': pd.Series(dtype='float'),
-                           'storage_charge_efficiency': pd.Series(dtype='float'),
-                           'storage_discharge_efficiency': pd.Series(dtype='float'),
-                           'storage_slow_loadtime': pd.Series(dtype='float'),
-                           'storage_fast_loadtime': pd.Series(dtype='float'),
-                           'storage_slow_unloadtime': pd.Series(dtype='float'),
-                           'storage_fast_unloadtime': pd.Series(dtype='float'),
-                           'storage_losses_perhour': pd.Series(dtype='str'),
-                           'opera_equivalent': pd.Series(dtype='str')
-                           })
+        log.debug("Power unit : %s", POWER_IN_GW.description)
+        log.debug("Energy unit: %s", ENERGY_IN_PJ.description)
+        log.debug("CAPEX Cost unit: %s", COST_IN_MEur_per_GW.description)
+        log.debug("OPEX Cost unit: %s", COST_IN_MEur_per_GW_per_year.description)
+        log.debug("Variable OPEX Cost unit: %s", COST_IN_MEur_per_PJ.description)
+        log.debug("Marginal Cost unit: %s", COST_IN_Eur_per_MWh.description)
+
+        if esdl_stream is not None:
+            self.load_from_stream(esdl_stream)
+        else:
+            self.esh.load_from_string(esdl_string)
+        index = esdl_index(self.esh)
+        energy_assets = index.of_type(esdl.EnergyAsset)
+        rows = []
         for asset in energy_assets:
             max_power = None
             try:
                 if not isinstance(asset, IGNORED_ASSETS_TUPLE) and asset.state != esdl.AssetStateEnum.DISABLED:
                     asset: esdl.EnergyAsset = asset
-                    print(f'Converting {asset.name}:')
+                    log.debug("Converting %s:", asset.name)
                     category = esdl_category(asset)
 
                     power_range, unit = extract_range(asset, 'power')
                     if power_range:
-                        print("\t- Power range: ", power_range)
+                        log.debug("- Power range: %s", power_range)
                         power_range = tuple([convert_to_unit(v, unit, POWER_IN_GW) for v in power_range])
                     if hasattr(asset, 'power'):
                         max_power = convert_to_unit(asset.power, POWER_IN_W, POWER_IN_GW) if asset.power else None
@@ -83,7 +133,7 @@ class OperaESDLParser:
 
                     capacity_range, unit = extract_range(asset, 'capacity')
                     if capacity_range:
-                        print("\t- Capacity range: ", capacity_range)
+                        log.debug("- Capacity range: %s", capacity_range)
                         # a bit of a hack to use power range instead of capacity range (with diferent Unit)
                         power_range = tuple([convert_to_unit(v, unit, ENERGY_IN_PJ) for v in capacity_range])
 
@@ -100,7 +150,7 @@ class OperaESDLParser:
                     if isinstance(asset, esdl.Storage):
                         sa = extract_storage_attributes(asset)
                     opera_equivalent = find_opera_equivalent(asset)
-                    print(f'\t- {asset.eClass.name}, {asset.name}, power_range={power_range}, power={max_power}, costs={costs}' )
+                    log.debug("- %s, %s, power_range=%s, power=%s, costs=%s", asset.eClass.name, asset.name, power_range, max_power, costs)
                     s = [category, asset.id, asset.eClass.name, asset.name,
                          power_range[0] if power_range else None, power_range[1] if power_range else None,
                          max_power, efficiency, costs[0], costs[1], costs[2], costs[3],
@@ -108,22 +158,20 @@ class OperaESDLParser:
                          sa.capacity, sa.chargeEfficiency, sa.disChargeEfficiency, sa.slowLoadTime, sa.fastLoadTime,
                          sa.slowUnloadTime, sa.fastUnloadTime, sa.lossesPerHour,
                          opera_equivalent]
-                    df.loc[len(df)] = s
+                    rows.append(s)
             except UnitException as ue:
-                print(f"Error parsing input: asset {asset.name} not configured correctly: {ue}")
+                log.error("Error parsing input: asset %s not configured correctly: %s", asset.name, ue)
                 raise ue
 
-        #print(df)
-        df.to_csv('output.csv')
+        df = build_dataframe(rows, ASSET_COLUMNS)
+        log.debug("%s", df)
 
         # carrier prices
-        df_carriers = pd.DataFrame({'name': pd.Series(dtype='str'),
-                                    'id': pd.Series(dtype='str'),
-                                    'cost': pd.Series(dtype='float'),
-                                    'unit': pd.Series(dtype='str'),
-                                    })
-        carrier_list: List[esdl.Carrier] = self.esh.get_all_instances_of_type(esdl.Carrier)
+        carrier_rows = []
+        carrier_list: List[esdl.Carrier] = index.of_type(esdl.Carrier)
         for carrier in carrier_list:
+            price = None
+            target_unit = None
             if carrier.cost:
                 price = extract_singlevalue(carrier.cost)
                 if carrier.cost.profileQuantityAndUnit:
@@ -132,12 +180,15 @@ class OperaESDLParser:
                     if isinstance(carrier, esdl.ElectricityCommodity):
                         target_unit = COST_IN_Eur_per_MWh
                     price = convert_to_unit(price, qau, target_unit)
-            carrier_df = pd.DataFrame([{'name': carrier.name, 'id': carrier.id, 'cost': price, 'unit': target_unit.description}])
-            #df_carriers = df_carriers.append({'name': carrier.name, 'id': carrier.id, 'cost': price, 'unit': target_unit.description}, ignore_index=True)
-            df_carriers = pd.concat([df_carriers, carrier_df], ignore_index=True)
-            print(f'Carrier {carrier.name} has cost {price} {target_unit.description}')
-
-        print(df_carriers)
+            unit = target_unit.description if target_unit else None
+            carrier_rows.append([carrier.name, carrier.id, price, unit])
+            log.debug("Carrier %s has cost %s %s", carrier.name, price, unit)
+
+        df_carriers = build_dataframe(carrier_rows, CARRIER_COLUMNS)
+        log.debug("%s", df_carriers)
+        log.info("Parsed %s assets (%s) and %s carriers, %s assets without Opera equivalent", len(df),
+                 ', '.join(f'{count} {category}' for category, count in df['category'].value_counts().items()),
+                 len(df_carriers), df['opera_equivalent'].isna().sum())
         return df, df_carriers
 
 class ParseException(Exception):
@@ -160,7 +211,7 @@ def extract_range(asset: esdl.EnergyAsset, attribute_name: str) -> Tuple[
             if rc.attributeReference.lower() == attribute_name.lower():
                 constraint_range: esdl.Range = rc.range
                 if constraint_range.profileQuantityAndUnit is None:
-                    print(f"No unit specified for constraint of asset {asset.name}, assuming WATT")
+                    log.warning("No unit specified for constraint of asset %s, assuming WATT", asset.name)
                     constraint_range.profileQuantityAndUnit = POWER_IN_W
                 return (constraint_range.minValue, constraint_range.maxValue), constraint_range.profileQuantityAndUnit
             #else:
@@ -209,7 +260,7 @@ def extract_singlevalue(profile: esdl.GenericProfile) -> Optional[float]:
         # check for units here!
         # single_value.profileQuantityAndUnit
         return single_value.value
-    print(f"Cannot convert profile {profile.name} of {profile.eContainer()} to a SingleValue")
+    log.warning("Cannot convert profile %s of %s to a SingleValue", profile.name, profile.eContainer())
     return None
 
 
@@ -279,9 +330,9 @@ def extract_port_singlevalue_profiles(asset: esdl.EnergyAsset, target_unit:esdl.
                 else:
                     singlevalue_out_list.append(convert_to_unit(extract_singlevalue(profile), profile.profileQuantityAndUnit, target_unit))
             else:
-                print(f"Unsupported profile type for Opera parser {profile.eClass.name}: {profile}, ignoring")
+                log.warning("Unsupported profile type for Opera parser %s: %s, ignoring", profile.eClass.name, profile)
             if len(p.profile) > 1:
-                print(f"Multiple profiles per port are currently not supported")
+                log.warning("Multiple profiles per port are currently not supported")
 
     return singlevalue_in_list, singlevalue_out_list
 
@@ -306,7 +357,7 @@ def find_opera_equivalent(asset: esdl.EnergyAsset) -> str | None:
         if gconv.type == esdl.GasConversionTypeEnum.SMR:
             return "H2 uit SMR met CCS plus"
         elif gconv.type == esdl.GasConversionTypeEnum.ATR:
-            print(f"Cannot map {asset.name} of type ATR to an Opera equivalent")
+            log.debug("Cannot map %s of type ATR to an Opera equivalent", asset.name)
             return None
         else:
             return "H2 uit SMR met CCS plus"
@@ -318,7 +369,7 @@ def find_opera_equivalent(asset: esdl.EnergyAsset) -> str | None:
         elif windturbine.type == esdl.WindTurbineTypeEnum.WIND_AT_SEA:
             return "Wind op Zee band 1"
         else:
-            print(f"Unmapped type {windturbine.type} for {asset.name}, mapping to Wind op Zee for Opera equivalent")
+            log.debug("Unmapped type %s for %s, mapping to Wind op Zee for Opera equivalent", windturbine.type, asset.name)
             return "Wind op Zee band 1"
     elif isinstance(asset, esdl.PVPanel): # superclass of PVPark and PVInstallation
         # todo handle sector information here to map to right sector PV production
@@ -348,10 +399,10 @@ def find_opera_equivalent(asset: esdl.EnergyAsset) -> str | None:
             #return "Nuclear energy Gen IV - Electricity production"
             return "REF Kernenergie  IBO 7500u 2017"
         else:
-            print(f"Cannot map {asset.name} to an Opera equivalent")
+            log.debug("Cannot map %s to an Opera equivalent", asset.name)
             return None
     else:
-        print(f"Cannot map {asset.name} to an Opera equivalent")
+        log.debug("Cannot map %s to an Opera equivalent", asset.name)
         return None
 
 
@@ -420,7 +471,7 @@ def map_esdl_carrier_to_opera_equivalent(carrier: str):
         elif carrier == 'biogas':
             return "biogas"
         else:
-            print(f"Don't know how to map carrier {carrier} to an Opera equivalent")
+            log.warning("Don't know how to map carrier %s to an Opera equivalent", carrier)
             return carrier
 
 def esdl_category(asset: esdl.EnergyAsset):
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+from typing import Dict
+
+import requests
+
+from tno.aimms_adapter.settings import EnvSettings
+from tno.aimms_adapter.types import ModelRunInfo, ModelState
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+FINAL_STATES = (ModelState.SUCCEEDED, ModelState.ERROR)
+
+
+class RunEvents:
+    """
+    Wakes up the requests that wait for a change of a run in this process (long-poll and event streams), so
+    clients are told about a change as soon as it happens instead of polling for it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions: Dict[str, int] = {}
+
+    def publish(self, model_run_id: str):
+        with self._condition:
+            self._versions[model_run_id] = self._versions.get(model_run_id, 0) + 1
+            self._condition.notify_all()
+
+    def version(self, model_run_id: str) -> int:
+        with self._condition:
+            return self._versions.get(model_run_id, 0)
+
+    def wait(self, model_run_id: str, version: int, timeout: float) -> int:
+        """
+        Blocks until the run changes after the given version or the timeout expires.
+        :return: the current version of the run
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._versions.get(model_run_id, 0) != version, timeout)
+            return self._versions.get(model_run_id, 0)
+
+    def forget(self, model_run_id: str):
+        with self._condition:
+            self._versions.pop(model_run_id, None)
+            self._condition.notify_all()
+
+
+class WebhookNotifier:
+    """
+    POSTs the ModelRunInfo of a run to its callback_url when its state changes, and its progress at most every
+    WEBHOOK_PROGRESS_INTERVAL seconds. Calls are made by a background thread per callback_url, so a slow or
+    unreachable callback never delays a run or the calls to other callbacks. The calls to one callback are made in
+    order, the thread of a callback stops when it has had nothing to send for idle_time seconds.
+    """
+    idle_time = 30.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: Dict[str, queue.Queue] = {}  # calls to be made by callback_url
+        self._states: Dict[str, ModelState] = {}  # last reported state by model_run_id
+        self._progress_times: Dict[str, float] = {}  # time of the last progress report by model_run_id
+
+    def state_changed(self, url: str, info: ModelRunInfo):
+        with self._lock:
+            if self._states.get(info.model_run_id) == info.state:
+                return
+            if info.state in FINAL_STATES:
+                self._states.pop(info.model_run_id, None)
+                self._progress_times.pop(info.model_run_id, None)
+            else:
+                self._states[info.model_run_id] = info.state
+        self._send(url, 'status', info)
+
+    def progress(self, url: str, info: ModelRunInfo):
+        interval = EnvSettings.webhook_progress_interval()
+        now = time.monotonic()
+        with self._lock:
+            if interval <= 0 or now - self._progress_times.get(info.model_run_id, float('-inf')) < interval:
+                return
+            self._progress_times[info.model_run_id] = now
+        self._send(url, 'progress', info)
+
+    def _send(self, url: str, event: str, info: ModelRunInfo):
+        payload = dict(ModelRunInfo.Schema().dump(info), event=event)
+        with self._lock:
+            calls = self._queues.get(url)
+            if calls is None:
+                calls = self._queues[url] = queue.Queue()
+                threading.Thread(target=self._run, args=(url, calls), name=f"webhook-notifier {url}",
+                                 daemon=True).start()
+            calls.put(payload)
+
+    def _run(self, url: str, calls: queue.Queue):
+        while True:
+            try:
+                payload = calls.get(timeout=self.idle_time)
+            except queue.Empty:
+                with self._lock:
+                    # _send adds calls while holding the lock, so none can be added after this check
+                    if calls.empty():
+                        del self._queues[url]
+                        return
+                continue
+            self.post(url, payload)
+
+    @staticmethod
+    def post(url: str, payload: dict) -> bool:
+        retries = EnvSettings.webhook_retries()
+        for attempt in range(retries + 1):
+            try:
+                response = requests.post(url, json=payload, timeout=EnvSettings.webhook_timeout())
+                response.raise_for_status()
+                return True
+            except requests.RequestException as e:
+                if attempt == retries:
+                    logger.warning(f"Calling back {url} for run {payload['model_run_id']} failed: {e}")
+                else:
+                    time.sleep(2 ** attempt)
+        return False
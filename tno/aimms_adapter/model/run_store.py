@@ -0,0 +1,248 @@
+import os
+import socket
+import sqlite3
+import threading
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from tno.aimms_adapter.settings import EnvSettings
+from tno.aimms_adapter.types import ModelRun
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+# the adapter process (host:pid), to check whether the process that executes a run still exists
+PROCESS = f"{socket.gethostname()}:{os.getpid()}"
+# identifies the adapter process that executes a run. A restarted container can have the same host name and pid as
+# before the restart, so every start of the adapter gets a random token
+PROCESS_ID = f"{PROCESS}:{uuid4().hex}"
+
+
+def process_alive(process: str) -> bool:
+    """Returns False if the process (host:pid) is a process on this host that no longer exists"""
+    host, _, pid = process.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # cannot be checked, assume it is alive
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def owner_alive(model_run: ModelRun) -> bool:
+    """
+    Returns False if the run has no owner or the adapter process that owns it no longer exists. A run of an earlier
+    start of the adapter with the same host:pid as this process, e.g. before a restart of its container, is owned by a
+    stopped process.
+    """
+    if model_run.owner == PROCESS_ID:
+        return True
+    if model_run.owner is None:
+        return False
+    # runs stored before the owner had a token are owned by host:pid
+    process = model_run.owner_process or model_run.owner
+    return process != PROCESS and process_alive(process)
+
+
+class RunStore(MutableMapping):
+    """
+    Stores the model runs by model_run_id. A run that is changed must be stored again with store[model_run_id] = run,
+    as a persistent store returns a new ModelRun for every lookup.
+    """
+    schema = ModelRun.Schema()
+
+    def __init__(self):
+        self.listeners: List[Callable[[str, ModelRun], None]] = []
+
+    def add_listener(self, listener: Callable[[str, ModelRun], None]):
+        """Calls listener(model_run_id, model_run) whenever a run is stored by this process"""
+        self.listeners.append(listener)
+
+    def changed(self, model_run_id: str, model_run: ModelRun):
+        for listener in self.listeners:
+            try:
+                listener(model_run_id, model_run)
+            except Exception:
+                logger.exception(f"Listener for changes of run {model_run_id} failed")
+
+    def dumps(self, model_run: ModelRun) -> str:
+        return self.schema.dumps(model_run)
+
+    def loads(self, data: str) -> ModelRun:
+        return self.schema.loads(data)
+
+    @abstractmethod
+    def claim(self, model_run_id: str, expected_owner: Optional[str]) -> bool:
+        """Makes this process the owner of the run, if it is still owned by expected_owner"""
+        pass
+
+
+class MemoryRunStore(RunStore):
+    """Keeps the runs in the memory of this process"""
+
+    def __init__(self):
+        super().__init__()
+        self.runs: Dict[str, ModelRun] = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, model_run_id: str) -> ModelRun:
+        return self.runs[model_run_id]
+
+    def __setitem__(self, model_run_id: str, model_run: ModelRun):
+        self.runs[model_run_id] = model_run
+        self.changed(model_run_id, model_run)
+
+    def __delitem__(self, model_run_id: str):
+        del self.runs[model_run_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.runs))
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def claim(self, model_run_id: str, expected_owner: Optional[str]) -> bool:
+        with self.lock:
+            model_run = self.runs.get(model_run_id)
+            if model_run is None or model_run.owner != expected_owner:
+                return False
+            model_run.owner = PROCESS_ID
+            model_run.owner_process = PROCESS
+            return True
+
+
+class SQLiteRunStore(RunStore):
+    """Stores the runs in a SQLite database, which can be shared by the adapter processes on one host"""
+
+    def __init__(self, database: str):
+        super().__init__()
+        self.database = database
+        self.local = threading.local()
+        if os.path.dirname(database):
+            os.makedirs(os.path.dirname(database), exist_ok=True)
+        with self.connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS runs "
+                         "(model_run_id TEXT PRIMARY KEY, owner TEXT, run TEXT NOT NULL)")
+
+    def connection(self) -> sqlite3.Connection:
+        """One connection per thread, sqlite3 connections cannot be shared between threads"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def __getitem__(self, model_run_id: str) -> ModelRun:
+        row = self.connection().execute("SELECT run FROM runs WHERE model_run_id = ?", (model_run_id,)).fetchone()
+        if row is None:
+            raise KeyError(model_run_id)
+        return self.loads(row[0])
+
+    def __setitem__(self, model_run_id: str, model_run: ModelRun):
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO runs (model_run_id, owner, run) VALUES (?, ?, ?)",
+                         (model_run_id, model_run.owner, self.dumps(model_run)))
+        self.changed(model_run_id, model_run)
+
+    def __delitem__(self, model_run_id: str):
+        with self.connection() as conn:
+            if conn.execute("DELETE FROM runs WHERE model_run_id = ?", (model_run_id,)).rowcount == 0:
+                raise KeyError(model_run_id)
+
+    def __contains__(self, model_run_id) -> bool:
+        return self.connection().execute("SELECT 1 FROM runs WHERE model_run_id = ?",
+                                         (model_run_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self.connection().execute("SELECT model_run_id FROM runs")])
+
+    def __len__(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def claim(self, model_run_id: str, expected_owner: Optional[str]) -> bool:
+        with self.connection() as conn:
+            row = conn.execute("SELECT run FROM runs WHERE model_run_id = ? AND owner IS ?",
+                               (model_run_id, expected_owner)).fetchone()
+            if row is None:
+                return False
+            model_run = self.loads(row[0])
+            model_run.owner = PROCESS_ID
+            model_run.owner_process = PROCESS
+            # only one process can win the claim, the others no longer match the expected owner
+            return conn.execute("UPDATE runs SET owner = ?, run = ? WHERE model_run_id = ? AND owner IS ?",
+                                (PROCESS_ID, self.dumps(model_run), model_run_id, expected_owner)).rowcount == 1
+
+
+class RedisRunStore(RunStore):
+    """Stores the runs in a Redis (compatible) server, which can be shared by adapter processes on several hosts"""
+
+    def __init__(self, url: str, key: str = "aimms-adapter:runs"):
+        import redis  # optional dependency, only needed for this store
+        super().__init__()
+        self.redis = redis.Redis.from_url(url)
+        self.key = key
+
+    def __getitem__(self, model_run_id: str) -> ModelRun:
+        data = self.redis.hget(self.key, model_run_id)
+        if data is None:
+            raise KeyError(model_run_id)
+        return self.loads(data)
+
+    def __setitem__(self, model_run_id: str, model_run: ModelRun):
+        self.redis.hset(self.key, model_run_id, self.dumps(model_run))
+        self.changed(model_run_id, model_run)
+
+    def __delitem__(self, model_run_id: str):
+        if self.redis.hdel(self.key, model_run_id) == 0:
+            raise KeyError(model_run_id)
+
+    def __contains__(self, model_run_id) -> bool:
+        return bool(self.redis.hexists(self.key, model_run_id))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([k.decode('utf8') for k in self.redis.hkeys(self.key)])
+
+    def __len__(self) -> int:
+        return self.redis.hlen(self.key)
+
+    def claim(self, model_run_id: str, expected_owner: Optional[str]) -> bool:
+        import redis
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                data = pipe.hget(self.key, model_run_id)
+                if data is None:
+                    return False
+                model_run = self.loads(data)
+                if model_run.owner != expected_owner:
+                    return False
+                model_run.owner = PROCESS_ID
+                model_run.owner_process = PROCESS
+                pipe.multi()
+                pipe.hset(self.key, model_run_id, self.dumps(model_run))
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+
+def create_run_store(url: str = None) -> RunStore:
+    """
+    Creates the run store configured by RUN_STORE: memory, sqlite:///<path> or redis://<host>:<port>/<db>
+    """
+    url = url or EnvSettings.run_store()
+    if url.startswith('sqlite:///'):
+        logger.info(f"Storing model runs in SQLite database {url[10:]}")
+        return SQLiteRunStore(url[10:])
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        logger.info(f"Storing model runs in Redis at {url.split('@')[-1]}")
+        return RedisRunStore(url)
+    if url != 'memory':
+        raise ValueError(f"Unknown run store {url}")
+    return MemoryRunStore()
@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class QueueFullException(Exception):
+    pass
+
+
+@dataclass
+class WorkerSlot:
+    """A slot in which a single AIMMS run can execute"""
+    index: int
+
+
+@dataclass(order=True)
+class _PendingRun:
+    priority: int
+    seq: int
+    model_run_id: str = field(compare=False)
+
+
+class RunScheduler:
+    """
+    Hands out a fixed number of worker slots to model runs. Runs that cannot get a slot are queued and promoted
+    in order of priority (lower value first) and arrival when a slot is released.
+    """
+
+    def __init__(self, slots: int, max_pending: int):
+        self.slots = [WorkerSlot(index=i) for i in range(slots)]
+        self.max_pending = max_pending
+        self._condition = threading.Condition()
+        self._free: List[int] = list(range(slots))
+        self._assigned: Dict[str, int] = {}  # model_run_id -> slot index
+        self._running: Set[str] = set()
+        self._pending: List[_PendingRun] = []  # heap
+        self._seq = itertools.count()
+
+    def admit(self, model_run_id: str, priority: int = 0) -> Optional[WorkerSlot]:
+        """
+        Assigns a free slot to this run, or queues it when all slots are in use.
+        :return: the assigned slot or None if the run is queued
+        :raises QueueFullException: if the pending queue is full
+        """
+        with self._condition:
+            if self._free and not self._pending:
+                return self._assign(model_run_id)
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullException(f"Maximum number of pending runs ({self.max_pending}) reached")
+            heapq.heappush(self._pending, _PendingRun(priority, next(self._seq), model_run_id))
+            return None
+
+    def reprioritize(self, model_run_id: str, priority: int):
+        with self._condition:
+            for pending in self._pending:
+                if pending.model_run_id == model_run_id:
+                    pending.priority = priority
+                    heapq.heapify(self._pending)
+                    break
+
+    def position(self, model_run_id: str) -> Optional[int]:
+        """Returns the 1-based position of a run in the pending queue, or None if it is not queued"""
+        with self._condition:
+            ordered = sorted(self._pending)
+            for i, pending in enumerate(ordered):
+                if pending.model_run_id == model_run_id:
+                    return i + 1
+            return None
+
+    def slot_of(self, model_run_id: str) -> Optional[WorkerSlot]:
+        with self._condition:
+            index = self._assigned.get(model_run_id)
+            return self.slots[index] if index is not None else None
+
+    def is_running(self, model_run_id: str) -> bool:
+        with self._condition:
+            return model_run_id in self._running
+
+    def runs(self) -> Set[str]:
+        """Returns the runs that have a slot or are queued"""
+        with self._condition:
+            return set(self._assigned) | {p.model_run_id for p in self._pending}
+
+    def wait_for_slot(self, model_run_id: str) -> Optional[WorkerSlot]:
+        """
+        Blocks until the run is assigned a slot and marks it as running.
+        :return: the slot or None if the run was discarded while waiting
+        """
+        with self._condition:
+            while model_run_id not in self._assigned:
+                if not self._is_pending(model_run_id):
+                    return None
+                self._condition.wait()
+            self._running.add(model_run_id)
+            return self.slots[self._assigned[model_run_id]]
+
+    def release(self, model_run_id: str) -> Optional[str]:
+        """
+        Frees the slot of this run and promotes the next pending run.
+        :return: the model_run_id of the promoted run, if any
+        """
+        with self._condition:
+            self._running.discard(model_run_id)
+            index = self._assigned.pop(model_run_id, None)
+            if index is None:
+                return None
+            self._free.append(index)
+            promoted = None
+            if self._pending:
+                promoted = heapq.heappop(self._pending).model_run_id
+                self._assign(promoted)
+                logger.info(f"Promoted run {promoted} to slot {self._assigned[promoted]}")
+            self._condition.notify_all()
+            return promoted
+
+    def discard(self, model_run_id: str) -> Optional[str]:
+        """
+        Removes a run from the scheduler. A running run keeps its slot until it calls release().
+        :return: the model_run_id of the promoted run, if any
+        """
+        with self._condition:
+            if model_run_id in self._running:
+                return None
+            if self._is_pending(model_run_id):
+                self._pending = [p for p in self._pending if p.model_run_id != model_run_id]
+                heapq.heapify(self._pending)
+                self._condition.notify_all()
+                return None
+            return self.release(model_run_id)
+
+    def _assign(self, model_run_id: str) -> WorkerSlot:
+        index = self._free.pop(0)
+        self._assigned[model_run_id] = index
+        return self.slots[index]
+
+    def _is_pending(self, model_run_id: str) -> bool:
+        return any(p.model_run_id == model_run_id for p in self._pending)
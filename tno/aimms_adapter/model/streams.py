@@ -0,0 +1,39 @@
+import io
+import zlib
+
+
+class EncodedTextStream(io.RawIOBase):
+    """
+    Binary stream of a string that is encoded, and optionally gzip compressed, one chunk at a time while it is
+    read. Uploading a large result this way never holds a second, encoded copy of the whole string in memory.
+    """
+
+    def __init__(self, text: str, gzip: bool = False, chunk_size: int = 1024 * 1024, encoding: str = 'utf-8'):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self._compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 writes a gzip header
+        self._position = 0  # position in text, None when all text has been encoded
+        self._buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and self._position is not None:
+            self._fill()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def _fill(self):
+        if self._position < len(self.text):
+            data = self.text[self._position:self._position + self.chunk_size].encode(self.encoding)
+            self._position += self.chunk_size
+            if self._compressor:
+                data = self._compressor.compress(data)
+        else:
+            data = self._compressor.flush() if self._compressor else b''
+            self._position = None
+        self._buffer = memoryview(data)
@@ -0,0 +1,76 @@
+import configparser
+import os
+import shutil
+from dataclasses import dataclass
+
+from tno.aimms_adapter.settings import EnvSettings
+from tno.shared.log import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class RunWorkspace:
+    """
+    Working directory of a single model run. It contains the AIMMS log of that run. With AIMMS_RUN_FILE it also
+    contains the Access database, the Opera output folder and the run file that tells AIMMS where these are, so
+    concurrent runs never share files. Otherwise the run uses the fixed ACCESS_DATABASE and OPERA_OUTPUT_FOLDER,
+    as the AIMMS model reads the database through its ODBC DSN.
+    """
+    model_run_id: str
+
+    @property
+    def working_dir(self) -> str:
+        return os.path.abspath(os.path.join(EnvSettings.workspace_root(), self.model_run_id))
+
+    @property
+    def access_database(self) -> str:
+        if not EnvSettings.aimms_run_file():
+            return os.path.abspath(EnvSettings.access_database())
+        return os.path.join(self.working_dir, EnvSettings.access_database())
+
+    @property
+    def opera_output_folder(self) -> str:
+        if not EnvSettings.aimms_run_file():
+            return os.path.abspath(EnvSettings.opera_output_folder())
+        return os.path.join(self.working_dir, EnvSettings.opera_output_folder())
+
+    @property
+    def run_file(self) -> str:
+        return os.path.join(self.working_dir, "opera_run.ini")
+
+    @property
+    def log_file(self) -> str:
+        return os.path.join(self.working_dir, "aimms.log")
+
+    def create(self):
+        """
+        Creates the working directory with an empty Opera output folder, so results of an earlier run are never
+        read as the results of this run, and with the run file if AIMMS_RUN_FILE is set
+        """
+        os.makedirs(self.working_dir, exist_ok=True)
+        if os.path.isdir(self.opera_output_folder):
+            shutil.rmtree(self.opera_output_folder)
+        os.makedirs(self.opera_output_folder, exist_ok=True)
+        if EnvSettings.aimms_run_file():
+            self.write_run_file()
+
+    def write_run_file(self):
+        """
+        Writes the paths of this run for the AIMMS model: the Access database (also as ODBC connection string,
+        which replaces the DSN) and the folder to write the Opera output CSVs to
+        """
+        run = configparser.ConfigParser()
+        run.optionxform = str  # keep the case of the keys
+        run['Opera'] = {
+            'AccessDatabase': self.access_database,
+            'ConnectionString': f"Driver={{Microsoft Access Driver (*.mdb, *.accdb)}};Dbq={self.access_database};",
+            'OutputFolder': self.opera_output_folder,
+        }
+        with open(self.run_file, 'w') as f:
+            run.write(f)
+
+    def cleanup(self):
+        if os.path.isdir(self.working_dir):
+            logger.info(f"Removing workspace {self.working_dir}")
+            shutil.rmtree(self.working_dir, ignore_errors=True)
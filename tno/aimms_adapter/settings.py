@@ -1,5 +1,6 @@
 import os
 import secrets
+from typing import List
 
 from dotenv import load_dotenv
 
@@ -23,6 +24,11 @@ class EnvSettings:
     def is_production():
         return EnvSettings.env() == "prod"
 
+    @staticmethod
+    def log_level() -> str:
+        """Level of the adapter's log messages, DEBUG includes every asset, SQL statement and AIMMS output line"""
+        return os.getenv("LOG_LEVEL", "INFO" if EnvSettings.is_production() else "DEBUG").upper()
+
 
     @staticmethod
     def minio_endpoint():
@@ -41,6 +47,40 @@ class EnvSettings:
     def minio_secret_key():
         return os.getenv("MINIO_SECRET_KEY", "")
 
+    @staticmethod
+    def minio_pool_size() -> int:
+        """Number of connections to Minio that are kept open, by default enough for a multipart upload per worker"""
+        return int(os.getenv("MINIO_POOL_SIZE", str(4 * EnvSettings.max_workers())))
+
+    @staticmethod
+    def minio_timeout() -> int:
+        """Connect and read timeout of requests to Minio in seconds"""
+        return int(os.getenv("MINIO_TIMEOUT", "300"))
+
+    @staticmethod
+    def minio_retries() -> int:
+        return int(os.getenv("MINIO_RETRIES", "5"))
+
+    @staticmethod
+    def minio_retry_backoff() -> float:
+        """Backoff factor in seconds between retries of failed requests to Minio"""
+        return float(os.getenv("MINIO_RETRY_BACKOFF", "0.2"))
+
+    @staticmethod
+    def minio_health_interval() -> int:
+        """Interval in seconds of the Minio health probe, 0 checks the health only when it is requested"""
+        return int(os.getenv("MINIO_HEALTH_INTERVAL", "30"))
+
+    @staticmethod
+    def minio_upload_part_size() -> int:
+        """Part size of multipart uploads to Minio in bytes, at least 5 MB as required by S3"""
+        return max(5, int(os.getenv("MINIO_UPLOAD_PART_SIZE_MB", "16"))) * 1024 * 1024
+
+    @staticmethod
+    def minio_upload_gzip() -> bool:
+        """Upload results gzip compressed with Content-Encoding: gzip"""
+        return os.getenv("MINIO_UPLOAD_GZIP", "False").upper() != "FALSE"
+
     # Registry endpoint config
     @staticmethod
     def registry_endpoint():
@@ -63,6 +103,30 @@ class EnvSettings:
     def aimms_procedure():
         return os.getenv("AIMMS_PROCEDURE", "")
 
+    @staticmethod
+    def aimms_run_file() -> bool:
+        """
+        Whether the AIMMS model reads the Access database and output folder of a run from the run file whose path is
+        passed as its last command line argument (see README). Otherwise every run uses ACCESS_DATABASE and
+        OPERA_OUTPUT_FOLDER, where the ODBC DSN and the output procedures of the model refer to, one run at a time.
+        """
+        return os.getenv("AIMMS_RUN_FILE", "False").upper() != "FALSE"
+
+    @staticmethod
+    def aimms_run_timeout() -> int:
+        """Maximum wall-clock time of an AIMMS run in seconds, 0 disables the timeout"""
+        return int(os.getenv("AIMMS_RUN_TIMEOUT", "0"))
+
+    @staticmethod
+    def aimms_idle_timeout() -> int:
+        """Maximum time in seconds an AIMMS run may run without producing output, 0 disables the timeout"""
+        return int(os.getenv("AIMMS_IDLE_TIMEOUT", "0"))
+
+    @staticmethod
+    def aimms_output_buffer_lines() -> int:
+        """Number of recent lines of AIMMS output that are kept in memory per run"""
+        return int(os.getenv("AIMMS_OUTPUT_BUFFER_LINES", "200"))
+
     @staticmethod
     def access_database():
         """Contains the actual database that Opera uses (where the dsn file refers to)"""
@@ -77,6 +141,151 @@ class EnvSettings:
         """Contains an 'empty' database to which the ESDL can be added for each run"""
         return os.getenv("OPERA_OUTPUT_FOLDER", r"opera/CSV MMvIB 2030/")
 
+    @staticmethod
+    def opera_result_mappers() -> List[str]:
+        """
+        Opera results that are written into the output ESDL, by the name of their result mapper. The capacities
+        are always written
+        """
+        mappers = os.getenv("OPERA_RESULT_MAPPERS", "capacity")
+        return [m.strip() for m in mappers.split(",") if m.strip()]
+
+    @staticmethod
+    def opera_parquet_export() -> bool:
+        """Also store the asset capacities and Opera output CSVs as Parquet tables next to the output ESDL"""
+        return os.getenv("OPERA_PARQUET_EXPORT", "False").upper() != "FALSE"
+
+    @staticmethod
+    def access_database_cache_dir():
+        """Directory to cache imported Access databases per ESDL, caching is disabled if empty"""
+        return os.getenv("ACCESS_DATABASE_CACHE_DIR", "")
+
+    @staticmethod
+    def access_database_cache_size() -> int:
+        """Maximum size of the Access database cache in bytes"""
+        return int(os.getenv("ACCESS_DATABASE_CACHE_SIZE_MB", "2048")) * 1024 * 1024
+
+    @staticmethod
+    def esdl_cache_size() -> int:
+        """Maximum memory in bytes of the cache of parsed input ESDLs, 0 disables the cache"""
+        return int(os.getenv("ESDL_CACHE_SIZE_MB", "256")) * 1024 * 1024
+
+    @staticmethod
+    def access_import_commit_batch_size() -> int:
+        """Number of rows after which the ESDL import commits, 0 imports the ESDL in a single transaction"""
+        return int(os.getenv("ACCESS_IMPORT_COMMIT_BATCH_SIZE", "0"))
+
+    # Worker pool config
+    @staticmethod
+    def max_workers() -> int:
+        """
+        Number of AIMMS runs that can execute in parallel, each in its own worker slot. Always 1 without
+        AIMMS_RUN_FILE, as all runs then share the same Access database and output folder.
+        """
+        workers = int(os.getenv("MAX_WORKERS", "1"))
+        return workers if EnvSettings.aimms_run_file() else 1
+
+    @staticmethod
+    def max_pending_runs() -> int:
+        """Number of runs that can wait for a free worker slot"""
+        return int(os.getenv("MAX_PENDING_RUNS", "50"))
+
+    @staticmethod
+    def result_dir():
+        """Directory in which results are stored of runs without an output_esdl_file_path"""
+        return os.getenv("RESULT_DIR", "results")
+
+    @staticmethod
+    def result_retention() -> int:
+        """Seconds that finished runs are kept before they are removed, 0 keeps them until they are removed"""
+        return int(os.getenv("RESULT_RETENTION_HOURS", "0")) * 3600
+
+    @staticmethod
+    def max_finished_runs() -> int:
+        """Number of finished runs that are kept, the oldest are removed first, 0 keeps all"""
+        return int(os.getenv("MAX_FINISHED_RUNS", "1000"))
+
+    @staticmethod
+    def run_store() -> str:
+        """Where the model runs are stored: memory (the default), sqlite:///<path> or redis://<host>:<port>/<db>"""
+        return os.getenv("RUN_STORE", "memory")
+
+    @staticmethod
+    def recover_runs() -> bool:
+        """Take over the unfinished runs of adapter processes that no longer exist when the adapter starts"""
+        return os.getenv("RECOVER_RUNS", "True").upper() != "FALSE"
+
+    # Status events config
+    @staticmethod
+    def status_max_wait() -> float:
+        """Maximum number of seconds a long-poll status request waits for a change of state"""
+        return float(os.getenv("STATUS_MAX_WAIT", "60"))
+
+    @staticmethod
+    def events_keepalive() -> float:
+        """Seconds between keep-alive comments on an idle stream of run events"""
+        return float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+    @staticmethod
+    def events_poll_interval() -> float:
+        """Seconds between checks of the run store for runs that are executed by another adapter process"""
+        return float(os.getenv("EVENTS_POLL_INTERVAL", "2"))
+
+    @staticmethod
+    def webhook_timeout() -> float:
+        """Timeout in seconds of a call to the callback_url of a run"""
+        return float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+
+    @staticmethod
+    def webhook_retries() -> int:
+        """Number of times a failed call to the callback_url of a run is retried"""
+        return int(os.getenv("WEBHOOK_RETRIES", "3"))
+
+    @staticmethod
+    def webhook_progress_interval() -> float:
+        """Minimum seconds between progress calls to the callback_url of a run, 0 only reports state changes"""
+        return float(os.getenv("WEBHOOK_PROGRESS_INTERVAL", "60"))
+
+    # Universal Link (MySQL) config
+    @staticmethod
+    def db_host():
+        return os.getenv("DATABASE_HOST", "localhost")
+
+    @staticmethod
+    def db_name():
+        return os.getenv("DATABASE_NAME", "TESTDB_ESDL_to_AIMMS")
+
+    @staticmethod
+    def db_user():
+        return os.getenv("DATABASE_USER")
+
+    @staticmethod
+    def db_password():
+        return os.getenv("DATABASE_PASSWORD")
+
+    @staticmethod
+    def db_load_method() -> str:
+        """How the Universal Link loads tables: insert (multi-row INSERT batches) or infile (LOAD DATA LOCAL INFILE)"""
+        return os.getenv("DATABASE_LOAD_METHOD", "insert")
+
+    @staticmethod
+    def db_insert_batch_size() -> int:
+        """Number of rows per multi-row INSERT statement of the Universal Link"""
+        return int(os.getenv("DATABASE_INSERT_BATCH_SIZE", "1000"))
+
+    @staticmethod
+    def db_update_mode() -> str:
+        """
+        How the Universal Link updates the database: recreate (drop and load the whole database) or incremental
+        (only insert, update and delete the rows that changed since the previous ESDL)
+        """
+        return os.getenv("DATABASE_UPDATE_MODE", "recreate")
+
+    @staticmethod
+    def workspace_root():
+        """Directory in which a workspace is created for each model run"""
+        return os.getenv("WORKSPACE_ROOT", "workspaces")
+
 
 
 
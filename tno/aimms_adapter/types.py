@@ -3,7 +3,7 @@ from typing import Dict, Optional, Any, ClassVar, Type, List
 from marshmallow_dataclass import dataclass
 from dataclasses import field
 
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 
 
 class ModelState(str, Enum):
@@ -21,13 +21,25 @@ class ModelState(str, Enum):
 class OperaAdapterConfig:
     input_esdl_file_path: Optional[str] = None
     output_esdl_file_path: Optional[str] = None
+    priority: Optional[int] = None  # lower value runs first when runs are queued
+    timeout: Optional[int] = None  # maximum run time of AIMMS in seconds, overrides AIMMS_RUN_TIMEOUT
+    idle_timeout: Optional[int] = None  # maximum time without AIMMS output in seconds, overrides AIMMS_IDLE_TIMEOUT
+    # http(s) URL that is POSTed the ModelRunInfo on changes of state and progress
+    callback_url: Optional[str] = field(default=None, metadata={
+        "validate": validate.URL(schemes={"http", "https"}, require_tld=False)})
 
 
 @dataclass
 class ModelRun:
     state: ModelState
-    config: OperaAdapterConfig
-    result: dict
+    config: Optional[OperaAdapterConfig]
+    result: Optional[dict]  # reference to the stored result, e.g. its path
+    reason: Optional[str] = None
+    created_at: Optional[float] = None  # time.time() when the run was requested
+    started_at: Optional[float] = None  # time.time() when AIMMS was started
+    finished_at: Optional[float] = None  # time.time() when the run finished
+    owner: Optional[str] = None  # adapter process (host:pid:token of its start) that schedules and executes the run
+    owner_process: Optional[str] = None  # host:pid of the owner, to check whether it still exists
 
 
 @dataclass(order=True)
@@ -36,8 +48,14 @@ class ModelRunInfo:
     state: ModelState = field(default=ModelState.UNKNOWN)
     result: Optional[Dict[str, Any]] = None
     reason: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = None  # solver phase, iteration and objective of a running AIMMS model
 
     # support for Schema generation in Marshmallow
     Schema: ClassVar[Type[Schema]] = Schema
 
 
+@dataclass
+class StatusQuery:
+    wait: Optional[float] = None  # seconds to wait for a change of state (long-poll), at most STATUS_MAX_WAIT
+    state: Optional[ModelState] = None  # state known to the client, a long-poll returns when the state differs
+
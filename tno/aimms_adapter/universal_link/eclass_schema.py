@@ -0,0 +1,163 @@
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Type, Union
+
+from esdl import esdl
+from pyecore.ecore import EAttribute, EClass, EEnum, EObject, EReference, EStructuralFeature
+
+STRING_TYPE = 'varchar(100)'
+
+# SQL column types of the ESDL data types, other data types are written as strings
+SQL_TYPES = {
+    'EDouble': 'DOUBLE',
+    'EDoubleObject': 'DOUBLE',
+    'EFloat': 'DOUBLE',
+    'EFloatObject': 'DOUBLE',
+    'EInt': 'BIGINT',
+    'EIntegerObject': 'BIGINT',
+    'ELong': 'BIGINT',
+    'ELongObject': 'BIGINT',
+    'EShort': 'BIGINT',
+    'EBoolean': 'BOOLEAN',
+    'EBooleanObject': 'BOOLEAN',
+    'EDate': 'DATETIME',
+}
+
+
+def reference_value(referenced: EObject):
+    """
+    The value written for a single reference: the value of a SingleValue (e.g. a commodity price or a cost) and
+    the id of any other referenced object
+    """
+    if referenced is None:
+        return None
+    if isinstance(referenced, esdl.SingleValue):
+        return referenced.value
+    if isinstance(referenced, esdl.QuantityAndUnitReference):
+        return reference_value(referenced.reference)
+    return getattr(referenced, 'id', None)
+
+
+def profile_value(profile: EObject):
+    """
+    The value written for a reference to a profile, e.g. a cost: the value of a SingleValue. Other profiles (e.g.
+    an InfluxDBProfile or a DateTimeProfile) have no single value, so NULL is written instead of their id, which
+    would not fit in the DOUBLE column of the reference
+    """
+    if profile is None or isinstance(profile, esdl.SingleValue):
+        return reference_value(profile)
+    return None
+
+
+def sql_type(feature: EStructuralFeature, string_type: str = STRING_TYPE) -> str:
+    """
+    The column type of a feature: the SQL type of its data type, an ENUM of the literal names of an enumeration,
+    DOUBLE for a reference to a profile (see profile_value), or a string for other references and lists (which are
+    written as ids and comma separated values)
+    """
+    if isinstance(feature, EReference) and not feature.many and is_profile(feature):
+        return 'DOUBLE'
+    if not isinstance(feature, EAttribute) or feature.many:
+        return string_type
+    if isinstance(feature.eType, EEnum):
+        return 'ENUM(' + ','.join(f"'{literal.name}'" for literal in feature.eType.eLiterals) + ')'
+    return SQL_TYPES.get(feature.eType.name, string_type)
+
+
+def feature_column(esdl_type: Union[Type[EObject], EClass], feature_name: str, column_name: str = None,
+                   string_type: str = STRING_TYPE) -> str:
+    """
+    Definition of a column holding a feature of an ESDL class, e.g. 'power DOUBLE'
+    :param column_name: the name of the column, defaults to the name of the feature
+    """
+    eclass = esdl_type if isinstance(esdl_type, EClass) else esdl_type.eClass
+    feature = eclass.findEStructuralFeature(feature_name)
+    if feature is None:
+        raise ValueError(f"{eclass.name} has no feature {feature_name}")
+    return f"{column_name or feature_name} {sql_type(feature, string_type)}"
+
+
+def is_profile(reference: EReference) -> bool:
+    """Whether a reference holds a profile, which is written as the value of a SingleValue instead of an id"""
+    profile = esdl.GenericProfile.eClass
+    eclass = reference.eType if isinstance(reference.eType, EClass) else reference.eType.eClass
+    return eclass is profile or profile in eclass.eAllSuperTypes()
+
+
+class EClassSchema:
+    """
+    The columns of the table of an ESDL class: its attributes and single references (which are written as the id
+    of the referenced object, or the value of a referenced profile), in order of name. Many-valued references, e.g. ports and profiles, are left out.
+    Rows are read with a single attrgetter, so exporting an instance costs one lookup per column.
+    Columns are typed after their feature (see sql_type) and the columns referring to other objects are indexed.
+    """
+
+    def __init__(self, eclass: EClass):
+        self.eclass = eclass
+        self.features: Tuple[EStructuralFeature, ...] = tuple(sorted(
+            (f for f in eclass.eAllStructuralFeatures()
+             if isinstance(f, EAttribute) or (isinstance(f, EReference) and not f.many)),
+            key=lambda f: f.name))
+        self.columns: Tuple[str, ...] = tuple(f.name for f in self.features)
+        self.references: Tuple[int, ...] = tuple(i for i, f in enumerate(self.features)
+                                                 if isinstance(f, EReference) and not is_profile(f))
+        self.profiles: Tuple[int, ...] = tuple(i for i, f in enumerate(self.features)
+                                               if isinstance(f, EReference) and is_profile(f))
+        self.row: Callable[[EObject], tuple] = self._row_extractor()
+
+    def _row_extractor(self) -> Callable[[EObject], tuple]:
+        if not self.columns:
+            return lambda instance: ()
+        get = attrgetter(*self.columns)
+        if len(self.columns) == 1:
+            single = get
+            get = lambda instance: (single(instance),)  # attrgetter of one name does not return a tuple
+        if not self.references and not self.profiles:
+            return get
+        references = self.references
+        profiles = self.profiles
+
+        def row(instance: EObject) -> tuple:
+            values = list(get(instance))
+            for i in references:
+                values[i] = reference_value(values[i])
+            for i in profiles:
+                values[i] = profile_value(values[i])
+            return tuple(values)
+        return row
+
+    def column_definitions(self, primary_key: bool = True, string_type: str = STRING_TYPE) -> Tuple[str, ...]:
+        """
+        :param primary_key: whether id is the primary key, which it can not be when an object is written more than once
+        :return: the definitions of the columns, followed by the indexes on references to other objects
+        """
+        definitions = []
+        for f in self.features:
+            definition = f"{f.name} {sql_type(f, string_type)}"
+            definitions.append(definition + " Primary Key" if primary_key and f.name == 'id' else definition)
+        definitions += [f"INDEX ({self.features[i].name})" for i in self.references]
+        return tuple(definitions)
+
+    def rows(self, instances: Iterable[EObject]) -> List[tuple]:
+        row = self.row
+        return [row(instance) for instance in instances]
+
+
+_schemas: Dict[EClass, EClassSchema] = {}
+
+
+def eclass_schema(eclass: EClass) -> EClassSchema:
+    """Returns the schema of an ESDL class, which is built once per class"""
+    schema = _schemas.get(eclass)
+    if schema is None:
+        schema = _schemas[eclass] = EClassSchema(eclass)
+    return schema
+
+
+def common_eclass(instances: Sequence[EObject]) -> EClass:
+    """The most specific class of which all instances are an instance, so its columns can be read from all of them"""
+    eclasses = {instance.eClass for instance in instances}
+    first = instances[0].eClass
+    for candidate in [first] + list(first.eAllSuperTypes()):
+        if all(eclass is candidate or candidate in eclass.eAllSuperTypes() for eclass in eclasses):
+            return candidate
+    return first
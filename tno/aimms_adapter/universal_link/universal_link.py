@@ -11,7 +11,13 @@ Created on Tue Jul 19 09:29:13 2022
 # This is a ready made code script that transforms an ESDL to a database that can be
 # imported to into AIMMS. It uses two python packages 'pyesdl' and 'pymysql'
 # made by respectively TNO and Mysql to transform an esdl file to SQL tables that can be read by AIMMS.
-from typing import Union, Tuple
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Union, Tuple, List, Sequence, Dict
 
 from dotenv import load_dotenv
 from pandas import DataFrame
@@ -23,7 +29,14 @@ import pandas as pd
 from esdl.esdl_handler import EnergySystemHandler
 from esdl import esdl
 
+from tno.aimms_adapter.model.opera_esdl_parser.esdl_index import esdl_index
+from tno.aimms_adapter.settings import EnvSettings
+from tno.aimms_adapter.universal_link.eclass_schema import eclass_schema, common_eclass, feature_column, \
+    reference_value
 from tno.aimms_adapter.types import OperaAdapterConfig
+from tno.shared.log import get_logger
+
+log = get_logger(__name__)
 
 load_dotenv()  # load environmental variables such as database credentials and input file from the .env file (see .env-template)
 
@@ -43,16 +56,129 @@ def convert_to_string(esdl_attribute_value) -> str:
         return esdl_attribute_value
 
 
+def sql_value(esdl_attribute_value):
+    """Converts an ESDL attribute value to a value the database driver can write to a varchar column"""
+    value = convert_to_string(esdl_attribute_value)
+    if value is None or isinstance(value, (str, int, float, date)):
+        return value
+    return str(value)
+
+
+def infile_field(esdl_attribute_value) -> str:
+    """Formats a value as a field of LOAD DATA INFILE with the default (tab separated, backslash escaped) format"""
+    value = sql_value(esdl_attribute_value)
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        value = int(value)
+    elif isinstance(value, datetime):
+        value = value.replace(tzinfo=None).isoformat(' ')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r') \
+        .replace('\0', '\\0')
+
+
+def table_columns(definitions: Sequence[str]) -> List[Tuple[str, str]]:
+    """The name and type of the columns of a table definition, without its PRIMARY KEY and INDEX clauses"""
+    columns = []
+    for definition in definitions:
+        if not definition.upper().startswith(('INDEX', 'KEY', 'PRIMARY KEY')):
+            name, column_type = definition.split(None, 2)[:2]
+            columns.append((name, column_type))
+    return columns
+
+
+def table_key(definitions: Sequence[str]) -> Tuple[str, ...]:
+    """The primary key columns of a table definition, empty if the table has no primary key"""
+    for definition in definitions:
+        if definition.upper().startswith('PRIMARY KEY'):
+            return tuple(c.strip() for c in definition[definition.index('(') + 1:definition.rindex(')')].split(','))
+        if definition.upper().endswith('PRIMARY KEY'):
+            return (definition.split(None, 1)[0],)
+    return ()
+
+
+def schema_comment(definitions: Sequence[str]) -> str:
+    """
+    The comment of a table with a hash of its definition, so update_db can detect a change of a column type, the
+    primary key or an index, which the DATA_TYPE of its columns in INFORMATION_SCHEMA does not show
+    """
+    return 'schema ' + hashlib.sha256(','.join(definitions).encode('utf8')).hexdigest()[:32]
+
+
+def data_type(column_type: str) -> str:
+    """The DATA_TYPE that INFORMATION_SCHEMA reports for a column type, e.g. varchar for varchar(100)"""
+    name = column_type.split('(', 1)[0].lower()
+    return 'tinyint' if name == 'boolean' else name
+
+
+def comparable(value, column_type: str):
+    """
+    Converts a value to what the database returns after storing it in a column of the type, so the rows of an ESDL
+    can be compared with the rows in the database
+    """
+    value = sql_value(value)
+    if value is None:
+        return None
+    name = data_type(column_type)
+    if name == 'double':
+        return float(value)
+    if name == 'bigint':
+        return int(value)
+    if name == 'tinyint':
+        return int(bool(value))
+    if name == 'datetime':
+        # DATETIME has no time zone and rounds to seconds
+        return (value.replace(tzinfo=None) + timedelta(microseconds=500000)).replace(microsecond=0)
+    if isinstance(value, bool):
+        value = int(value)
+    if name == 'varchar':
+        return str(value)[:int(column_type[column_type.index('(') + 1:column_type.index(')')])]
+    return str(value)
+
+
+@dataclass
+class TableChanges:
+    """The rows that an incremental update inserted, updated and deleted in a table"""
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    recreated: bool = False  # the definition of the table changed, so it was dropped and loaded again
+
+    def __str__(self):
+        return f"{self.inserted} inserted, {self.updated} updated, {self.deleted} deleted" + \
+            (" (recreated)" if self.recreated else "")
+
+
+def change_summary(changes: Dict[str, TableChanges]) -> str:
+    """Describes the tables that changed, e.g. 'Assets: 1 inserted, 2 updated, 0 deleted'"""
+    changed = [f"{table}: {c}" for table, c in changes.items() if c.inserted or c.updated or c.deleted or c.recreated]
+    return '; '.join(changed) or 'no changes'
+
+
 class UniversalLink:
-    def __init__(self, host: str, database: str, user:str, password: str):
-        print("ESDL-AIMMS Universal link starting...")
+    def __init__(self, host: str, database: str, user:str, password: str, load_method: str = None,
+                 batch_size: int = None, update_mode: str = None):
+        """
+        :param load_method: insert (multi-row INSERT batches) or infile (LOAD DATA LOCAL INFILE), defaults to
+        DATABASE_LOAD_METHOD
+        :param batch_size: number of rows per INSERT statement, defaults to DATABASE_INSERT_BATCH_SIZE
+        :param update_mode: recreate (the whole database) or incremental (only the changed rows), defaults to
+        DATABASE_UPDATE_MODE
+        """
+        log.info("ESDL-AIMMS Universal link starting...")
         # use sqlAlchemy to connect to (any) database, instead of using direct connection
         # this removes the pandas warning
 
+        self.load_method = load_method or EnvSettings.db_load_method()
+        self.batch_size = batch_size or EnvSettings.db_insert_batch_size()
+        self.update_mode = update_mode or EnvSettings.db_update_mode()
+        self.changes: Dict[str, TableChanges] = {}  # the changes of the last incremental update
         self.database_url = f"mysql+pymysql://{user}:{password}@{host}"
-        print(f"Connecting to mysql+pymysql://{user}:*****@{host},  db={database}")
+        log.info("Connecting to mysql+pymysql://%s:*****@%s, db=%s", user, host, database)
         self.database_name = database
-        self.engine = create_engine(self.database_url)
+        # the client must allow the server to request a local file for LOAD DATA LOCAL INFILE
+        connect_args = {'local_infile': True} if self.load_method == 'infile' else {}
+        self.engine = create_engine(self.database_url, connect_args=connect_args)
         self.conn = self.engine.raw_connection()
         self.cursor = self.conn.cursor()
 
@@ -62,17 +188,23 @@ class UniversalLink:
         :param esdl_string: string to convert to database
         :return: tuple (success (True/False), error message)
         """
-        print(f'Processing ESDL...')
+        log.info("Processing ESDL...")
         esh = EnergySystemHandler()
-      #  try:
-        esh.load_from_string(esdl_string)
-        t,a,v = self.parse_esdl(esh)
-        for table in t:
-            self.create_AIMMS_sql(table,attributes)
-        self.write_table_to_Sql(t, v)
-        return True, 'Ok'
-       # except Exception as e:
-       #     return False, str(e)
+        try:
+            esh.load_from_string(esdl_string)
+            tables, attributes, values = self.parse_esdl(esh)
+            if self.update_mode == 'incremental':
+                self.changes = self.update_db(tables, attributes, values)
+                summary = change_summary(self.changes)
+                log.info(f"Updated database {self.database_name}: {summary}")
+                return True, summary
+            # the database is recreated once with all tables, then all tables are loaded in one transaction
+            self.create_AIMMS_sql(tables, attributes)
+            self.bulk_load(tables, values)
+            return True, 'Ok'
+        except Exception as e:
+            log.exception("Loading the ESDL into the database failed")
+            return False, str(e)
 
     def get_sql(self, query: str) -> DataFrame:
         """
@@ -82,13 +214,13 @@ class UniversalLink:
             result = pd.read_sql(query, self.database_url)
             return result
         except pymysql.Error as e:
-            print("Error: unable to fetch data %d: %s" % (e.args[0], e.args[1]))
+            log.error("Error: unable to fetch data %d: %s", e.args[0], e.args[1])
 
     def create_AIMMS_sql(self, SetofTables, SetofAttributes):
         """
         Function that creates a new database with DB the new name of the database and with SetofTables a list of all the tables in de database and set of attributes a list of tuples of attributes of every table
         """
-        print(f"Removing and recreate database {self.database_name}")
+        log.info("Removing and recreate database %s", self.database_name)
         self.cursor.execute('DROP DATABASE IF EXISTS ' + self.database_name + ';')
         self.cursor.execute('create database ' + self.database_name + ';')
         self.conn.select_db(self.database_name)
@@ -96,61 +228,166 @@ class UniversalLink:
         try:
             query = []
             for i in range(len(SetofTables)):
-                query.append('create table ' + SetofTables[i] + '(' + ','.join(SetofAttributes[i]) + ')')
+                query.append('create table ' + SetofTables[i] + '(' + ','.join(SetofAttributes[i]) + ')' +
+                             f" COMMENT='{schema_comment(SetofAttributes[i])}'")
             for i in query:
                 self.cursor.execute(i)
 
             # Progress update
-            print('SQL-file created from ESDL-file')
-            print(query)
+            log.info("SQL-file created from ESDL-file")
+            log.debug("%s", query)
         except pymysql.Error as e:
-            print("Error: unable to create table %d: %s" % (e.args[0], e.args[1]))
+            log.error("Error: unable to create table %d: %s", e.args[0], e.args[1])
 
-    def write_table_to_Sql(self, Sheet, val):
+    def bulk_load(self, SetofTables: List[str], SetofValues: List[List[tuple]]):
+        """
+        Loads the rows of all tables in a single transaction, which is rolled back if a table fails to load.
+        The tables must have been created with create_AIMMS_sql.
+        """
+        try:
+            for table, rows in zip(SetofTables, SetofValues):
+                self.write_table_to_Sql(table, rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def update_db(self, SetofTables: List[str], SetofAttributes: List[tuple],
+                  SetofValues: List[List[tuple]]) -> Dict[str, TableChanges]:
+        """
+        Updates the database to the tables of an ESDL with only the rows that changed, see update_table. Tables that
+        are new or whose definition (columns, primary key or indexes) changed are (re)created and loaded, tables that
+        are no longer in the ESDL are dropped. The definition is compared by its hash in the table comment, see
+        schema_comment. The table changes are made first, as MySQL commits them implicitly, then all rows are changed
+        in a single transaction, which is rolled back if a table fails to update.
+        :return: the changes by table
+        """
+        self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.database_name}`")
+        self.conn.select_db(self.database_name)
+        self.cursor.execute("SELECT TABLE_NAME, TABLE_COMMENT FROM INFORMATION_SCHEMA.TABLES "
+                            "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'", (self.database_name,))
+        existing: Dict[str, str] = {table: comment for table, comment in self.cursor.fetchall()}
+
+        changes: Dict[str, TableChanges] = {}
+        for table, definitions in zip(SetofTables, SetofAttributes):
+            comment = schema_comment(definitions)
+            if existing.get(table) != comment:
+                if table in existing:
+                    log.info(f"Definition of table {table} changed, recreating it")
+                    self.cursor.execute(f"DROP TABLE `{self.database_name}`.`{table}`")
+                self.cursor.execute(f"CREATE TABLE `{self.database_name}`.`{table}` ({','.join(definitions)}) "
+                                    f"COMMENT='{comment}'")
+                changes[table] = TableChanges(recreated=True)
+        for table in existing.keys() - set(SetofTables):
+            self.cursor.execute(f"SELECT COUNT(*) FROM `{self.database_name}`.`{table}`")
+            changes[table] = TableChanges(deleted=self.cursor.fetchone()[0])
+            self.cursor.execute(f"DROP TABLE `{self.database_name}`.`{table}`")
+
+        try:
+            for table, definitions, rows in zip(SetofTables, SetofAttributes, SetofValues):
+                types = [column_type for _, column_type in table_columns(definitions)]
+                rows = [tuple(comparable(v, t) for v, t in zip(row, types)) for row in rows]
+                if table in changes:
+                    self.write_table_to_Sql(table, rows)
+                    changes[table].inserted = len(rows)
+                else:
+                    changes[table] = self.update_table(table, definitions, rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return changes
+
+    def update_table(self, table: str, definitions: Sequence[str], rows: List[tuple]) -> TableChanges:
+        """
+        Compares the rows (as returned by comparable) with the rows in the table. Rows are matched by the primary key
+        of the table and changed rows are updated. Tables without a primary key are compared by whole rows, so a
+        changed row is deleted and inserted. The changes are not committed.
+        :raises ValueError: if rows have the same primary key
+        """
+        columns = table_columns(definitions)
+        names = [name for name, _ in columns]
+        table_name = f"`{self.database_name}`.`{table}`"
+        self.cursor.execute(f"SELECT {','.join(f'`{n}`' for n in names)} FROM {table_name}")
+        current = [tuple(comparable(v, t) for v, (_, t) in zip(row, columns)) for row in self.cursor.fetchall()]
+
+        key = table_key(definitions)
+        if key:
+            positions = [names.index(k) for k in key]
+            others = [i for i in range(len(names)) if i not in positions]
+            current_rows = {tuple(row[i] for i in positions): row for row in current}
+            new_rows = {tuple(row[i] for i in positions): row for row in rows}
+            if len(new_rows) < len(rows):
+                duplicates = [k for k, n in Counter(tuple(row[i] for i in positions) for row in rows).items() if n > 1]
+                raise ValueError(f"Table {table} has {len(duplicates)} duplicate primary keys "
+                                 f"({', '.join(key)}), e.g. {duplicates[0]}")
+            inserted = [row for k, row in new_rows.items() if k not in current_rows]
+            updated = [row for k, row in new_rows.items() if k in current_rows and current_rows[k] != row]
+            deleted = [k for k in current_rows if k not in new_rows]
+            where = ' AND '.join(f"`{k}` = %s" for k in key)
+            if updated and others:
+                self.cursor.executemany(
+                    f"UPDATE {table_name} SET {','.join(f'`{names[i]}` = %s' for i in others)} WHERE {where}",
+                    [[row[i] for i in others] + [row[i] for i in positions] for row in updated])
+            if deleted:
+                self.cursor.executemany(f"DELETE FROM {table_name} WHERE {where}", [list(k) for k in deleted])
+            changes = TableChanges(inserted=len(inserted), updated=len(updated), deleted=len(deleted))
+        else:
+            inserted = list((Counter(rows) - Counter(current)).elements())
+            deleted = list((Counter(current) - Counter(rows)).elements())
+            if deleted:
+                # NULL-safe comparison of every column, deleting one row per occurrence
+                where = ' AND '.join(f"`{n}` <=> %s" for n in names)
+                self.cursor.executemany(f"DELETE FROM {table_name} WHERE {where} LIMIT 1", [list(r) for r in deleted])
+            changes = TableChanges(inserted=len(inserted), deleted=len(deleted))
+        if inserted:
+            self.write_table_to_Sql(table, inserted)
+        log.debug(f"Table {table}: {changes}")
+        return changes
+
+    def write_table_to_Sql(self, Sheet, val: Sequence[tuple]):
         """
         Function that writes a tuple (val) of all lengths to database (DB) in Table (Sheet).
+        The rows are not committed, see bulk_load.
         """
-        # Build query
-        numofcol = self.get_sql(
-            "SELECT COUNT(*) as NumberofCol from INFORMATION_SCHEMA.COLUMNS where table_schema = '" + self.database_name + "' and table_name = '" + Sheet + "';")
-        numb = numofcol['NumberofCol'][0]
-        query = 'INSERT INTO ' + self.database_name + '.' + Sheet + ' VALUES (' + numb * '%s,'
-        query = query[:-1] + ');'
-        print(query)
-        # Check query
-        self.cursor.executemany(query, val)
-        print('INSERT ' + Sheet + ' COMPLETE')
+        if not val:
+            return
+        if self.load_method == 'infile':
+            self.load_data_infile(Sheet, val)
+        else:
+            self.insert_rows(Sheet, val)
+        log.debug(f"Loaded {len(val)} rows into {Sheet}")
+
+    def insert_rows(self, table: str, rows: Sequence[tuple]):
+        """Inserts the rows with multi-row INSERT statements of batch_size rows"""
+        row_placeholder = '(' + ','.join(['%s'] * len(rows[0])) + ')'
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            query = f"INSERT INTO `{self.database_name}`.`{table}` VALUES " + ','.join([row_placeholder] * len(batch))
+            self.cursor.execute(query, [sql_value(value) for row in batch for value in row])
+
+    def load_data_infile(self, table: str, rows: Sequence[tuple]):
+        """Loads the rows with LOAD DATA LOCAL INFILE, which the driver streams from a temporary file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf8', newline='', delete=False) as file:
+            for row in rows:
+                file.write('\t'.join(infile_field(value) for value in row) + '\n')
+        try:
+            self.cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE `{self.database_name}`.`{table}` "
+                                f"CHARACTER SET utf8mb4", (file.name,))
+        finally:
+            os.remove(file.name)
 
     def extractDataESDL(self, TableName, Instances, SetofAttributes, SetofTables, SetofValues):
+        """
+        Adds a table with the attributes and single references of the instances, see EClassSchema. The schema of
+        their class is built once, so the export only touches the features of the class.
+        """
         if Instances == []:
             return
-        valInstance = []
-        for m in Instances:
-            temp = tuple()
-            for d in dir(m):
-                e = getattr(m, d)
-                if e == None:
-                    temp += (None,)
-                else:
-                    if e == object:
-                        temp += (e.id)
-                    # add values of singleValue profiles in commodity prices
-                    if isinstance(e, esdl.SingleValue):
-                        temp += (str(e.value),)
-                    else:
-                        temp += (e,)
-            valInstance.append(temp)
-
-        InstanceAttr = tuple()
-        for d in dir(Instances[0]):
-            if d == 'id':
-                InstanceAttr += (d + ' varchar(100) Primary Key',)
-            else:
-                InstanceAttr += (d + ' varchar(100)',)
-
-        SetofAttributes.append(InstanceAttr)
+        schema = eclass_schema(common_eclass(Instances))
+        SetofAttributes.append(schema.column_definitions())
         SetofTables.append(TableName)
-        SetofValues.append(valInstance)
+        SetofValues.append(schema.rows(Instances))
 
 
     def parse_esdl(self, esh:EnergySystemHandler):
@@ -159,7 +396,8 @@ class UniversalLink:
         SetofAttributes = []
         SetofValues = []
 
-        Assets = esh.get_all_instances_of_type(esdl.EnergyAsset)
+        index = esdl_index(esh)
+        Assets = index.of_type(esdl.EnergyAsset)
         valAssets = []
         for n in Assets:
             tup = (n.id,
@@ -202,27 +440,28 @@ class UniversalLink:
             SetofTables.append('Assets')
             SetofAttributes.append(('id varchar(100) Primary key',
                                     'esdlType varchar(100)',
-                                    'aggregated varchar(100)',
-                                    'aggregationCount varchar(100)',
+                                    feature_column(esdl.EnergyAsset, 'aggregated'),
+                                    feature_column(esdl.EnergyAsset, 'aggregationCount'),
                                     'assetType varchar(100)',
-                                    'commissioningDate varchar(100)',
-                                    'decommissioningDate varchar(100)',
+                                    feature_column(esdl.EnergyAsset, 'commissioningDate'),
+                                    feature_column(esdl.EnergyAsset, 'decommissioningDate'),
                                     'description varchar(100)',
-                                    'installationDuration varchar(100)',
+                                    feature_column(esdl.EnergyAsset, 'installationDuration'),
                                     'manufacturer varchar(100)',
                                     'name varchar(1500)',
                                     'originalIdInSource varchar(100)',
                                     'owner varchar(100)',
                                     'shortname varchar(1500)',
-                                    'state varchar(100)',
-                                    'surfaceArea varchar(100)',
-                                    'technicalLifetime varchar(100)',
+                                    feature_column(esdl.EnergyAsset, 'state'),
+                                    feature_column(esdl.EnergyAsset, 'surfaceArea'),
+                                    feature_column(esdl.EnergyAsset, 'technicalLifetime'),
                                     'costInformation_id varchar(100)',
-                                    'lat varchar(100)',
-                                    'lon varchar(100)'))
+                                    feature_column(esdl.Point, 'lat'),
+                                    feature_column(esdl.Point, 'lon'),
+                                    'INDEX (costInformation_id)'))
             SetofValues.append(valAssets)
 
-        Producers = esh.get_all_instances_of_type(esdl.Producer)
+        Producers = index.of_type(esdl.Producer)
         valProducers = [(n.id,
                          n.eClass.name,
                          n.name,
@@ -236,15 +475,15 @@ class UniversalLink:
             SetofAttributes.append(('id varchar(100) Primary key',
                                     'esdlType varchar(100)',
                                     'name varchar(1500)',
-                                    'prodType varchar(100)',
-                                    'operationalHours varchar(100)',
-                                    'fullLoadHours varchar(100)',
+                                    feature_column(esdl.Producer, 'prodType'),
+                                    feature_column(esdl.Producer, 'operationalHours'),
+                                    feature_column(esdl.Producer, 'fullLoadHours'),
                                     'type varchar(100)',
-                                    'power varchar(100)'))
+                                    feature_column(esdl.Producer, 'power')))
             SetofTables.append('Producers')
             SetofValues.append(valProducers)
 
-        Storages = esh.get_all_instances_of_type(esdl.Storage)
+        Storages = index.of_type(esdl.Storage)
         valStorages = [(n.id,
                          n.eClass.name,
                          n.name,
@@ -262,18 +501,18 @@ class UniversalLink:
             SetofAttributes.append(('id varchar(100) Primary key',
                                     'esdlType varchar(100)',
                                     'name varchar(1500)',
-                                    'capacity varchar(100)',
-                                    'chargeEfficiency varchar(100)',
-                                    'dischargeEfficiency varchar(100)',
-                                    'selfDischargeRate varchar(100)',
-                                    'fillLevel varchar(100)',
-                                    'maxChargeRate varchar(100)',
-                                    'maxDischargeRate varchar(100)',
-                                    'volume varchar(100)'))
+                                    feature_column(esdl.Storage, 'capacity'),
+                                    feature_column(esdl.Storage, 'chargeEfficiency'),
+                                    feature_column(esdl.Storage, 'dischargeEfficiency'),
+                                    feature_column(esdl.Storage, 'selfDischargeRate'),
+                                    feature_column(esdl.Storage, 'fillLevel'),
+                                    feature_column(esdl.Storage, 'maxChargeRate'),
+                                    feature_column(esdl.Storage, 'maxDischargeRate'),
+                                    'volume DOUBLE'))
             SetofTables.append('Storages')
             SetofValues.append(valStorages)
 
-        Consumers = esh.get_all_instances_of_type(esdl.Consumer)
+        Consumers = index.of_type(esdl.Consumer)
         valConsumers = [
             (n.id, n.eClass.name, n.name, n.consType, convert_to_string(n.type) if hasattr(n, 'type') else None, n.power)
             for n in Consumers]
@@ -282,39 +521,38 @@ class UniversalLink:
             SetofAttributes.append(('id varchar(100)  Primary Key',
                                     'esdlType varchar(100)',
                                     'name varchar(1500)',
-                                    'consType varchar(100)',
+                                    feature_column(esdl.Consumer, 'consType'),
                                     'type varchar(100)',
-                                    'power varchar(100)'))
+                                    feature_column(esdl.Consumer, 'power')))
             SetofTables.append('Consumers')
             SetofValues.append(valConsumers)
 
-        Singlevalueprofiles = esh.get_all_instances_of_type(esdl.SingleValue)
         ConsumerProfiles = []
         valConsumerProfiles = []
         for n in Consumers:
             for p in n.port:
                 for pr in p.profile:
                     ConsumerProfiles.append(pr)
-                    if (pr in Singlevalueprofiles):
+                    if isinstance(pr, esdl.SingleValue):
                         valConsumerProfiles.append((n.id,
                                                     n.name,
                                                     'null',
-                                                    'null',
+                                                    None,
                                                     'null',
                                                     'null',
                                                     'null',
                                                     pr.id,
-                                                    'null',
+                                                    None,
                                                     'null',
                                                     pr.value,
                                                     pr.name,
                                                     'null',
-                                                    'null',
-                                                    'null'))
+                                                    None,
+                                                    None))
                     else:
                         valConsumerProfiles.append((n.id,
                                                     n.name,
-                                                    pr.dataSource,
+                                                    reference_value(pr.dataSource),
                                                     pr.endDate,
                                                     pr.field, pr.filters,
                                                     pr.host,
@@ -323,29 +561,30 @@ class UniversalLink:
                                                     pr.measurement,
                                                     pr.multiplier,
                                                     pr.name,
-                                                    pr.profileQuantityAndUnit,
+                                                    reference_value(pr.profileQuantityAndUnit),
                                                     pr.profileType,
                                                     pr.startDate))
         if (valConsumerProfiles != []):
             SetofAttributes.append(('id_consumer varchar(100)',
                                     'name_consumer varchar(100)',
                                     'dataSource varchar(100)',
-                                    'endDate varchar(100)',
+                                    feature_column(esdl.InfluxDBProfile, 'endDate'),
                                     'field varchar(100)',
                                     'filters varchar(100)',
                                     'host varchar(100)',
                                     'id varchar(100)',
-                                    'interpolationMethod varchar(100)',
+                                    feature_column(esdl.InfluxDBProfile, 'interpolationMethod'),
                                     'measurement varchar(100)',
-                                    'multiplier varchar(100)',
+                                    feature_column(esdl.InfluxDBProfile, 'multiplier'),
                                     'name varchar(1500)',
                                     'profileQuantityAndUnit varchar(100)',
-                                    'profileType varchar(100)',
-                                    'startDate varchar(100)'))
+                                    feature_column(esdl.InfluxDBProfile, 'profileType'),
+                                    feature_column(esdl.InfluxDBProfile, 'startDate'),
+                                    'INDEX (id_consumer)'))
             SetofTables.append('ConsumerProfiles')
             SetofValues.append(valConsumerProfiles)
 
-        Conversions = esh.get_all_instances_of_type(esdl.Conversion)
+        Conversions = index.of_type(esdl.Conversion)
         valConversions = [
             (n.id, n.eClass.name, n.name, n.efficiency, convert_to_string(n.type) if hasattr(n, 'type') else None, n.power)
             for n in Conversions]
@@ -353,13 +592,13 @@ class UniversalLink:
             SetofAttributes.append(('id varchar(100)  Primary Key',
                                     'esdlType varchar(100)',
                                     'name varchar(1500)',
-                                    'efficiency varchar(100)',
+                                    'efficiency DOUBLE',
                                     'type varchar(100)',
-                                    'power varchar(100)'))
+                                    'power DOUBLE'))
             SetofTables.append('Conversions')
             SetofValues.append(valConversions)
 
-        Transports = esh.get_all_instances_of_type(esdl.Transport)
+        Transports = index.of_type(esdl.Transport)
         valTransports = [(n.id,
                           n.eClass.name,
                           n.name,
@@ -371,13 +610,13 @@ class UniversalLink:
             SetofAttributes.append(('id varchar(100)  Primary Key',
                                     'esdlType varchar(100)',
                                     'name varchar(1500)',
-                                    'efficiency varchar(100)',
+                                    feature_column(esdl.Transport, 'efficiency'),
                                     'type varchar(100)',
-                                    'capacity varchar(100)'))
+                                    feature_column(esdl.Transport, 'capacity')))
             SetofTables.append('Transports')
             SetofValues.append(valTransports)
 
-        Arcs = esh.get_all_instances_of_type(esdl.OutPort)
+        Arcs = index.of_type(esdl.OutPort)
         valArcs = []
         for a in Arcs:
             for b in a.connectedTo:
@@ -393,7 +632,8 @@ class UniversalLink:
                                 a.carrier.id if a.carrier else None,
                                 1))
                 if a.carrier is None:
-                    print(f'Note: Arc {a.id} with name {a.name} of assets {a.energyasset.name} misses attribute (carrier)')
+                    log.warning("Note: Arc %s with name %s of assets %s misses attribute (carrier)", a.id, a.name,
+                                a.energyasset.name)
 
         if len(Arcs) > 0:
             SetofAttributes.append(('Node1_name varchar(1500)',
@@ -407,7 +647,11 @@ class UniversalLink:
                                     'PRIMARY KEY (Node1_id, Node2_id)',
                                     'carrier varchar(100)',
                                     'carrier_id varchar(100)',
-                                    'CostDummy varchar(100)'))
+                                    'CostDummy varchar(100)',
+                                    'INDEX (Node2_id)',
+                                    'INDEX (Outport_id)',
+                                    'INDEX (Inport_id)',
+                                    'INDEX (carrier_id)'))
             SetofTables.append('Arcs')
             SetofValues.append(valArcs)
 
@@ -445,7 +689,7 @@ class UniversalLink:
                         b.carrier.name)
                         valProcesses.append(tup)
                     else:
-                        print(f'Note that process {b.id} misses attribute (carrier)')
+                        log.warning("Note that process %s misses attribute (carrier)", b.id)
 
         if (valProcesses != []):
             SetofAttributes.append(('quantityAndUnit varchar(100)',
@@ -456,13 +700,18 @@ class UniversalLink:
                                     'portType varchar(100)',
                                     'conversionId varchar(100)',
                                     'conversionname varchar(1500)',
-                                    'ratio varchar(100)',
+                                    'ratio DOUBLE',
                                     'carrierId varchar(100)',
-                                    'carriername varchar(1500)'))
+                                    'carriername varchar(1500)',
+                                    'INDEX (mainPortId)',
+                                    'INDEX (mainPortCarrierId)',
+                                    'INDEX (portId)',
+                                    'INDEX (conversionId)',
+                                    'INDEX (carrierId)'))
             SetofTables.append('Processes')
             SetofValues.append(valProcesses)
 
-        Carriers = esh.get_all_instances_of_type(esdl.Carrier)
+        Carriers = index.of_type(esdl.Carrier)
         valCarriers = [(p.id,
                         p.name)
                        for p in Carriers]
@@ -472,7 +721,7 @@ class UniversalLink:
             SetofTables.append('Carriers')
             SetofValues.append(valCarriers)
 
-        EnergyCarriers = esh.get_all_instances_of_type(esdl.EnergyCarrier)
+        EnergyCarriers = index.of_type(esdl.EnergyCarrier)
         valEnergyCarriers = [(p.id,
                               p.stateOfMatter,
                               p.energyCarrierType,
@@ -482,27 +731,27 @@ class UniversalLink:
                              for p in EnergyCarriers]
         if (EnergyCarriers != []):
             SetofAttributes.append(('id varchar(100) Primary Key',
-                                    'stateOfMatter varchar(100)',
-                                    'energyCarrierType varchar(100)',
-                                    'emission varchar(100)',
+                                    feature_column(esdl.EnergyCarrier, 'stateOfMatter'),
+                                    feature_column(esdl.EnergyCarrier, 'energyCarrierType'),
+                                    feature_column(esdl.EnergyCarrier, 'emission'),
                                     'name varchar(1500)',
-                                    'energyContent varchar(100)'))
+                                    feature_column(esdl.EnergyCarrier, 'energyContent')))
             SetofTables.append('EnergyCarriers')
             SetofValues.append(valEnergyCarriers)
 
-        GasCommodities = esh.get_all_instances_of_type(esdl.GasCommodity)
+        GasCommodities = index.of_type(esdl.GasCommodity)
         if (GasCommodities != []):
             self.extractDataESDL('GasCommodities', GasCommodities, SetofAttributes, SetofTables, SetofValues)
 
-        ElectricityCommodities = esh.get_all_instances_of_type(esdl.ElectricityCommodity)
+        ElectricityCommodities = index.of_type(esdl.ElectricityCommodity)
         if (ElectricityCommodities != []):
             self.extractDataESDL('ElectricityCommodities', ElectricityCommodities, SetofAttributes, SetofTables, SetofValues)
 
-        EnergyCommodities = esh.get_all_instances_of_type(esdl.EnergyCommodity)
+        EnergyCommodities = index.of_type(esdl.EnergyCommodity)
         if (EnergyCommodities != []):
             self.extractDataESDL('EnergyCommodities', EnergyCommodities, SetofAttributes, SetofTables, SetofValues)
 
-        Commodities = esh.get_all_instances_of_type(esdl.Commodity)
+        Commodities = index.of_type(esdl.Commodity)
         valCommodities = [(h.id, h.name)
                           for h in Commodities]
         if (Commodities != []):
@@ -511,11 +760,11 @@ class UniversalLink:
             SetofTables.append('Commodities')
             SetofValues.append(valCommodities)
 
-        Matters = esh.get_all_instances_of_type(esdl.Matter)
+        Matters = index.of_type(esdl.Matter)
         if (Matters != []):
             self.extractDataESDL('Matters', Matters, SetofAttributes, SetofTables, SetofValues)
 
-        Buildings = esh.get_all_instances_of_type(esdl.Building)
+        Buildings = index.of_type(esdl.Building)
         valBuildings = [(a.id,
                          a.floorArea,
                          a.buildingYear,
@@ -528,14 +777,14 @@ class UniversalLink:
                         for a in Buildings]
         if (Buildings != []):
             SetofAttributes.append(('id varchar(100) Primary Key',
-                                    'floorArea varchar(100)',
-                                    'buildingYear varchar(100)',
+                                    feature_column(esdl.Building, 'floorArea'),
+                                    feature_column(esdl.Building, 'buildingYear'),
                                     'originalIdInSource varchar(100)',
-                                    'surfaceArea varchar(100)',
+                                    feature_column(esdl.Building, 'surfaceArea'),
                                     'name varchar(1500)',
-                                    'height varchar(100)',
-                                    'Lat varchar(100)',
-                                    'Lon varchar(100)'))
+                                    'height DOUBLE',
+                                    feature_column(esdl.Point, 'lat', 'Lat'),
+                                    feature_column(esdl.Point, 'lon', 'Lon')))
             SetofTables.append('Buildings')
             SetofValues.append(valBuildings)
 
@@ -545,20 +794,21 @@ class UniversalLink:
                                     'name_Asset varchar(100)',
                                     'id_Building varchar(100)',
                                     'name_Building varchar(700)',
-                                    'Dummy varchar(100)'))
+                                    'Dummy varchar(100)',
+                                    'INDEX (id_Building)'))
             SetofTables.append('MapAssetToBuilding')
             SetofValues.append(valMapAssetToBuilding)
 
-        KPIs = esh.get_all_instances_of_type(esdl.KPI)
+        KPIs = index.of_type(esdl.KPI)
         valKPIs = []
         for k in KPIs:
             if type(k) in [esdl.IntKPI, esdl.DoubleKPI, esdl.StringKPI]:
-                print(type(k))
+                log.debug("KPI type: %s", type(k))
                 valKPIs.append((k.id, k.name, k.value, 'null', 'null', 'null', 'null'))
             elif type(k) == esdl.DistributionKPI:
                 valKPIs.append((k.id, k.name, 'null', 'null', 'null', 'null', 'null'))
             else:
-                print("KPI type: ", type(k), " is not supported")
+                log.warning("KPI type: %s is not supported", type(k))
         SetofAttributes.append(('id_KPI varchar(100)',
                                 'name_KPI varchar(100)',
                                 'value_KPI varchar(100)',
@@ -591,7 +841,8 @@ class UniversalLink:
                                     'id_building varchar(100)',
                                     'name_building varchar(700)',
                                     'id_conversion varchar(100)',
-                                    'name_conversion varchar(100)'))
+                                    'name_conversion varchar(100)',
+                                    'INDEX (id_building)'))
             SetofTables.append('KPIsBuildings')
             SetofValues.append(valKPIsBuildings)
 
@@ -612,27 +863,22 @@ class UniversalLink:
                                     'id_building varchar(100)',
                                     'name_building varchar(100)',
                                     'id_conversion varchar(100)',
-                                    'name_conversion varchar(100)'))
+                                    'name_conversion varchar(100)',
+                                    'INDEX (id_conversion)'))
             SetofTables.append('KPIConversions')
             SetofValues.append(valKPIConversions)
 
-        CostInformations = esh.get_all_instances_of_type(esdl.CostInformation)
+        CostInformations = index.of_type(esdl.CostInformation)
         valCostInformations = []
+        cost_schema = eclass_schema(esdl.CostInformation.eClass)
         for a in Assets:
             c = a.costInformation
             if (a.costInformation):
-                temp = (a.id, a.name)
-                for d in dir(c):
-                    e = getattr(c, d)
-                    if e == None or type(e) == str:
-                        temp += (None,)
-                    else:
-                        temp += (e.value,)
-                valCostInformations.append(temp)
+                # costs are written as the value of their SingleValue
+                valCostInformations.append((a.id, a.name) + cost_schema.row(c))
         CostInformationsAtt = ('AssetId varchar(100)', 'Assetname varchar(1500)')
         if (CostInformations != []):
-            for d in dir(CostInformations[0]):
-                CostInformationsAtt += (d + ' varchar(100)',)
+            CostInformationsAtt += cost_schema.column_definitions(primary_key=False) + ('INDEX (AssetId)',)
             SetofAttributes.append(CostInformationsAtt)
             SetofTables.append('CostInformations')
             SetofValues.append(valCostInformations)
@@ -660,44 +906,38 @@ class UniversalLink:
                                     'Constraint_Attribute varchar(100)',
                                     'range_Id varchar(100)',
                                     'range_name varchar(1500)',
-                                    'min varchar(100)',
-                                    'max varchar(100)'))
+                                    feature_column(esdl.Range, 'minValue', 'min'),
+                                    feature_column(esdl.Range, 'maxValue', 'max'),
+                                    'INDEX (Node_Id)'))
             SetofTables.append('Constraints')
             SetofValues.append(valConstraints)
 
-        QuantityAndUnitTypes = esh.get_all_instances_of_type(esdl.QuantityAndUnitType)
+        QuantityAndUnitTypes = index.of_type(esdl.QuantityAndUnitType)
         valQuantityAndUnitTypes = []
         valEnergyContentUnit = []
         valEmissionUnits = []
+        unit_schema = eclass_schema(esdl.QuantityAndUnitType.eClass)
         for c in Carriers:
             e = c.emissionUnit
+            if isinstance(e, esdl.QuantityAndUnitReference):
+                e = e.reference
             if (e):
-                temp = (c.id, c.name, 'emissionUnit')
-                for d in dir(e):
-                    a = getattr(e, d)
-                    if a == None:
-                        temp += (None,)
-                    else:
-                        temp += (a,)
+                temp = (c.id, c.name, 'emissionUnit') + unit_schema.row(e)
                 valEmissionUnits.append(temp)
                 valQuantityAndUnitTypes.append(temp)
-            if c not in Commodities:
+            if not isinstance(c, esdl.Commodity):
                 f = c.energyContentUnit
+                if isinstance(f, esdl.QuantityAndUnitReference):
+                    f = f.reference
                 if (f):
-                    temp = (c.id, c.name, 'energyContentUnit')
-                    for d in dir(f):
-                        a = getattr(f, d)
-                        if a == None:
-                            temp += (None,)
-                        else:
-                            temp += (a,)
+                    temp = (c.id, c.name, 'energyContentUnit') + unit_schema.row(f)
                     valEnergyContentUnit.append(temp)
                     valQuantityAndUnitTypes.append(temp)
 
         QuantityAndUnitTypesAtt = ('CarrierId varchar(100)', 'CarrierDescription varchar(100)', 'type varchar(100)')
         if (QuantityAndUnitTypes != []):
-            for d in dir(QuantityAndUnitTypes[0]):
-                QuantityAndUnitTypesAtt += (d + ' varchar(100)',)
+            # a unit can be used by more than one carrier, so its id is not a key
+            QuantityAndUnitTypesAtt += unit_schema.column_definitions(primary_key=False) + ('INDEX (CarrierId)',)
             SetofAttributes.append(QuantityAndUnitTypesAtt)
             SetofTables.append('QuantityAndUnitTypes')
             SetofValues.append(valQuantityAndUnitTypes)
@@ -51,7 +51,7 @@ logging.config.dictConfig(
             "alembic": {"handlers": ["default"], "level": "INFO"},
             "tno": {
                 "handlers": ["default", "file"],
-                "level": "DEBUG",  # "INFO" if EnvSettings.is_production() else "DEBUG",
+                "level": EnvSettings.log_level(),
                 "propagate": False,
             },
         },
@@ -60,7 +60,8 @@ logging.config.dictConfig(
 
 
 structlog.configure(
-    processors=[merge_threadlocal]
+    # drop messages below the log level before they are formatted
+    processors=[structlog.stdlib.filter_by_level, merge_threadlocal]
     + shared_processors
     + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
     logger_factory=structlog.stdlib.LoggerFactory(),